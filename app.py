@@ -1,14 +1,49 @@
-﻿import re
-from datetime import date, datetime
+﻿from datetime import date, datetime, time, timedelta
+from time import time as wall_clock
 from zoneinfo import ZoneInfo
-import unicodedata
+from typing import List, MutableMapping
 from urllib.parse import quote
 
 import streamlit as st
 
-from src.auth import SCOPES, TOKEN_PATH, clear_credentials, load_credentials
-from src.services import fetch_tasks, move_task, schedule_task, snooze_task
-from src.utils import energy_badge, filter_tasks_by_time
+# First, so the startup report also times the imports below.
+from src.perf import STARTUP
+from src.auth import (
+    CREDENTIALS,
+    MULTI_USER,
+    PENDING_AUTH_SECONDS,
+    SCOPES,
+    TOKEN_PATH,
+    account_key,
+    authorization_url,
+    clear_credentials,
+    finish_authorization,
+    load_credentials,
+)
+from src.cache import SharedTaskCache
+from src.calendar_mirror import CALENDAR_MIRROR_PATH, CalendarMirror
+from src.frame import TaskFrame
+from src.outbox import OUTBOX_PATH, Outbox, OutboxWorker, moved_task
+from src.perf import BACKGROUND, Tracer, span
+from src.prefetch import DEFAULT_REFRESH_SECONDS, TaskPrefetcher, TaskSnapshot
+from src.ratelimit import REQUEST_EXECUTOR, is_insufficient_scope, is_rate_limited
+from src.scheduler import plan_schedule
+from src.services import (
+    add_event_listener,
+    add_write_listener,
+    fetch_tasks,
+    remove_event_listener,
+    remove_write_listener,
+)
+from src.sync import TaskSyncStore
+from src.tenants import AccountPool, TokenStore
+from src.utils import (
+    energy_badge,
+    prepare_tasks,
+    round_up_to_five_minutes,
+)
+
+STARTUP.mark("imports")
 
 st.set_page_config(page_title="TurboOrganizer", page_icon="TO", layout="wide")
 
@@ -143,8 +178,8 @@ st.markdown(
 
 if "credentials" not in st.session_state:
     st.session_state.credentials = None
-if "tasks" not in st.session_state:
-    st.session_state.tasks = []
+if "task_frame" not in st.session_state:
+    st.session_state.task_frame = TaskFrame()
 if "tasks_loaded" not in st.session_state:
     st.session_state.tasks_loaded = False
 if "auto_auth_attempted" not in st.session_state:
@@ -157,12 +192,58 @@ if "filter_date" not in st.session_state:
     st.session_state.filter_date = None
 if "filter_tags" not in st.session_state:
     st.session_state.filter_tags = []
+if "day_plan" not in st.session_state:
+    st.session_state.day_plan = None
 if "filter_date_enabled" not in st.session_state:
     st.session_state.filter_date_enabled = False
+if "tracer" not in st.session_state:
+    st.session_state.tracer = Tracer()
+tracer = st.session_state.tracer
+tracer.begin("script")
 DEFAULT_TIMEZONE = ZoneInfo("Europe/Madrid")
+CARDS_PAGE_SIZE = 20
+SNAPSHOT_POLL_SECONDS = 5
+OUTBOX_STOP_TIMEOUT = 10.0
+PREFETCH_STOP_TIMEOUT = 10.0
+REFRESH_INTERVALS = {"Off": None, "1 min": 60.0, "5 min": DEFAULT_REFRESH_SECONDS, "15 min": 900.0}
+
+@st.cache_resource
+def get_token_store() -> TokenStore:
+    """Encrypted per-account tokens for multi-user mode, shared by every session."""
+
+    return TokenStore()
+
 
+def sign_in_url(force_consent: bool = False) -> str:
+    """This session's Google sign-in link, renewed well before the pending sign-in expires."""
+
+    key = "sign_in_url_consent" if force_consent else "sign_in_url"
+    url, created = st.session_state.get(key, (None, 0.0))
+    if url is None or wall_clock() - created > PENDING_AUTH_SECONDS / 2:
+        url, created = authorization_url(force_consent=force_consent), wall_clock()
+        st.session_state[key] = (url, created)
+    return url
+
+
+if MULTI_USER:
+    # Google sends the browser back with ?code=...&state=... after sign-in.
+    if not st.session_state.credentials and "code" in st.query_params:
+        try:
+            creds = finish_authorization(st.query_params["state"], st.query_params["code"])
+            if not creds.refresh_token and not get_token_store().has_refresh_token(account_key(creds)):
+                # Google skips the refresh token for accounts that consented before (e.g. after Disconnect).
+                st.session_state.consent_required = True
+                st.warning("Google did not grant offline access. Click 'Connect Google' again to approve it.")
+            else:
+                account = get_token_store().save(creds)
+                st.session_state.credentials = get_token_store().get(account)
+                st.session_state.consent_required = False
+                st.toast("Connected with Google.", icon="✅")
+        except Exception as exc:  # noqa: BLE001
+            st.error(f"Authentication failed: {exc}")
+        st.query_params.clear()
 # Auto-connect if a cached token exists, but avoid triggering a fresh OAuth flow implicitly.
-if (
+elif (
     not st.session_state.credentials
     and not st.session_state.auto_auth_attempted
     and TOKEN_PATH.exists()
@@ -177,7 +258,7 @@ if (
 
 
 def remove_task_from_state(task_id: str) -> None:
-    st.session_state.tasks = [task for task in st.session_state.tasks if task.get("id") != task_id]
+    st.session_state.task_frame.remove(task_id)
 
 
 def format_duration(minutes: int | None) -> str:
@@ -193,24 +274,425 @@ def format_duration(minutes: int | None) -> str:
     return " ".join(parts)
 
 
-def load_tasks():
-    try:
-        st.session_state.tasks = fetch_tasks(st.session_state.credentials)
-        st.session_state.tasks_loaded = True
-        st.success("Tasks loaded from Google Tasks")
-    except Exception as exc:  # noqa: BLE001
-        st.error(f"Unable to load tasks: {exc}")
+@st.cache_resource
+def get_task_cache() -> SharedTaskCache:
+    """Task snapshots shared by every session of this server process."""
+
+    if MULTI_USER:
+        # Sync state stays in memory so no account's tasks are written to disk.
+        cache = SharedTaskCache(store_factory=lambda account: TaskSyncStore(None))
+    else:
+        cache = SharedTaskCache()
+    add_write_listener(cache.on_write)
+    return cache
+
+
+def retire_prefetcher(prefetcher: TaskPrefetcher) -> None:
+    remove_write_listener(prefetcher.on_write)
+    prefetcher.stop()
+
+
+@st.cache_resource
+def get_prefetchers() -> AccountPool[TaskPrefetcher]:
+    """One background refresh worker per account, shared by its sessions.
+
+    Workers of the least recently used accounts are stopped past the bound.
+    """
+
+    return AccountPool(close=retire_prefetcher)
+
+
+def retire_calendar_mirror(mirror: CalendarMirror) -> None:
+    remove_event_listener(mirror.on_event)
+
+
+@st.cache_resource
+def get_calendar_mirrors() -> AccountPool[CalendarMirror]:
+    """Each account's mirror of its primary calendar, for overlap checks without a request."""
+
+    return AccountPool(close=retire_calendar_mirror)
+
+
+def get_calendar_mirror(creds) -> CalendarMirror:
+    def new_mirror(account: str) -> CalendarMirror:
+        # Multi-user mirrors stay in memory, like their task sync state.
+        mirror = CalendarMirror.load(None if MULTI_USER else CALENDAR_MIRROR_PATH, account=account)
+        add_event_listener(mirror.on_event)
+        return mirror
+
+    return get_calendar_mirrors().get(account_key(creds), new_mirror)
+
+
+def get_prefetcher(creds) -> TaskPrefetcher:
+    def new_prefetcher(account: str) -> TaskPrefetcher:
+        cache = get_task_cache()
+        mirror = get_calendar_mirror(creds)
+
+        def load() -> List[MutableMapping]:
+            tasks = cache.load(
+                account,
+                lambda sync_store: prepare_tasks(
+                    fetch_tasks(creds, sync_store=sync_store), DEFAULT_TIMEZONE
+                ),
+                # Timer wakes go through the TTL, capped at the chosen interval.
+                max_age=prefetcher.interval,
+            )
+            # Usually one empty incremental page; keeps "Schedule at" overlap checks current.
+            mirror.refresh(creds)
+            return tasks
+
+        prefetcher = TaskPrefetcher(account, load)
+        add_write_listener(prefetcher.on_write)
+        return prefetcher
+
+    return get_prefetchers().get(account_key(creds), new_prefetcher).start()
+
+
+@st.cache_resource
+def get_outbox() -> Outbox:
+    # Queued writes carry task titles and notes; multi-user mode keeps them in memory.
+    return Outbox(None if MULTI_USER else OUTBOX_PATH)
+
+
+@st.cache_resource
+def get_outbox_workers() -> AccountPool[OutboxWorker]:
+    """One outbox drainer per account; it resumes queued writes after a restart.
+
+    Drainers of the least recently used accounts are stopped past the bound;
+    their queued writes stay in the outbox until the account is back.
+    """
+
+    # Wait for a write in flight so two drainers never send the same row.
+    return AccountPool(close=lambda worker: worker.stop(timeout=OUTBOX_STOP_TIMEOUT))
+
+
+def close_background_resources() -> None:
+    """Stop every per-account thread and drop its listeners.
+
+    ``st.cache_resource.clear()`` forgets the pools without closing them, so
+    their workers would keep running next to the new ones.
+    """
+
+    pools = [get_prefetchers(), get_outbox_workers(), get_calendar_mirrors()]
+    if MULTI_USER:
+        pools.append(get_token_store().managers)
+    for pool in pools:
+        for account in pool:
+            entry = pool.pop(account)
+            if isinstance(entry, TaskPrefetcher):
+                # A load in flight would otherwise save tasks_sync.json next to the new cache's store.
+                entry.stop(timeout=PREFETCH_STOP_TIMEOUT)
+    remove_write_listener(get_task_cache().on_write)
+
+
+def get_outbox_worker(creds) -> OutboxWorker:
+    def new_worker(account: str) -> OutboxWorker:
+        if not MULTI_USER:
+            # Rows queued under an older key would otherwise never be sent.
+            get_outbox().claim(account)
+        return OutboxWorker(get_outbox(), account, creds)
+
+    return get_outbox_workers().get(account_key(creds), new_worker).start()
+
+
+def queue_mutation(task, op: str, **options) -> None:
+    """Apply ``op`` to the local task state now and send it to Google in the background."""
+
+    queue_mutations([(task, op, options)])
+
+
+def queue_mutations(mutations: List[tuple]) -> None:
+    """Queue several ``(task, op, options)`` at once; the worker sends them as one batch."""
+
+    creds = st.session_state.credentials
+    outbox = get_outbox()
+    for task, op, options in mutations:
+        outbox.enqueue(account_key(creds), op, task, **options)
+        if op == "move":
+            st.session_state.task_frame.replace(
+                moved_task(task, options["destination_tasklist"], options["project"])
+            )
+        else:
+            remove_task_from_state(task["id"])
+    get_outbox_worker(creds).notify()
+
+
+def apply_snapshot(snapshot: TaskSnapshot) -> None:
+    # Replay queued writes so a refresh never resurrects an optimistic change.
+    tasks = get_outbox().apply_pending(
+        account_key(st.session_state.credentials), snapshot.tasks, snapshot.fetched_at
+    )
+    st.session_state.task_frame = TaskFrame(tasks)
+    st.session_state.snapshot_version = snapshot.version
+    st.session_state.tasks_loaded = True
+
+
+def load_tasks(force: bool = False):
+    """Swap in the latest background snapshot; never waits for the network.
+
+    ``force`` asks the worker for a fresh fetch, which the snapshot watcher
+    picks up once it lands.
+    """
+
+    prefetcher = get_prefetcher(st.session_state.credentials)
+    if force:
+        get_task_cache().invalidate(prefetcher.account)
+        prefetcher.request_refresh()
+        st.toast("Refreshing tasks in the background…")
+    snapshot = prefetcher.snapshot()
+    if snapshot is not None and snapshot.version != st.session_state.get("snapshot_version"):
+        apply_snapshot(snapshot)
+
+
+def format_age(seconds: float) -> str:
+    if seconds < 60:
+        return f"{int(seconds)} s"
+    return f"{int(seconds // 60)} min"
+
+
+OUTBOX_LABELS = {"schedule": "programar", "complete": "completar", "snooze": "posponer", "move": "mover"}
+
+
+@st.fragment(run_every=SNAPSHOT_POLL_SECONDS)
+def render_snapshot_status() -> None:
+    """Poll the background workers, swap in new snapshots and surface failed writes."""
+
+    if not st.session_state.credentials:
+        return
+    account = account_key(st.session_state.credentials)
+    prefetcher = get_prefetcher(st.session_state.credentials)
+    get_outbox_worker(st.session_state.credentials)
+    snapshot = prefetcher.snapshot()
+    failures = get_outbox().failures(account)
+    failed_ids = {failure["id"] for failure in failures}
+    # A failed write is no longer replayed, so re-applying the snapshot rolls it back.
+    rolled_back = not failed_ids <= st.session_state.setdefault("seen_outbox_failures", set())
+    st.session_state.seen_outbox_failures = failed_ids
+    if snapshot is not None and (
+        rolled_back or snapshot.version != st.session_state.get("snapshot_version")
+    ):
+        apply_snapshot(snapshot)
+        st.rerun()
+
+    for failure in failures:
+        cols = st.columns([5, 1])
+        cols[0].warning(
+            f"No se pudo {OUTBOX_LABELS.get(failure['op'], failure['op'])} "
+            f"'{failure['task'].get('title')}': {failure['error']}. Cambio revertido."
+        )
+        if cols[1].button("Descartar", key=f"dismiss_outbox_{failure['id']}"):
+            get_outbox().dismiss(failure["id"])
+            st.rerun(scope="fragment")
+    pending = len(get_outbox().pending(account))
+    if pending:
+        st.caption(f"{pending} cambio(s) pendientes de sincronizar con Google")
+    if snapshot is None:
+        st.caption("Loading your tasks in the background…")
+    else:
+        st.caption(f"Tareas actualizadas hace {format_age(wall_clock() - snapshot.fetched_at)}")
+    if prefetcher.last_error is not None and is_rate_limited(prefetcher.last_error):
+        st.warning("Google is rate limiting requests; the next refresh will try again.")
+    elif prefetcher.last_error is not None:
+        st.warning(f"Background refresh failed: {prefetcher.last_error}")
+
+
+def task_link(task) -> str | None:
+    task_id = task.get("id")
+    tasklist = task.get("tasklist")
+    if not task_id or not tasklist:
+        return None
+    list_q = quote(str(tasklist))
+    task_q = quote(str(task_id))
+    # Use the hash fragment to jump directly to the task inside the list.
+    return f"https://tasks.google.com/embed/list?list={list_q}#task/{task_q}"
+
+def render_task_actions(task, project_options) -> None:
+    """Heavy per-task widgets, only built while the card is expanded."""
+
+    task_id = task["id"]
+    cols = st.columns(3)
+    mark_done = cols[0].checkbox(
+        "Mark completed after scheduling",
+        value=True,
+        key=f"done_{task_id}",
+    )
+
+    with cols[0].popover("Schedule at"):
+        # Outside a form so the overlap check below follows every change.
+        schedule_date = st.date_input(
+            "Schedule date",
+            value=date.today(),
+            key=f"date_{task_id}",
+        )
+        schedule_time = st.time_input(
+            "Schedule time (local)",
+            value=datetime.now(DEFAULT_TIMEZONE).time().replace(second=0, microsecond=0),
+            step=300,
+            key=f"time_{task_id}",
+        )
+        start_at = datetime.combine(schedule_date, schedule_time).replace(tzinfo=DEFAULT_TIMEZONE)
+        mirror = get_calendar_mirror(st.session_state.credentials)
+        end_at = start_at + timedelta(minutes=int(task.get("duration") or 15))
+        overlaps = mirror.conflicts(start_at, end_at)
+        if overlaps:
+            st.warning(
+                "Se solapa con: "
+                + ", ".join(
+                    f"{event['summary'] or '(sin título)'} "
+                    f"({event['start'].astimezone(DEFAULT_TIMEZONE):%H:%M}–"
+                    f"{event['end'].astimezone(DEFAULT_TIMEZONE):%H:%M})"
+                    for event in overlaps
+                )
+            )
+        elif not mirror.synced:
+            st.caption("Calendario aún sin sincronizar; no se comprueban solapes.")
+
+        if st.button("Confirm Schedule", key=f"schedule_{task_id}"):
+            try:
+                queue_mutation(task, "schedule", mark_complete=mark_done, start_time=start_at)
+            except Exception as exc:  # noqa: BLE001
+                st.error(f"Could not schedule at chosen time: {exc}")
+            else:
+                st.toast(f"Scheduling on Google Calendar at {start_at.isoformat()} ({DEFAULT_TIMEZONE})")
+                st.rerun(scope="fragment")
+
+    with cols[1].popover("Snooze"):
+        with st.form(f"snooze_form_{task_id}"):
+            snooze_option = st.radio(
+                "Snooze until",
+                options=["Tomorrow", "Next Week", "Custom Date"],
+                horizontal=False,
+                key=f"snooze_option_{task_id}",
+            )
+            custom_date = None
+            if snooze_option == "Custom Date":
+                custom_date = st.date_input(
+                    "Pick date",
+                    value=date.today(),
+                    key=f"snooze_date_{task_id}",
+                )
+            submit_snooze = st.form_submit_button("Confirm Snooze")
+
+        if submit_snooze:
+            try:
+                if snooze_option == "Tomorrow":
+                    days = 1
+                elif snooze_option == "Next Week":
+                    days = 7
+                else:
+                    delta = (custom_date - date.today()).days if custom_date else 1
+                    days = max(1, delta)
+
+                queue_mutation(task, "snooze", days=days)
+            except Exception as exc:  # noqa: BLE001
+                st.error(f"Could not snooze task: {exc}")
+            else:
+                st.toast(f"Snoozed to {days} day(s) ahead.")
+                st.rerun(scope="fragment")
+
+    with cols[2].popover(f"Project: {task['project']}", use_container_width=True):
+        current = (task["project"], task["tasklist"])
+        dest = st.selectbox(
+            "Mover a proyecto",
+            options=project_options,
+            format_func=lambda opt: opt[0],
+            index=project_options.index(current) if current in project_options else 0,
+            key=f"move_select_{task_id}",
+        )
+        if st.button("Mover", key=f"move_btn_{task_id}"):
+            try:
+                queue_mutation(task, "move", destination_tasklist=dest[1], project=dest[0])
+            except Exception as exc:  # noqa: BLE001
+                st.error(f"No se pudo mover la tarea: {exc}")
+            else:
+                st.toast(f"Tarea movida a '{dest[0]}'")
+                st.rerun(scope="fragment")
+
+
+@tracer.traced("task_card")
+def render_task_card(task, project_options) -> None:
+    """Collapsed task card; the action widgets appear when it is expanded.
+
+    Cards draw inside the task view fragment: an action changes the shared
+    task frame and reruns the view, so counts, the bulk bar and the other
+    cards are redrawn from it.
+    """
+
+    task_id = task["id"]
+    with st.container(border=True):
+        cols = st.columns([3, 2])
+        is_routine = bool(task.get("is_routine"))
+        title_prefix = "ROUTINE | " if is_routine else ""
+
+        if is_routine:
+            cols[0].warning("Routine priority")
+
+        tags_list = sorted(task["tags"])
+        tags_display = ", ".join(f"#{t}" for t in tags_list) if tags_list else "None"
+
+        task_url = task_link(task)
+        if task_url:
+            title_md = (
+                f"<a class='task-link' href='{task_url}' target='_blank'>"
+                f"<strong>{title_prefix}{task['title']} ↗</strong></a>"
+            )
+        else:
+            title_md = f"<strong>{title_prefix}{task['title']}</strong>"
+        cols[0].markdown(
+            f"{title_md}<br>"
+            f"Project: {task['project']} · "
+            f"Duration: {format_duration(task.get('duration'))} · "
+            f"Tags: {tags_display}",
+            unsafe_allow_html=True,
+        )
+
+        quick_cols = cols[1].columns(3)
+        quick_cols[0].checkbox("Seleccionar", key=f"select_{task_id}")
+        expanded = quick_cols[1].toggle("Acciones", key=f"expand_{task_id}")
+        if quick_cols[2].button("Schedule now", key=f"schedule_now_{task_id}"):
+            try:
+                start_at = round_up_to_five_minutes(datetime.now(DEFAULT_TIMEZONE))
+                queue_mutation(
+                    task,
+                    "schedule",
+                    mark_complete=st.session_state.get(f"done_{task_id}", True),
+                    start_time=start_at,
+                )
+            except Exception as exc:  # noqa: BLE001
+                st.error(f"Could not schedule: {exc}")
+            else:
+                st.toast(f"Scheduling on Google Calendar starting at {start_at.isoformat()}")
+                st.rerun(scope="fragment")
+
+        if expanded:
+            render_task_actions(task, project_options)
 
 
 with st.sidebar:
-    if st.button("Connect Google", type="primary", use_container_width=True):
+    if MULTI_USER:
+        if not st.session_state.credentials:
+            try:
+                st.link_button(
+                    "Connect Google",
+                    sign_in_url(force_consent=st.session_state.get("consent_required", False)),
+                    type="primary",
+                    use_container_width=True,
+                )
+            except Exception as exc:  # noqa: BLE001
+                st.error(f"Authentication unavailable: {exc}")
+    elif st.button("Connect Google", type="primary", use_container_width=True):
         try:
             st.session_state.credentials = load_credentials()
             st.success("Authenticated with Google!")
         except Exception as exc:  # noqa: BLE001
             st.error(f"Authentication failed: {exc}")
 
-    if st.session_state.credentials and st.button("Refresh token", use_container_width=True):
+    if MULTI_USER and st.session_state.credentials:
+        try:
+            st.link_button("Refresh token", sign_in_url(force_consent=True), use_container_width=True)
+        except Exception as exc:  # noqa: BLE001
+            st.error(f"Failed to refresh: {exc}")
+    elif st.session_state.credentials and st.button("Refresh token", use_container_width=True):
         try:
             st.session_state.credentials = load_credentials(force_reauth=True)
             st.success("Token refreshed")
@@ -218,13 +700,37 @@ with st.sidebar:
             st.error(f"Failed to refresh: {exc}")
 
     if st.session_state.credentials and st.button("Load my Tasks", type="primary", use_container_width=True):
-        load_tasks()
+        load_tasks(force=True)
+
+    if st.session_state.credentials:
+        refresh_label = st.selectbox(
+            "Auto-refresh",
+            list(REFRESH_INTERVALS),
+            index=list(REFRESH_INTERVALS).index("5 min"),
+            key="refresh_interval",
+        )
+        get_prefetcher(st.session_state.credentials).interval = REFRESH_INTERVALS[refresh_label]
 
     if st.session_state.credentials and st.button("Disconnect", use_container_width=True):
-        clear_credentials()
+        account = account_key(st.session_state.credentials)
+        prefetcher = get_prefetchers().pop(account)
+        if prefetcher is not None:
+            # A load in flight would otherwise save the store again after it is deleted.
+            prefetcher.stop(timeout=PREFETCH_STOP_TIMEOUT)
+        get_task_cache().forget(account)
+        mirror = get_calendar_mirrors().pop(account)
+        if mirror is not None:
+            mirror.clear()
+        if MULTI_USER:
+            get_token_store().delete(account)
+            # The stored refresh token is gone; the next sign-in must ask for a new one.
+            st.session_state.consent_required = True
+        else:
+            clear_credentials()
         st.session_state.credentials = None
-        st.session_state.tasks = []
+        st.session_state.task_frame = TaskFrame()
         st.session_state.tasks_loaded = False
+        st.session_state.snapshot_version = None
         st.info("Signed out and cache cleared.")
 
 st.sidebar.divider()
@@ -233,8 +739,70 @@ if st.sidebar.button("🔄 Reiniciar app", use_container_width=True):
     st.rerun()
 if st.sidebar.button("🧹 Limpiar caché", use_container_width=True):
     st.cache_data.clear()
+    close_background_resources()
     st.cache_resource.clear()
     st.success("Caché limpiada")
+def percentile_rows(rows):
+    return [
+        {"span": name, "p50 ms": round(p50_ms, 1), "p95 ms": round(p95_ms, 1), "calls": calls}
+        for name, _last_ms, p50_ms, p95_ms, calls in rows
+    ]
+
+
+with st.sidebar.expander("Performance"):
+    last_trace = tracer.last()
+    if last_trace is not None:
+        st.caption(
+            f"Última ejecución ({last_trace.name}): {last_trace.duration * 1000:.0f} ms · "
+            f"Tareas cargadas: {len(st.session_state.task_frame)}"
+        )
+        st.table(
+            [
+                {"span": name, "ms": round(total_ms, 1), "calls": calls}
+                for name, total_ms, calls in last_trace.breakdown()
+            ]
+        )
+        st.caption("Sesión, por ejecución")
+        st.table(percentile_rows(tracer.timings.summary()))
+    else:
+        st.caption("Sin mediciones todavía.")
+    startup_rows = STARTUP.rows()
+    if startup_rows:
+        st.caption("Arranque del proceso")
+        st.table([{"hito": name, "ms": round(elapsed_ms, 1)} for name, elapsed_ms in startup_rows])
+    background_rows = BACKGROUND.summary()
+    if background_rows:
+        st.caption("Segundo plano, por llamada")
+        st.table(percentile_rows(background_rows))
+    st.download_button(
+        "Exportar trazas (JSONL)",
+        data=tracer.to_jsonl,
+        file_name="traces.jsonl",
+        mime="application/x-ndjson",
+        on_click="ignore",
+    )
+with st.sidebar.expander("API"):
+    api_stats = REQUEST_EXECUTOR.stats()
+    st.caption(
+        f"Peticiones: {api_stats['requests']} · Reintentos: {api_stats['retries']} · "
+        f"Fallos: {api_stats['failures']}"
+    )
+    st.caption(
+        f"Espera por cuota: {api_stats['throttled_seconds']:.1f} s · "
+        f"Backoff: {api_stats['backoff_seconds']:.1f} s"
+    )
+    if MULTI_USER and st.session_state.credentials:
+        credential_manager = get_token_store().managers.get(account_key(st.session_state.credentials))
+    else:
+        credential_manager = CREDENTIALS
+    next_refresh = credential_manager.seconds_until_refresh()
+    if st.session_state.credentials and next_refresh is not None:
+        st.caption(
+            f"Token: se renueva en {next_refresh / 60:.0f} min · "
+            f"Renovaciones: {credential_manager.refreshes}"
+        )
+    if credential_manager.last_error:
+        st.warning(f"Token refresh failed; retrying: {credential_manager.last_error}")
 with st.sidebar.expander("Acerca de"):
     st.markdown(
         """
@@ -250,89 +818,58 @@ st.sidebar.markdown(
     unsafe_allow_html=True,
 )
 
-st.markdown("")
-with st.container(border=True):
-    st.subheader("Decision Engine")
-    engine_cols = st.columns([2, 1])
-    time_values = list(range(15, 241, 15)) + [1440, -1]  # -1 = indefinido
-
-    def time_label_from_value(val: int) -> str:
-        if val == -1:
-            return "Indefinido"
-        if val == 1440:
-            return "1 día"
-        return f"{val} min"
-
-    default_time_value = -1  # Indefinido by default
-    saved_value = st.session_state.get("time_choice", default_time_value)
-    if saved_value not in time_values:
-        st.session_state.pop("time_choice", None)
-        saved_value = default_time_value
-
-    time_choice_value = engine_cols[0].select_slider(
-        "¿Cuánto tiempo tienes?",
-        options=time_values,
-        value=saved_value,
-        format_func=time_label_from_value,
-        key="time_choice",
-    )
-    time_available = None if time_choice_value == -1 else time_choice_value
-    energy_level = engine_cols[1].selectbox(
-        "Nivel de energía", ["Low", "Medium", "High"], index=1, key="energy_main"
-    )
 
+def render_decision_engine() -> tuple[int | None, str]:
+    """Time and energy inputs; returns ``(minutes available, energy level)``."""
 
-# If authenticated and tasks haven't been loaded yet, do it automatically once.
-if (
-    st.session_state.credentials
-    and not st.session_state.tasks_loaded
-    and not st.session_state.auto_tasks_attempted
-):
-    st.session_state.auto_tasks_attempted = True
-    load_tasks()
+    with st.container(border=True):
+        st.subheader("Decision Engine")
+        engine_cols = st.columns([2, 1])
+        time_values = list(range(15, 241, 15)) + [1440, -1]  # -1 = indefinido
 
-if not st.session_state.credentials:
-    st.warning("Connect your Google account to fetch tasks.")
-elif not st.session_state.tasks_loaded:
-    st.info("Click 'Load my Tasks' to see your Google Tasks inbox.")
-else:
-    filtered_tasks = filter_tasks_by_time(st.session_state.tasks, time_available)
-
-    def extract_tags(task) -> set[str]:
-        pattern = re.compile(r"#([A-Za-z0-9_-]+)")
-        title_tags = pattern.findall(task.get('title', ''))
-        note_tags = pattern.findall(task.get('notes', '') or '')
-        return {tag.lower() for tag in title_tags + note_tags}
-
-    def normalize_project(name: str) -> str:
-        base = unicodedata.normalize("NFD", (name or '').strip().lower())
-        return "".join(ch for ch in base if unicodedata.category(ch) != "Mn")
-
-    def is_in_inbox(task) -> bool:
-        normalized = normalize_project(task.get('project'))
-        return normalized in {'buzon', 'inbox', ''}
-
-    def is_due_today(task) -> bool:
-        due_str = task.get('due')
-        if not due_str:
-            return False
-        try:
-            due_dt = datetime.fromisoformat(due_str)
-        except ValueError:
-            return False
-        if due_dt.tzinfo is None:
-            due_dt = due_dt.replace(tzinfo=DEFAULT_TIMEZONE)
-        return due_dt.date() == datetime.now(DEFAULT_TIMEZONE).date()
-
-    def task_link(task) -> str | None:
-        task_id = task.get("id")
-        tasklist = task.get("tasklist")
-        if not task_id or not tasklist:
-            return None
-        list_q = quote(str(tasklist))
-        task_q = quote(str(task_id))
-        # Use the hash fragment to jump directly to the task inside the list.
-        return f"https://tasks.google.com/embed/list?list={list_q}#task/{task_q}"
+        def time_label_from_value(val: int) -> str:
+            if val == -1:
+                return "Indefinido"
+            if val == 1440:
+                return "1 día"
+            return f"{val} min"
+
+        default_time_value = -1  # Indefinido by default
+        saved_value = st.session_state.get("time_choice", default_time_value)
+        if saved_value not in time_values:
+            st.session_state.pop("time_choice", None)
+            saved_value = default_time_value
+
+        time_choice_value = engine_cols[0].select_slider(
+            "¿Cuánto tiempo tienes?",
+            options=time_values,
+            value=saved_value,
+            format_func=time_label_from_value,
+            key="time_choice",
+        )
+        time_available = None if time_choice_value == -1 else time_choice_value
+        energy_level = engine_cols[1].selectbox(
+            "Nivel de energía", ["Low", "Medium", "High"], index=1, key="energy_main"
+        )
+    return time_available, energy_level
+
+
+@st.fragment
+@tracer.traced("task_view")
+def render_task_view() -> None:
+    """Decision Engine, filter bar and task list; reruns without the rest of the app."""
+
+    time_available, energy_level = render_decision_engine()
+
+    if not st.session_state.credentials:
+        st.warning("Connect your Google account to fetch tasks.")
+        return
+    if not st.session_state.tasks_loaded:
+        st.info("Your Google Tasks are loading in the background. Click 'Load my Tasks' to retry.")
+        return
+
+    task_frame = st.session_state.task_frame
+    filtered = task_frame.fitting(time_available)
 
     mode_options = ["Solo hoy", "Buzon", "Todo"]
     if st.session_state.filter_mode not in mode_options:
@@ -352,15 +889,12 @@ else:
         st.session_state.filter_date = None
 
     if st.session_state.filter_mode == "Buzon":
-        filtered_tasks = [task for task in filtered_tasks if is_in_inbox(task)]
+        filtered &= task_frame.inbox()
     elif st.session_state.filter_mode == "Solo hoy":
-        filtered_tasks = [task for task in filtered_tasks if is_due_today(task)]
+        filtered &= task_frame.due_on(datetime.now(DEFAULT_TIMEZONE).date())
 
     # Extract all tags from tasks for the filter
-    all_tags = set()
-    for t in filtered_tasks:
-        all_tags |= extract_tags(t)
-    tag_options = sorted(all_tags)
+    tag_options = sorted(task_frame.tags_among(filtered))
 
     # Create filter row with Date, Tags, and Clear buttons
     st.markdown("---")
@@ -413,20 +947,16 @@ else:
             st.session_state.filter_date = None
             st.session_state.filter_date_enabled = False
             st.session_state.filter_tags = []
-            st.rerun()
+            st.rerun(scope="fragment")
 
     # Apply filters
     if st.session_state.filter_date and st.session_state.filter_date_enabled:
-        filtered_tasks = [
-            task for task in filtered_tasks 
-            if task.get('due') and datetime.fromisoformat(task['due']).date() == st.session_state.filter_date
-        ]
+        filtered &= task_frame.due_on(st.session_state.filter_date)
 
     if st.session_state.filter_tags:
-        filtered_tasks = [
-            task for task in filtered_tasks
-            if extract_tags(task).intersection(st.session_state.filter_tags)
-        ]
+        filtered &= task_frame.with_any_tag(st.session_state.filter_tags)
+
+    filtered_tasks = task_frame.ordered(filtered)
 
     st.subheader("Suggested tasks")
     if time_available is None:
@@ -440,160 +970,144 @@ else:
     if not filtered_tasks:
         st.success("No tasks fit the current window. Enjoy a break or widen the time range!")
     else:
-        project_options = sorted(
-            { (task["project"], task["tasklist"]) for task in st.session_state.tasks },
-            key=lambda p: p[0].lower(),
-        )
-        for task in filtered_tasks:
-            with st.container(border=True):
-                cols = st.columns([3, 2])
-                is_routine = bool(task.get("is_routine"))
-                title_prefix = "ROUTINE | " if is_routine else ""
-
-                if is_routine:
-                    cols[0].warning("Routine priority")
-
-                tags_list = sorted(extract_tags(task))
-                tags_display = ", ".join(f"#{t}" for t in tags_list) if tags_list else "None"
+        project_options = task_frame.project_options()
 
-                task_url = task_link(task)
-                if task_url:
-                    title_md = (
-                        f"<a class='task-link' href='{task_url}' target='_blank'>"
-                        f"<strong>{title_prefix}{task['title']} ↗</strong></a>"
+        with st.expander("Plan my day", expanded=bool(st.session_state.day_plan)):
+            plan_cols = st.columns([2, 2, 1])
+            plan_horizon = plan_cols[0].selectbox("Horizonte", ["Hoy", "Esta semana"], key="plan_horizon")
+            plan_hours = plan_cols[1].slider("Horario", 0, 24, (9, 21), key="plan_hours")
+            if plan_cols[2].button("Planificar", key="plan_build", use_container_width=True):
+                now_local = datetime.now(DEFAULT_TIMEZONE)
+                plan_days = 1 if plan_horizon == "Hoy" else 7
+                plan_end = datetime.combine(
+                    now_local.date() + timedelta(days=plan_days), time(0), tzinfo=DEFAULT_TIMEZONE
+                )
+                try:
+                    placements, unplaced = plan_schedule(
+                        st.session_state.credentials,
+                        filtered_tasks,
+                        end=plan_end,
+                        tz=DEFAULT_TIMEZONE,
+                        working_hours=plan_hours,
                     )
-                else:
-                    title_md = f"<strong>{title_prefix}{task['title']}</strong>"
-                with cols[0]:
-                    cols_proj = st.columns([3, 1])
-                    with cols_proj[0]:
-                        cols_proj[0].markdown(
-                            f"{title_md}<br><br>"
-                            f"Duration: {format_duration(task.get('duration'))}<br><br>"
-                            f"Tags: {tags_display}",
-                            unsafe_allow_html=True,
+                    st.session_state.day_plan = {"placements": placements, "unplaced": len(unplaced)}
+                except Exception as exc:  # noqa: BLE001
+                    if is_insufficient_scope(exc):
+                        st.error(
+                            "Your token predates calendar availability access. "
+                            "Use 'Refresh token' in the sidebar once to grant it."
                         )
-                    with cols_proj[1]:
-                        with st.popover(f"Project: {task['project']}", use_container_width=True, key=f"project_pop_{task['id']}"):
-                            dest = st.selectbox(
-                                "Mover a proyecto",
-                                options=project_options,
-                                format_func=lambda opt: opt[0],
-                                index=project_options.index((task["project"], task["tasklist"])) if (task["project"], task["tasklist"]) in project_options else 0,
-                                key=f"move_select_{task['id']}",
-                            )
-                            if st.button("Mover", key=f"move_btn_{task['id']}"):
-                                try:
-                                    move_task(
-                                        st.session_state.credentials,
-                                        task,
-                                        destination_tasklist=dest[1],
-                                    )
-                                    st.success(f"Tarea movida a '{dest[0]}'")
-                                    load_tasks()
-                                except Exception as exc:  # noqa: BLE001
-                                    st.error(f"No se pudo mover la tarea: {exc}")
-
-                mark_done = cols[1].checkbox(
-                    "Mark completed after scheduling",
-                    value=True,
-                    key=f"done_{task['id']}",
-                )
+                    else:
+                        st.error(f"Could not read your calendar availability: {exc}")
 
-                if cols[1].button("Schedule now", key=f"schedule_now_{task['id']}"):
-                    try:
-                        event = schedule_task(
-                            st.session_state.credentials, task, mark_complete=mark_done
-                        )
-                        remove_task_from_state(task["id"])
-                        st.success(
-                            f"Scheduled on Google Calendar starting at {event['start']['dateTime']}"
-                        )
-                    except Exception as exc:  # noqa: BLE001
-                        st.error(f"Could not schedule: {exc}")
-
-                with cols[1].popover("Schedule at"):
-                    with st.form(f"schedule_form_{task['id']}"):
-                        schedule_date = st.date_input(
-                            "Schedule date",
-                            value=date.today(),
-                            key=f"date_{task['id']}",
-                        )
-                        schedule_time = st.time_input(
-                            "Schedule time (local)",
-                            value=datetime.now(DEFAULT_TIMEZONE).time().replace(second=0, microsecond=0),
-                            step=300,
-                            key=f"time_{task['id']}",
-                        )
-                        submit_schedule = st.form_submit_button("Confirm Schedule")
-
-                    if submit_schedule:
-                        try:
-                            start_at = datetime.combine(schedule_date, schedule_time).replace(tzinfo=DEFAULT_TIMEZONE)
-                            event = schedule_task(
-                                st.session_state.credentials,
-                                task,
-                                mark_complete=mark_done,
-                                start_time=start_at,
-                            )
-                            remove_task_from_state(task["id"])
-                            st.success(
-                                f"Scheduled on Google Calendar at {event['start']['dateTime']} ({DEFAULT_TIMEZONE})"
-                            )
-                        except Exception as exc:  # noqa: BLE001
-                            st.error(f"Could not schedule at chosen time: {exc}")
-
-                with cols[1].popover("Snooze"):
-                    with st.form(f"snooze_form_{task['id']}"):
-                        snooze_option = st.radio(
-                            "Snooze until",
-                            options=["Tomorrow", "Next Week", "Custom Date"],
-                            horizontal=False,
-                            key=f"snooze_option_{task['id']}",
-                        )
-                        custom_date = None
-                        if snooze_option == "Custom Date":
-                            custom_date = st.date_input(
-                                "Pick date",
-                                value=date.today(),
-                                key=f"snooze_date_{task['id']}",
-                            )
-                        submit_snooze = st.form_submit_button("Confirm Snooze")
-
-                    if submit_snooze:
-                        try:
-                            if snooze_option == "Tomorrow":
-                                days = 1
-                            elif snooze_option == "Next Week":
-                                days = 7
-                            else:
-                                delta = (custom_date - date.today()).days if custom_date else 1
-                                days = max(1, delta)
-
-                            snooze_task(st.session_state.credentials, task, days=days)
-                            remove_task_from_state(task["id"])
-                            st.info(f"Snoozed to {days} day(s) ahead.")
-                        except Exception as exc:  # noqa: BLE001
-                            st.error(f"Could not snooze task: {exc}")
-
-                move_cols = cols[1].columns([2, 1])
-                project_label, project_value = zip(*project_options) if project_options else ([], [])
-                dest = move_cols[0].selectbox(
-                    "Mover a proyecto",
-                    options=project_options,
-                    format_func=lambda opt: opt[0],
-                    index=project_options.index((task["project"], task["tasklist"])) if (task["project"], task["tasklist"]) in project_options else 0,
-                    key=f"move_select_{task['id']}",
+            day_plan = st.session_state.day_plan
+            if day_plan:
+                if not day_plan["placements"]:
+                    st.info("No free slots left in the selected horizon.")
+                for placement in day_plan["placements"]:
+                    st.markdown(
+                        f"{placement['start']:%a %H:%M}–{placement['end']:%H:%M} · "
+                        f"**{placement['task']['title']}** ({placement['task']['project']})"
+                    )
+                if day_plan["unplaced"]:
+                    st.caption(f"{day_plan['unplaced']} tareas no caben en el horizonte.")
+                confirm_cols = st.columns(3)
+                plan_mark_done = confirm_cols[0].checkbox(
+                    "Mark completed", value=True, key="plan_mark_done"
                 )
-                if move_cols[1].button("Mover", key=f"move_btn_{task['id']}"):
-                    try:
-                        moved = move_task(
-                            st.session_state.credentials,
-                            task,
-                            destination_tasklist=dest[1],
-                        )
-                        st.success(f"Tarea movida a '{dest[0]}'")
-                        # Refresca lista
-                        load_tasks()
-                    except Exception as exc:  # noqa: BLE001
-                        st.error(f"No se pudo mover la tarea: {exc}")
+                if day_plan["placements"] and confirm_cols[1].button("Confirmar plan", type="primary", key="plan_confirm"):
+                    queue_mutations(
+                        [
+                            (
+                                placement["task"],
+                                "schedule",
+                                {"mark_complete": plan_mark_done, "start_time": placement["start"]},
+                            )
+                            for placement in day_plan["placements"]
+                        ]
+                    )
+                    st.toast(f"{len(day_plan['placements'])} tareas enviadas a Google Calendar.")
+                    st.session_state.day_plan = None
+                    st.rerun(scope="fragment")
+                if confirm_cols[2].button("Descartar", key="plan_discard"):
+                    st.session_state.day_plan = None
+                    st.rerun(scope="fragment")
+
+        # Read the ticked "Seleccionar" boxes rather than probing session state once per task.
+        selected_ids = [
+            key.removeprefix("select_")
+            for key in st.session_state.keys()
+            if key.startswith("select_") and st.session_state[key]
+        ]
+        selected_tasks = task_frame.ordered(filtered & task_frame.with_ids(selected_ids))
+        if selected_tasks:
+            with st.container(border=True):
+                st.markdown(f"**{len(selected_tasks)} tareas seleccionadas**")
+                bulk_cols = st.columns(4)
+                mutations = []
+                if bulk_cols[0].button("Schedule now", key="bulk_schedule", use_container_width=True):
+                    start_at = round_up_to_five_minutes(datetime.now(DEFAULT_TIMEZONE))
+                    for task in selected_tasks:
+                        mutations.append((task, "schedule", {"mark_complete": True, "start_time": start_at}))
+                        start_at += timedelta(minutes=int(task.get("duration") or 15))
+                if bulk_cols[1].button("Complete", key="bulk_complete", use_container_width=True):
+                    mutations = [(task, "complete", {}) for task in selected_tasks]
+                if bulk_cols[2].button("Snooze 1 day", key="bulk_snooze", use_container_width=True):
+                    mutations = [(task, "snooze", {"days": 1}) for task in selected_tasks]
+                with bulk_cols[3].popover("Mover", use_container_width=True):
+                    bulk_dest = st.selectbox(
+                        "Mover a proyecto",
+                        options=project_options,
+                        format_func=lambda opt: opt[0],
+                        key="bulk_move_select",
+                    )
+                    if st.button("Mover seleccionadas", key="bulk_move_btn"):
+                        mutations = [
+                            (task, "move", {"destination_tasklist": bulk_dest[1], "project": bulk_dest[0]})
+                            for task in selected_tasks
+                        ]
+
+                if mutations:
+                    queue_mutations(mutations)
+                    for task, _, _ in mutations:
+                        st.session_state.pop(f"select_{task['id']}", None)
+                    st.toast(f"{len(mutations)} acciones en cola.")
+                    st.rerun(scope="fragment")
+
+        page_signature = (
+            time_available,
+            st.session_state.filter_mode,
+            st.session_state.filter_date,
+            tuple(st.session_state.filter_tags),
+        )
+        if st.session_state.get("cards_signature") != page_signature:
+            st.session_state.cards_signature = page_signature
+            st.session_state.cards_visible = CARDS_PAGE_SIZE
+
+        visible_tasks = filtered_tasks[: st.session_state.cards_visible]
+        with span("render.cards"):
+            for task in visible_tasks:
+                render_task_card(task, project_options)
+
+        remaining_count = len(filtered_tasks) - len(visible_tasks)
+        if remaining_count > 0:
+            st.caption(f"Mostrando {len(visible_tasks)} de {len(filtered_tasks)} tareas.")
+            if st.button(f"Mostrar {min(CARDS_PAGE_SIZE, remaining_count)} más", key="cards_more"):
+                st.session_state.cards_visible += CARDS_PAGE_SIZE
+                st.rerun(scope="fragment")
+
+
+# If authenticated and tasks haven't been loaded yet, do it automatically once.
+if (
+    st.session_state.credentials
+    and not st.session_state.tasks_loaded
+    and not st.session_state.auto_tasks_attempted
+):
+    st.session_state.auto_tasks_attempted = True
+    load_tasks()
+
+st.markdown("")
+render_snapshot_status()
+render_task_view()
+tracer.end()
+STARTUP.mark("first_render")
@@ -0,0 +1,60 @@
+"""Wall-clock benchmark of ``fetch_tasks`` against the local fake Tasks API.
+
+Run from the project root::
+
+    python -m benchmarks.bench_fetch --latency 0.05
+"""
+from __future__ import annotations
+
+import argparse
+import time
+
+from google.auth.credentials import AnonymousCredentials
+
+from benchmarks.fake_google_api import FakeGoogleApi, make_account
+from src import services
+from src.pool import ServicePool
+from src.ratelimit import REQUEST_EXECUTOR
+
+
+def point_services_at(endpoint: str) -> AnonymousCredentials:
+    """Route the service layer to ``endpoint`` and return credentials to use with it."""
+
+    # The fake has no quota; the token buckets would only measure themselves.
+    REQUEST_EXECUTOR.buckets.clear()
+    services.SERVICE_POOL = ServicePool(
+        client_options={
+            "tasks": {"api_endpoint": endpoint},
+            "calendar": {"api_endpoint": f"{endpoint}calendar/v3/"},
+        }
+    )
+    return AnonymousCredentials()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to each fake request")
+    parser.add_argument("--lists", type=int, nargs="+", default=[1, 10, 60])
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 3])
+    parser.add_argument("--workers", type=int, default=services.DEFAULT_FETCH_CONCURRENCY)
+    args = parser.parse_args()
+
+    print(f"{'lists':>5} {'pages':>5} {'tasks':>7} {'sequential':>11} {'concurrent':>11} {'speedup':>8}")
+    for list_count in args.lists:
+        for page_depth in args.pages:
+            account = make_account(list_count, services.TASKS_PAGE_SIZE * page_depth)
+            with FakeGoogleApi(account, latency=args.latency) as api:
+                creds = point_services_at(api.endpoint)
+                timings = []
+                for workers in (1, args.workers):
+                    started = time.perf_counter()
+                    tasks = services.fetch_tasks(creds, max_workers=workers)
+                    timings.append(time.perf_counter() - started)
+            print(
+                f"{list_count:>5} {page_depth:>5} {len(tasks):>7} "
+                f"{timings[0]:>10.2f}s {timings[1]:>10.2f}s {timings[0] / timings[1]:>7.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()
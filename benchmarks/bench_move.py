@@ -0,0 +1,88 @@
+"""Requests spent moving tasks: copy + delete + reload versus the native ``tasks.move``.
+
+The old path inserted a copy in the destination list, deleted the original
+(one batch round trip each for bulk moves) and then reloaded the task lists
+before the page showed the result. The native path sends one ``tasks.move``
+per task, batched for bulk moves, and patches the local task in place. The
+background revalidation that follows any write is the same for both and is
+left out.
+
+Run from the project root::
+
+    python -m benchmarks.bench_move --moves 1 10 100
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List, MutableMapping
+
+from benchmarks.bench_fetch import point_services_at
+from benchmarks.fake_google_api import FakeGoogleApi, make_account
+from src import services
+from src.batch import MutationQueue, execute_batch
+from src.sync import TaskSyncStore
+
+
+def copy_and_delete(creds, tasks: List[MutableMapping], destination: str, sync_store: TaskSyncStore) -> None:
+    """The old move: insert a copy, delete the original, reload before showing the result."""
+
+    service = services.build_tasks_service(creds)
+    copies = [
+        service.tasks().insert(
+            tasklist=destination,
+            body={"title": task.get("title"), "notes": task.get("notes"), "due": task.get("due")},
+        )
+        for task in tasks
+    ]
+    deletes = [service.tasks().delete(tasklist=task["tasklist"], task=task["id"]) for task in tasks]
+    if len(tasks) == 1:
+        copies[0].execute()
+        deletes[0].execute()
+    else:
+        execute_batch(service, copies)
+        execute_batch(service, deletes)
+    services.fetch_tasks(creds, sync_store=sync_store)
+
+
+def native_move(creds, tasks: List[MutableMapping], destination: str, sync_store: TaskSyncStore) -> None:
+    if len(tasks) == 1:
+        services.move_task(creds, tasks[0], destination)
+        return
+    queue = MutationQueue(creds)
+    for task in tasks:
+        queue.move(task, destination_tasklist=destination)
+    queue.flush()
+
+
+def measure(strategy, move_count: int, list_count: int, latency: float):
+    with FakeGoogleApi(make_account(list_count, max(move_count, 100)), latency=latency) as api:
+        creds = point_services_at(api.endpoint)
+        sync_store = TaskSyncStore(None)
+        tasks = services.fetch_tasks(creds, sync_store=sync_store)
+        movers = [task for task in tasks if task["tasklist"] == "list-0"][:move_count]
+        calls_before, trips_before = api.request_count - api.requests["POST batch"], api.round_trips
+        started = time.perf_counter()
+        strategy(creds, movers, "list-1", sync_store)
+        elapsed = (time.perf_counter() - started) * 1000
+        calls = api.request_count - api.requests["POST batch"] - calls_before
+        round_trips = api.round_trips - trips_before
+    return calls, round_trips, elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--moves", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--lists", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.05, help="seconds added to each fake request")
+    args = parser.parse_args()
+
+    print(f"{'moves':>5} {'strategy':>15} {'API calls':>10} {'round trips':>12} {'time':>10}")
+    for move_count in args.moves:
+        for name, strategy in (("copy + delete", copy_and_delete), ("tasks.move", native_move)):
+            calls, round_trips, elapsed = measure(strategy, move_count, args.lists, args.latency)
+            print(f"{move_count:>5} {name:>15} {calls:>10} {round_trips:>12} {elapsed:>8.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""Load test of multi-user mode: many accounts served by one process against the fake APIs.
+
+Every simulated user gets its own encrypted token, its own Streamlit session
+(``AppTest``) and its own per-account prefetcher, task cache and clients.
+Reports memory and rerun latency per session with all sessions live, then
+the latency of every account reloading its tasks concurrently through the
+shared token store, task cache and client pool. ``AppTest`` swaps a
+process-wide runtime in and out, so the sessions themselves rerun one at
+a time.
+
+Run from the project root::
+
+    python -m benchmarks.bench_multiuser --users 30
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from cryptography.fernet import Fernet
+
+# Read by src.auth / src.tenants at import time.
+os.environ["TURBOORGANIZER_MULTI_USER"] = "1"
+os.environ.setdefault("TURBOORGANIZER_TOKEN_KEY", Fernet.generate_key().decode())
+
+from google.oauth2.credentials import Credentials  # noqa: E402
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from benchmarks.bench_fetch import point_services_at  # noqa: E402
+from benchmarks.fake_google_api import FakeGoogleApi, make_account  # noqa: E402
+from src import services  # noqa: E402
+from src.cache import SharedTaskCache  # noqa: E402
+from src.services import fetch_tasks  # noqa: E402
+from src.sync import TaskSyncStore  # noqa: E402
+from src.tenants import TokenStore  # noqa: E402
+from src.utils import prepare_tasks  # noqa: E402
+
+# Setting session state between runs logs a "missing ScriptRunContext" warning each time.
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    lambda record: "ScriptRunContext" not in record.getMessage()
+)
+APP_PATH = str(Path(__file__).resolve().parent.parent / "app.py")
+WEB_CLIENT = {
+    "client_id": "bench-client",
+    "client_secret": "bench-secret",
+    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+    "token_uri": "https://oauth2.googleapis.com/token",
+    "redirect_uris": ["http://localhost:8501"],
+}
+
+
+def rss_mb() -> float:
+    """Resident set size of this process (Linux)."""
+
+    with open("/proc/self/statm") as handle:
+        return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def user_credentials(index: int) -> Credentials:
+    return Credentials(
+        token=f"token-{index}",
+        refresh_token=f"refresh-{index}",
+        client_id="bench-client",
+        client_secret="bench-secret",
+        expiry=datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1),
+        account=f"user-{index}",
+    )
+
+
+def new_session(creds) -> AppTest:
+    session = AppTest.from_file(APP_PATH, default_timeout=120)
+    session.session_state["credentials"] = creds
+    session.session_state["auto_auth_attempted"] = True
+    session.session_state["filter_mode"] = "Todo"
+    return session
+
+
+def wait_until_loaded(sessions, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    pending = list(sessions)
+    while pending and time.monotonic() < deadline:
+        time.sleep(0.2)
+        for session in list(pending):
+            session.run()
+            if len(session.session_state["task_frame"]):
+                pending.remove(session)
+    if pending:
+        raise TimeoutError(f"{len(pending)} sessions never received their tasks")
+
+
+def percentile(values, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=30)
+    parser.add_argument("--lists", type=int, default=5)
+    parser.add_argument("--tasks", type=int, default=40, help="tasks per list")
+    parser.add_argument("--rounds", type=int, default=3, help="concurrent reruns per session")
+    parser.add_argument("--latency", type=float, default=0.01)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="turbo-multiuser-")
+    os.chdir(workdir)  # tokens/ lands here
+    # A web OAuth client, so the sign-in links render as in a deployment.
+    Path("credentials.json").write_text(json.dumps({"web": WEB_CLIENT}))
+    with FakeGoogleApi(make_account(args.lists, args.tasks), latency=args.latency) as api:
+        point_services_at(api.endpoint)
+        store = TokenStore()
+        accounts = [store.save(user_credentials(index)) for index in range(args.users)]
+
+        # Warm the process (imports, discovery docs) before measuring sessions.
+        warmup = new_session(store.get(accounts[0]))
+        warmup.run()
+        wait_until_loaded([warmup], timeout=60)
+        baseline = rss_mb()
+
+        started = time.perf_counter()
+        sessions = [new_session(store.get(account)) for account in accounts[1:]]
+        for session in sessions:
+            session.run()
+        wait_until_loaded(sessions, timeout=120)
+        loaded_in = time.perf_counter() - started
+        per_session = (rss_mb() - baseline) / len(sessions)
+
+        rerun_ms = []
+        for _ in range(args.rounds):
+            for session in sessions:
+                begun = time.perf_counter()
+                session.run()
+                rerun_ms.append((time.perf_counter() - begun) * 1000)
+        errors = [exc.value for session in sessions for exc in session.exception]
+
+        cache = SharedTaskCache(store_factory=lambda account: TaskSyncStore(None))
+
+        def reload(account: str) -> float:
+            begun = time.perf_counter()
+            creds = store.get(account)
+            cache.load(
+                account,
+                lambda sync_store: prepare_tasks(fetch_tasks(creds, sync_store=sync_store)),
+                max_age=0,  # revalidate every round instead of serving the snapshot
+            )
+            return (time.perf_counter() - begun) * 1000
+
+        reload_ms = []
+        with ThreadPoolExecutor(max_workers=len(accounts)) as pool:
+            for _ in range(args.rounds):
+                reload_ms.extend(pool.map(reload, accounts))
+
+    print(f"users: {args.users}  tasks per user: {args.lists * args.tasks}  workdir: {workdir}")
+    print(f"all sessions loaded in {loaded_in:.1f} s; API requests: {api.request_count}")
+    print(f"memory per session: {per_session:.2f} MB (RSS {baseline:.0f} -> {rss_mb():.0f} MB)")
+    print(
+        f"session rerun: median {statistics.median(rerun_ms):.0f} ms  "
+        f"p95 {percentile(rerun_ms, 0.95):.0f} ms  ({len(rerun_ms)} runs)"
+    )
+    print(
+        f"concurrent reload, {len(accounts)} accounts: median {statistics.median(reload_ms):.0f} ms  "
+        f"p95 {percentile(reload_ms, 0.95):.0f} ms  ({len(reload_ms)} loads)"
+    )
+    print(f"clients pooled: {len(services.SERVICE_POOL)}  session exceptions: {len(errors)}")
+    for message in errors[:3]:
+        print("  ", message)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Per-operation latency of rebuilding discovery clients versus the service pool.
+
+Run from the project root::
+
+    python -m benchmarks.bench_pool --operations 200
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+
+from googleapiclient.discovery import build
+
+from benchmarks.bench_fetch import point_services_at
+from benchmarks.fake_google_api import FakeGoogleApi, make_account
+from src import services
+
+
+def _time_operations(operation, count: int) -> list[float]:
+    samples = []
+    for _ in range(count):
+        started = time.perf_counter()
+        operation()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--operations", type=int, default=200)
+    args = parser.parse_args()
+
+    with FakeGoogleApi(make_account(1, 1)) as api:
+        creds = point_services_at(api.endpoint)
+
+        def rebuilt() -> None:
+            # What every call used to do: parse discovery and open a new connection.
+            service = build(
+                "tasks",
+                "v1",
+                credentials=creds,
+                cache_discovery=False,
+                client_options={"api_endpoint": api.endpoint},
+            )
+            service.tasklists().list(maxResults=1).execute()
+
+        def pooled() -> None:
+            services.build_tasks_service(creds).tasklists().list(maxResults=1).execute()
+
+        pooled()  # warm the pool
+        for label, operation in (("rebuild per call", rebuilt), ("service pool", pooled)):
+            samples = _time_operations(operation, args.operations)
+            print(
+                f"{label:<17} median {statistics.median(samples):7.2f} ms  "
+                f"p95 {statistics.quantiles(samples, n=20)[-1]:7.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Cold-start cost: importing the app's modules and the first API call, each in a fresh interpreter.
+
+Run from the project root::
+
+    python -m benchmarks.bench_startup --runs 5
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+
+from benchmarks.fake_google_api import FakeGoogleApi, make_account
+
+# Runs in the child interpreter; mirrors the import list of ``app.py`` minus Streamlit.
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+from src.perf import STARTUP
+from src import auth, outbox, scheduler, services
+from src.frame import TaskFrame
+imported = time.perf_counter()
+from benchmarks.bench_fetch import point_services_at
+creds = point_services_at(sys.argv[1])
+services.fetch_tasks(creds)
+fetched = time.perf_counter()
+print(json.dumps({
+    "imports": (imported - started) * 1000,
+    "first_fetch": (fetched - imported) * 1000,
+    "to_first_call": (fetched - started) * 1000,
+    "milestones": dict(STARTUP.rows()),
+}))
+"""
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--lists", type=int, default=5)
+    args = parser.parse_args()
+
+    samples = []
+    with FakeGoogleApi(make_account(args.lists, 20)) as api:
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, "-c", _CHILD, api.endpoint], check=True, capture_output=True, text=True
+            ).stdout
+            samples.append(json.loads(output.splitlines()[-1]))
+
+    for key in ("imports", "first_fetch", "to_first_call"):
+        values = [sample[key] for sample in samples]
+        print(f"{key:>13}: median {statistics.median(values):7.1f} ms  min {min(values):7.1f} ms")
+    print("milestones (last run):", samples[-1]["milestones"])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Filter and removal cost of the list pipeline versus ``TaskStore`` indexes and ``TaskFrame`` masks.
+
+Run from the project root::
+
+    python -m benchmarks.bench_store --tasks 10000
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import timeit
+from datetime import date, timedelta
+
+from src.frame import TaskFrame
+from src.models import Task
+from src.store import TaskStore
+from src.utils import filter_tasks_by_time, prepare_tasks
+
+TAGS = ["deep", "call", "errand", "home", "admin", "read", "write", "gym"]
+
+
+def make_prepared_tasks(count: int, seed: int = 7) -> list[Task]:
+    rng = random.Random(seed)
+    today = date.today()
+    tasks = []
+    for index in range(count):
+        due = today + timedelta(days=rng.randint(-5, 20)) if rng.random() < 0.6 else None
+        tags = " ".join(f"#{tag}" for tag in rng.sample(TAGS, rng.randint(0, 2)))
+        tasks.append(
+            {
+                "id": f"task-{index}",
+                "title": f"Task {index} {tags}",
+                "project": rng.choice(["Buzón", "Work", "Home", "Rutinas"]),
+                "tasklist": f"list-{index % 4}",
+                "duration": rng.choice([None, 15, 30, 45, 60, 90, 120]),
+                "notes": None,
+                "due": f"{due.isoformat()}T00:00:00+00:00" if due else None,
+                "is_routine": False,
+                "is_overdue": False,
+            }
+        )
+    return prepare_tasks(tasks)
+
+
+def list_pipeline(tasks, minutes, day, tags):
+    filtered = filter_tasks_by_time(tasks, minutes)
+    filtered = [task for task in filtered if task["is_inbox"]]
+    all_tags = set()
+    for task in filtered:
+        all_tags |= task["tags"]
+    filtered = [task for task in filtered if task["due_day"] == day]
+    return [task for task in filtered if task["tags"].intersection(tags)], all_tags
+
+
+def store_pipeline(store: TaskStore, minutes, day, tags):
+    ids = store.ids_fitting(minutes) & store.inbox_ids()
+    all_tags = store.tags_among(ids)
+    ids &= store.ids_due_on(day)
+    ids &= store.ids_with_any_tag(tags)
+    return store.ordered(ids), all_tags
+
+
+def frame_pipeline(frame: TaskFrame, minutes, day, tags):
+    mask = frame.fitting(minutes) & frame.inbox()
+    all_tags = frame.tags_among(mask)
+    mask &= frame.due_on(day)
+    mask &= frame.with_any_tag(tags)
+    return frame.ordered(mask), all_tags
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--tasks", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    tasks = make_prepared_tasks(args.tasks)
+    dicts = [dict(task) for task in tasks]
+    store = TaskStore(tasks)
+    frame = TaskFrame(tasks)
+    day, tags = date.today(), ["deep", "call"]
+    assert list_pipeline(tasks, 60, day, tags)[0] == store_pipeline(store, 60, day, tags)[0]
+    assert store_pipeline(store, 60, day, tags) == frame_pipeline(frame, 60, day, tags)
+
+    for label, run in (
+        ("list filters", lambda: list_pipeline(dicts, 60, day, tags)),
+        ("store filters", lambda: store_pipeline(store, 60, day, tags)),
+        ("frame filters", lambda: frame_pipeline(frame, 60, day, tags)),
+    ):
+        seconds = timeit.timeit(run, number=args.repeat) / args.repeat
+        print(f"{label:<15} {seconds * 1000:8.3f} ms per rerun")
+
+    victims = [task["id"] for task in tasks[: args.repeat]]
+    remaining = list(tasks)
+
+    def list_remove() -> None:
+        nonlocal remaining
+        for task_id in victims:
+            remaining = [task for task in remaining if task.get("id") != task_id]
+
+    def store_remove() -> None:
+        for task_id in victims:
+            store.remove(task_id)
+
+    def frame_remove() -> None:
+        for task_id in victims:
+            frame.remove(task_id)
+
+    for label, run in (
+        ("list removal", list_remove),
+        ("store removal", store_remove),
+        ("frame removal", frame_remove),
+    ):
+        seconds = timeit.timeit(run, number=1) / len(victims)
+        print(f"{label:<15} {seconds * 1000:8.3f} ms per task")
+
+
+if __name__ == "__main__":
+    main()
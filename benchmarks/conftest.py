@@ -0,0 +1,66 @@
+"""Fixtures for the pytest-benchmark suite.
+
+Run from the project root::
+
+    python -m pytest benchmarks --benchmark-storage=benchmarks/baselines --benchmark-compare
+"""
+from __future__ import annotations
+
+from typing import Callable, Dict, Iterator, List, Tuple
+
+import pytest
+
+from benchmarks.bench_fetch import point_services_at
+from benchmarks.fake_google_api import FakeGoogleApi, make_account
+from src import services
+from src.ratelimit import REQUEST_EXECUTOR
+from src.utils import prepare_tasks
+
+# Large enough that per-task costs dominate, small enough to calibrate quickly.
+SUITE_LISTS = 10
+SUITE_TASKS_PER_LIST = 1_000
+
+
+@pytest.fixture(autouse=True)
+def restore_rate_limits() -> Iterator[None]:
+    """Put back the token buckets ``point_services_at`` clears for the fake."""
+
+    original_buckets = dict(REQUEST_EXECUTOR.buckets)
+    yield
+    REQUEST_EXECUTOR.buckets.clear()
+    REQUEST_EXECUTOR.buckets.update(original_buckets)
+
+
+@pytest.fixture
+def fake_google() -> Iterator[Callable[..., Tuple[FakeGoogleApi, object]]]:
+    """Start fake APIs on demand: ``api, creds = fake_google(account, latency=...)``."""
+
+    original_pool = services.SERVICE_POOL
+    servers: List[FakeGoogleApi] = []
+
+    def start(account: Dict[str, Dict], **options) -> Tuple[FakeGoogleApi, object]:
+        api = FakeGoogleApi(account, **options).__enter__()
+        servers.append(api)
+        return api, point_services_at(api.endpoint)
+
+    yield start
+    for api in servers:
+        api.__exit__(None, None, None)
+    services.SERVICE_POOL = original_pool
+
+
+@pytest.fixture(scope="session")
+def task_records() -> List[Dict]:
+    """``fetch_tasks`` output for the synthetic suite account, fetched once."""
+
+    original_pool, original_buckets = services.SERVICE_POOL, dict(REQUEST_EXECUTOR.buckets)
+    with FakeGoogleApi(make_account(SUITE_LISTS, SUITE_TASKS_PER_LIST)) as api:
+        tasks = services.fetch_tasks(point_services_at(api.endpoint))
+    services.SERVICE_POOL = original_pool
+    REQUEST_EXECUTOR.buckets.update(original_buckets)
+    return tasks
+
+
+@pytest.fixture(scope="session")
+def prepared_tasks(task_records: List[Dict]) -> List[Dict]:
+    return prepare_tasks([task.copy() for task in task_records])
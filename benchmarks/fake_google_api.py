@@ -0,0 +1,427 @@
+"""Minimal local stand-in for the Google Tasks and Calendar REST APIs used by the benchmarks."""
+from __future__ import annotations
+
+import hashlib
+import http.client
+import itertools
+import json
+import random
+import threading
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from email.parser import BytesParser, Parser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Sequence, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+TAGS = ("deep", "call", "errand", "home", "admin", "read", "write", "gym")
+DURATIONS = (15, 30, 45, 60, 90, 120)
+
+
+def _duration_hint(rng: random.Random, minutes: int) -> str:
+    hours, rest = divmod(minutes, 60)
+    hints = [f"[{minutes}m]", f"{minutes}m", f"({minutes} m)", ""]
+    if hours:
+        hints.append(f"{hours}h{rest}m" if rest else f"{hours}h")
+    return rng.choice(hints)
+
+
+def _timestamp(moment: datetime) -> str:
+    return moment.astimezone(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def make_account(
+    list_count: int, tasks_per_list: int, seed: int = 7, today: date | None = None
+) -> Dict[str, Dict]:
+    """Build ``list_count`` task lists with ``tasks_per_list`` synthetic tasks each.
+
+    The first list is the inbox ("Buzón") and the second the routines list;
+    tasks carry ``#tags``, duration hints in the formats people write
+    (``[45m]``, ``1h30m``, none at all) and due dates around ``today``.
+    """
+
+    rng = random.Random(seed)
+    today = today or date.today()
+    updated = _timestamp(datetime.now(timezone.utc) - timedelta(days=1))
+    account: Dict[str, Dict] = {}
+    for list_index in range(list_count):
+        list_id = f"list-{list_index}"
+        title = ("Buzón", "Rutinas")[list_index] if list_index < 2 else f"Project {list_index}"
+        tasks = []
+        for task_index in range(tasks_per_list):
+            tags = " ".join(f"#{tag}" for tag in rng.sample(TAGS, rng.randint(0, 2)))
+            hint = _duration_hint(rng, rng.choice(DURATIONS))
+            task = {
+                "id": f"{list_id}-task-{task_index}",
+                "title": " ".join(part for part in (f"Task {task_index}", tags, hint) if part),
+                "notes": rng.choice([None, "Generated by the benchmark", f"Context #{rng.choice(TAGS)}"]),
+                "status": "needsAction",
+                "updated": updated,
+            }
+            if rng.random() < 0.6:
+                due = today + timedelta(days=rng.randint(-5, 20))
+                task["due"] = f"{due.isoformat()}T00:00:00.000Z"
+            tasks.append(task)
+        account[list_id] = {"title": title, "tasks": tasks}
+    return account
+
+
+def make_busy(
+    start: datetime, days: int, per_day: int = 4, seed: int = 7
+) -> List[Dict[str, str]]:
+    """Synthetic freeBusy slots: ``per_day`` meetings of 30-90 minutes between 8:00 and 20:00."""
+
+    rng = random.Random(seed)
+    busy = []
+    for day in range(days):
+        midnight = (start + timedelta(days=day)).replace(hour=0, minute=0, second=0, microsecond=0)
+        for _ in range(per_day):
+            begin = midnight + timedelta(minutes=rng.randrange(8 * 60, 20 * 60, 15))
+            end = begin + timedelta(minutes=rng.choice((30, 45, 60, 90)))
+            busy.append({"start": begin.isoformat(), "end": end.isoformat()})
+    return sorted(busy, key=lambda slot: slot["start"])
+
+
+def _parse_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+class FakeGoogleApi:
+    """Serve an in-memory account over HTTP with an optional per-request latency.
+
+    Tasks endpoints support listing (with ``maxResults``/``pageToken``,
+    ``updatedMin``, ``showCompleted`` and ``showDeleted``), get, insert,
+    patch, delete and ``move`` (which takes the task out of its old list without a
+    tombstone, the worst case for incremental sync); Calendar supports ``freeBusy`` and event insert/get/delete/list,
+    where listing honours ``timeMin``, paging and ``syncToken`` (tokens
+    older than ``expire_sync_tokens()`` get 410 Gone). ``POST /token``
+    answers OAuth refresh grants with tokens that last ``token_lifetime``
+    seconds, and with ``invalid_scope`` when the grant asks for a scope
+    outside ``granted_scopes`` (when set). List responses carry ETags and answer
+    ``If-None-Match`` with 304. ``max_page_size`` caps every page to force
+    pagination. Batch requests are unpacked and each call is answered as if
+    sent alone, without its own latency. ``requests`` counts calls per
+    ``"METHOD resource"``; a batch counts once as ``"POST batch"`` as well.
+    ``round_trips`` counts HTTP requests from clients, a batch being one.
+    """
+
+    def __init__(
+        self,
+        account: Dict[str, Dict],
+        latency: float = 0.0,
+        max_page_size: int | None = None,
+        busy: Sequence[Dict[str, str]] = (),
+        token_lifetime: int = 3600,
+        granted_scopes: Sequence[str] | None = None,
+    ) -> None:
+        self.account = account
+        self.latency = latency
+        self.max_page_size = max_page_size
+        self.busy = list(busy)
+        self.token_lifetime = token_lifetime
+        self.granted_scopes = None if granted_scopes is None else set(granted_scopes)
+        self.events: Dict[str, Dict] = {}
+        self._event_versions: Dict[str, int] = {}
+        self._event_version = 0
+        self._sync_epoch = 0
+        self.request_count = 0
+        self.round_trips = 0
+        self.requests: Counter = Counter()
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def __enter__(self) -> "FakeGoogleApi":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _count(self, method: str, resource: str, batched: bool = False) -> None:
+        with self._lock:
+            self.request_count += 1
+            self.requests[f"{method} {resource}"] += 1
+            if not batched:
+                self.round_trips += 1
+
+    def put_event(self, event: Dict) -> Dict:
+        """Create or replace a calendar event, as if made in another client."""
+
+        with self._lock:
+            event = {"status": "confirmed", **event}
+            event.setdefault("id", f"event-{next(self._ids)}")
+            self.events[event["id"]] = event
+            self._event_version += 1
+            self._event_versions[event["id"]] = self._event_version
+            return event
+
+    def expire_sync_tokens(self) -> None:
+        with self._lock:
+            self._sync_epoch += 1
+
+    def _list_events(self, query: Dict[str, str]) -> Tuple[List[Dict] | None, str]:
+        """Events to list and the next sync token; ``None`` for an expired token."""
+
+        with self._lock:
+            next_token = f"{self._sync_epoch}:{self._event_version}"
+            if "syncToken" in query:
+                epoch, since = map(int, query["syncToken"].split(":"))
+                if epoch != self._sync_epoch:
+                    return None, next_token
+                changed = [
+                    event for event_id, event in self.events.items() if self._event_versions[event_id] > since
+                ]
+                return changed, next_token
+            since_time = _parse_time(query["timeMin"]) if "timeMin" in query else None
+            live = [
+                event
+                for event in self.events.values()
+                if event.get("status") != "cancelled"
+                and (since_time is None or _parse_time(event["end"]["dateTime"]) >= since_time)
+            ]
+            return live, next_token
+
+    def _new_id(self, prefix: str) -> str:
+        with self._lock:
+            return f"{prefix}-{next(self._ids)}"
+
+    def _handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def log_message(self, *args) -> None:  # noqa: D401 - silence access logs
+                return
+
+            def _route(self, method: str):
+                url = urlparse(self.path)
+                query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+                parts = [unquote(part) for part in url.path.strip("/").split("/")]
+                if parts == ["token"]:
+                    resource = "token"
+                elif parts[0] == "batch":
+                    resource = "batch"
+                elif "calendar" in parts:
+                    resource = "freebusy" if parts[-1] == "freeBusy" else "events"
+                elif parts[-3:] == ["users", "@me", "lists"]:
+                    resource = "tasklists"
+                elif parts[-1] == "move":
+                    resource = "move"
+                else:
+                    resource = "tasks"
+                batched = bool(self.headers.get("X-Fake-Batched"))
+                api._count(method, resource, batched)
+                if api.latency and not batched:
+                    time.sleep(api.latency)
+                return parts, query
+
+            def _body(self) -> Dict:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def _tasklist(self, parts: List[str]) -> Dict | None:
+                index = len(parts) - 1 - parts[::-1].index("lists") if "lists" in parts else -1
+                if index < 0 or index + 1 >= len(parts):
+                    return None
+                return api.account.get(parts[index + 1])
+
+            def _find_task(self, tasklist: Dict, task_id: str) -> Dict | None:
+                return next((task for task in tasklist["tasks"] if task["id"] == task_id), None)
+
+            def do_GET(self) -> None:  # noqa: N802
+                parts, query = self._route("GET")
+                if parts[-3:] == ["users", "@me", "lists"]:
+                    items = [{"id": list_id, "title": data["title"]} for list_id, data in api.account.items()]
+                    self._send_page(items, query)
+                elif "calendar" in parts and parts[-1] == "events":
+                    items, next_token = api._list_events(query)
+                    if items is None:
+                        self._send(410, {"error": {"code": 410, "message": "Sync token is no longer valid."}}, etag=False)
+                    else:
+                        self._send_page(items, query, last_page={"nextSyncToken": next_token, "timeZone": "UTC"})
+                elif "calendar" in parts and "events" in parts:
+                    event = api.events.get(parts[-1])
+                    if event is None:
+                        self._not_found()
+                    else:
+                        self._send(200, event)
+                elif parts[-1] == "tasks" and (tasklist := self._tasklist(parts)) is not None:
+                    self._send_page(self._visible(tasklist["tasks"], query), query)
+                elif parts[-2:-1] == ["tasks"] and (tasklist := self._tasklist(parts)) is not None:
+                    task = self._find_task(tasklist, parts[-1])
+                    if task is None or task.get("deleted"):
+                        self._not_found()
+                    else:
+                        self._send(200, task, etag=False)
+                else:
+                    self._not_found()
+
+            def do_POST(self) -> None:  # noqa: N802
+                parts, query = self._route("POST")
+                if parts[0] == "batch":
+                    self._batch()
+                    return
+                if parts == ["token"]:
+                    form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode())
+                    asked = set(" ".join(form.get("scope", [])).split())
+                    if api.granted_scopes is not None and not asked <= api.granted_scopes:
+                        self._send(400, {"error": "invalid_scope"}, etag=False)
+                        return
+                    token = {"access_token": api._new_id("access"), "expires_in": api.token_lifetime}
+                    self._send(200, token, etag=False)
+                    return
+                body = self._body()
+                if parts[-1] == "freeBusy":
+                    calendars = {item["id"]: {"busy": api.busy} for item in body.get("items", [])}
+                    self._send(200, {"calendars": calendars}, etag=False)
+                elif "calendar" in parts and parts[-1] == "events":
+                    event_id = body.get("id") or api._new_id("event")
+                    if event_id in api.events:
+                        self._send(409, {"error": {"code": 409, "message": "The requested identifier already exists."}})
+                        return
+                    self._send(200, api.put_event({**body, "id": event_id}), etag=False)
+                elif parts[-1] == "move" and (tasklist := self._tasklist(parts)) is not None:
+                    task = self._find_task(tasklist, parts[-2])
+                    destination = api.account.get(query.get("destinationTasklist", tasklist))
+                    if task is None or task.get("deleted") or destination is None:
+                        self._not_found()
+                        return
+                    tasklist["tasks"].remove(task)
+                    task["updated"] = _timestamp(datetime.now(timezone.utc))
+                    destination["tasks"].insert(0, task)
+                    self._send(200, task, etag=False)
+                elif parts[-1] == "tasks" and (tasklist := self._tasklist(parts)) is not None:
+                    task = {**body, "id": api._new_id("task"), "status": "needsAction"}
+                    task["updated"] = _timestamp(datetime.now(timezone.utc))
+                    tasklist["tasks"].append(task)
+                    self._send(200, task, etag=False)
+                else:
+                    self._not_found()
+
+            def do_PATCH(self) -> None:  # noqa: N802
+                parts, _ = self._route("PATCH")
+                tasklist = self._tasklist(parts)
+                task = self._find_task(tasklist, parts[-1]) if tasklist else None
+                if task is None or task.get("deleted"):
+                    self._not_found()
+                    return
+                task.update(self._body())
+                task["updated"] = _timestamp(datetime.now(timezone.utc))
+                self._send(200, task, etag=False)
+
+            def do_DELETE(self) -> None:  # noqa: N802
+                parts, _ = self._route("DELETE")
+                if "calendar" in parts:
+                    event = api.events.get(parts[-1])
+                    if event is None or event.get("status") == "cancelled":
+                        self._not_found()
+                        return
+                    api.put_event({**event, "status": "cancelled"})
+                    self.send_response(204)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                tasklist = self._tasklist(parts)
+                task = self._find_task(tasklist, parts[-1]) if tasklist else None
+                if task is None or task.get("deleted"):
+                    self._not_found()
+                    return
+                task["deleted"] = True
+                task["updated"] = _timestamp(datetime.now(timezone.utc))
+                self.send_response(204)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            @staticmethod
+            def _visible(tasks: List[Dict], query: Dict[str, str]) -> List[Dict]:
+                since = _parse_time(query["updatedMin"]) if "updatedMin" in query else None
+                show_completed = query.get("showCompleted", "true") == "true"
+                show_deleted = query.get("showDeleted", "false") == "true"
+                return [
+                    task
+                    for task in tasks
+                    if (show_deleted or not task.get("deleted"))
+                    and (show_completed or task.get("status") != "completed")
+                    and (since is None or _parse_time(task["updated"]) >= since)
+                ]
+
+            def _send_page(self, items: List[Dict], query: Dict[str, str], last_page: Dict | None = None) -> None:
+                page_size = int(query.get("maxResults", 100))
+                if api.max_page_size:
+                    page_size = min(page_size, api.max_page_size)
+                offset = int(query.get("pageToken", 0))
+                body: Dict = {"items": items[offset : offset + page_size]}
+                if offset + page_size < len(items):
+                    body["nextPageToken"] = str(offset + page_size)
+                elif last_page:
+                    body.update(last_page)
+                self._send(200, body)
+
+            def _batch(self) -> None:
+                """Answer a multipart/mixed batch by replaying each part against this server."""
+
+                raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                message = BytesParser().parsebytes(
+                    f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode("utf-8") + raw
+                )
+                host, port = api._server.server_address[:2]
+                connection = http.client.HTTPConnection(host, port)
+                boundary = f"batch_{api._new_id('response')}"
+                chunks = []
+                for part in message.get_payload():
+                    request_line, _, rest = part.get_payload().partition("\n")
+                    method, path, _ = request_line.strip().split(" ", 2)
+                    inner = Parser().parsestr(rest)
+                    headers = {
+                        key: value for key, value in inner.items() if key.lower() != "content-length"
+                    }
+                    headers["X-Fake-Batched"] = "1"
+                    body = inner.get_payload() or None
+                    connection.request(method, path, body=body.encode("utf-8") if body else None, headers=headers)
+                    response = connection.getresponse()
+                    payload = response.read().decode("utf-8")
+                    chunks.append(
+                        f"--{boundary}\r\nContent-Type: application/http\r\n"
+                        f"Content-ID: <response-{part['Content-ID'][1:-1]}>\r\n\r\n"
+                        f"HTTP/1.1 {response.status} {response.reason}\r\n"
+                        f"Content-Type: application/json\r\n\r\n{payload}\r\n"
+                    )
+                connection.close()
+                content = ("".join(chunks) + f"--{boundary}--\r\n").encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", f"multipart/mixed; boundary={boundary}")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def _not_found(self) -> None:
+                self._send(404, {"error": {"code": 404, "message": "Not found"}})
+
+            def _send(self, status: int, body: Dict, etag: bool = True) -> None:
+                if status == 200 and etag:
+                    body["etag"] = '"' + hashlib.sha1(json.dumps(body).encode("utf-8")).hexdigest() + '"'
+                    if self.headers.get("If-None-Match") == body["etag"]:
+                        self.send_response(304)
+                        self.send_header("Content-Length", "0")
+                        self.end_headers()
+                        return
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        return Handler
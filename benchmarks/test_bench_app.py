@@ -0,0 +1,47 @@
+"""One task-card action in the running app (``AppTest``) as the task count grows."""
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import pytest
+
+from benchmarks.bench_store import make_prepared_tasks
+from src.frame import TaskFrame
+
+pytest.importorskip("pytest_benchmark")
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+APP_PATH = str(Path(__file__).resolve().parent.parent / "app.py")
+
+# Setting session state between runs logs a "missing ScriptRunContext" warning each time.
+logging.getLogger("streamlit.runtime.scriptrunner_utils.script_run_context").addFilter(
+    lambda record: "ScriptRunContext" not in record.getMessage()
+)
+
+
+@pytest.mark.parametrize("count", [100, 1_000, 10_000])
+def test_card_action_rerun(benchmark, tmp_path, monkeypatch, count):
+    # outbox.sqlite3 and friends land in the temporary directory.
+    monkeypatch.chdir(tmp_path)
+    session = AppTest.from_file(APP_PATH, default_timeout=60)
+    session.session_state["credentials"] = object()
+    session.session_state["auto_auth_attempted"] = True
+    session.session_state["tasks_loaded"] = True
+    session.session_state["filter_mode"] = "Todo"
+    session.session_state["task_frame"] = TaskFrame(make_prepared_tasks(count))
+    session.run()
+
+    def select_card():
+        # Selecting a card reruns the task view; the card stays on the page.
+        box = next(box for box in session.checkbox if box.key.startswith("select_"))
+        box.set_value(not box.value)
+
+    benchmark.pedantic(session.run, setup=select_card, rounds=5, iterations=1)
+
+    tracer = session.session_state["tracer"]
+    benchmark.extra_info["task_view_ms"] = tracer.timings.last("task_view") * 1000
+    assert not session.exception
+    assert len(session.session_state["task_frame"]) == count
+    # Every round toggles the same card, and there is an odd number of them.
+    assert any(markdown.value == "**1 tareas seleccionadas**" for markdown in session.markdown)
@@ -0,0 +1,179 @@
+"""Credential loading and background token refresh against the fake OAuth endpoint."""
+from __future__ import annotations
+
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import pytest
+from google.oauth2.credentials import Credentials
+
+from benchmarks.fake_google_api import FakeGoogleApi
+from src.auth import SCOPES, CredentialManager
+from src.tenants import TokenStore
+
+pytest.importorskip("pytest_benchmark")
+
+
+@pytest.fixture
+def token_api(monkeypatch):
+    """Fake API whose ``/token`` endpoint answers refresh grants."""
+
+    with FakeGoogleApi({}) as api:
+        # ``from_authorized_user_file`` ignores the file's token_uri.
+        monkeypatch.setattr(
+            "google.oauth2.credentials._GOOGLE_OAUTH2_TOKEN_ENDPOINT", f"{api.endpoint}token"
+        )
+        yield api
+
+
+def write_token(path: Path, expires_in: float, scopes=SCOPES) -> None:
+    expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=expires_in)
+    creds = Credentials(
+        token="initial",
+        refresh_token="refresh",
+        client_id="client",
+        client_secret="secret",
+        scopes=scopes,
+        expiry=expiry,
+    )
+    path.write_text(creds.to_json())
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@pytest.mark.parametrize("source", ["disk", "cached"])
+def test_load_credentials(benchmark, tmp_path, source):
+    token_path = tmp_path / "token.json"
+    write_token(token_path, expires_in=3600)
+    if source == "disk":
+        creds = benchmark(Credentials.from_authorized_user_file, str(token_path), SCOPES)
+    else:
+        manager = CredentialManager(token_path)
+        creds = benchmark(manager.get)
+        manager.stop()
+
+    assert creds.valid
+
+
+def test_token_refreshed_before_expiry(tmp_path, token_api):
+    token_path = tmp_path / "token.json"
+    # Still valid for google-auth, but inside the manager's margin.
+    write_token(token_path, expires_in=400)
+    manager = CredentialManager(token_path, margin=600)
+    creds = manager.get()
+    assert creds.token == "initial"
+
+    assert wait_for(lambda: manager.refreshes == 1)
+    manager.stop()
+
+    assert manager.get() is creds
+    assert creds.token.startswith("access-")
+    assert Credentials.from_authorized_user_file(str(token_path)).token == creds.token
+    assert token_api.requests["POST token"] == 1
+    assert manager.seconds_until_refresh() > 0
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_token_from_before_new_scopes_still_refreshes(tmp_path, token_api):
+    old_scopes = [scope for scope in SCOPES if not scope.endswith("calendar.freebusy")]
+    token_api.granted_scopes = set(old_scopes)
+    token_path = tmp_path / "token.json"
+    write_token(token_path, expires_in=-60, scopes=old_scopes)
+    manager = CredentialManager(token_path, authorize=None)
+
+    # Asking for the current SCOPES would get invalid_scope; the stored grant is reused.
+    creds = manager.get()
+    manager.stop()
+
+    assert creds.valid and creds.token.startswith("access-")
+    assert sorted(creds.scopes) == sorted(old_scopes)
+
+
+def test_concurrent_managers_refresh_once(tmp_path, token_api):
+    token_path = tmp_path / "token.json"
+    write_token(token_path, expires_in=400)
+    # Two managers on one file stand in for two server processes.
+    managers = [CredentialManager(token_path, margin=600) for _ in range(2)]
+    credentials = [manager.get() for manager in managers]
+
+    assert wait_for(lambda: all(creds.token != "initial" for creds in credentials))
+    for manager in managers:
+        manager.stop()
+
+    assert credentials[0].token == credentials[1].token
+    assert token_api.requests["POST token"] == 1
+
+
+def test_token_store_encrypts_per_account(tmp_path):
+    from cryptography.fernet import Fernet
+
+    store = TokenStore(tmp_path, key=Fernet.generate_key(), max_accounts=1)
+    expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+    accounts = [
+        store.save(
+            Credentials(
+                token=f"token-{user}",
+                refresh_token=f"refresh-{user}",
+                client_id="client",
+                client_secret="secret",
+                expiry=expiry,
+                account=user,
+            )
+        )
+        for user in ("ana", "luis")
+    ]
+
+    assert len(set(accounts)) == 2 and len(store.managers) == 1
+    assert b"refresh-ana" not in (tmp_path / f"{accounts[0]}.token").read_bytes()
+    # Evicted managers are rebuilt from disk; a sign-in without a refresh token keeps the stored one.
+    store.save(Credentials(token="token-ana-2", client_id="client", client_secret="secret", account="ana"))
+    creds = store.get(accounts[0])
+    assert (creds.token, creds.refresh_token) == ("token-ana-2", "refresh-ana")
+    store.delete(accounts[1])
+    with pytest.raises(FileNotFoundError):
+        store.get(accounts[1])
+
+
+def test_sign_in_asks_for_consent_without_refresh_token(tmp_path):
+    from cryptography.fernet import Fernet
+
+    expiry = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(hours=1)
+    asked = []
+
+    def authorize(force_consent):
+        asked.append(force_consent)
+        # Google only includes a refresh token when the consent screen was shown.
+        refresh_token = f"refresh-{len(asked)}" if force_consent else None
+        return Credentials(
+            token=f"token-{len(asked)}",
+            refresh_token=refresh_token,
+            client_id="client",
+            client_secret="secret",
+            expiry=expiry,
+        )
+
+    manager = CredentialManager(tmp_path / "token.json", authorize=authorize)
+    manager.get()
+    reauthorized = manager.get(force_reauth=True)
+    manager.clear()
+    assert not manager.has_refresh_token()
+    after_disconnect = manager.get()
+    manager.stop()
+
+    assert asked == [True, False, True]
+    assert reauthorized.refresh_token == "refresh-1" and after_disconnect.refresh_token == "refresh-3"
+
+    store = TokenStore(tmp_path / "tokens", key=Fernet.generate_key())
+    creds = Credentials(
+        token="token", refresh_token="refresh", client_id="client", client_secret="secret", expiry=expiry, account="ana"
+    )
+    assert not store.has_refresh_token("unknown")
+    assert store.has_refresh_token(store.save(creds))
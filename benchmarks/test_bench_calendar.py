@@ -0,0 +1,107 @@
+"""Calendar mirror: overlap lookups and incremental sync against the fake Calendar API."""
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from benchmarks.fake_google_api import make_account
+from src import services
+from src.auth import account_key
+from src.calendar_mirror import CalendarMirror, IntervalIndex
+
+pytest.importorskip("pytest_benchmark")
+
+NOW = datetime.now(timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def make_events(days: int, per_day: int = 8, seed: int = 7):
+    rng = random.Random(seed)
+    events = []
+    for day in range(days):
+        midnight = (NOW + timedelta(days=day)).replace(hour=0)
+        for slot in range(per_day):
+            begin = midnight + timedelta(minutes=rng.randrange(8 * 60, 20 * 60, 15))
+            end = begin + timedelta(minutes=rng.choice((30, 45, 60, 90)))
+            events.append(
+                {
+                    "id": f"event-{day}-{slot}",
+                    "summary": f"Meeting {day}-{slot}",
+                    "start": {"dateTime": begin.isoformat()},
+                    "end": {"dateTime": end.isoformat()},
+                }
+            )
+    return events
+
+
+@pytest.mark.parametrize("method", ["linear", "index"])
+def test_overlap_lookup(benchmark, method):
+    mirror = CalendarMirror(None)
+    events = make_events(365)
+    for event in events:
+        mirror.record(event)
+    entries = mirror.index.entries()
+    start = mirror.index.entries()[len(entries) // 2][0]
+    end = start + 60
+
+    if method == "linear":
+        found = benchmark(lambda: [entry for entry in entries if entry[0] < end and entry[1] > start])
+    else:
+        found = benchmark(mirror.index.overlapping, start, end)
+
+    assert found and found == [entry for entry in entries if entry[0] < end and entry[1] > start]
+
+
+def test_interval_index_long_events():
+    index = IntervalIndex([(0, 10_000, "offsite"), (500, 530, "standup")])
+    index.add("lunch", 600, 660)
+
+    assert [entry[2] for entry in index.overlapping(9_000, 9_030)] == ["offsite"]
+    assert [entry[2] for entry in index.overlapping(610, 620)] == ["offsite", "lunch"]
+    assert index.remove("offsite") and not index.overlapping(9_000, 9_030)
+    assert index.prune(560) == 1 and "standup" not in index
+
+
+def test_sync_is_incremental(fake_google, tmp_path):
+    api, creds = fake_google({})
+    for event in make_events(30):
+        api.put_event(event)
+    mirror = CalendarMirror(tmp_path / "calendar_mirror.json")
+
+    assert mirror.sync(creds, now=NOW) == 240
+    assert mirror.sync(creds, now=NOW) == 0
+    assert api.requests["GET events"] == 2
+
+    api.put_event({**make_events(1)[0], "status": "cancelled"})
+    api.put_event({**make_events(1)[1], "id": "moved", "transparency": "transparent"})
+    assert mirror.sync(creds, now=NOW) == 2
+    assert "event-0-0" not in mirror.index and "moved" not in mirror.index
+    assert len(mirror.index) == 239
+
+    reloaded = CalendarMirror.load(tmp_path / "calendar_mirror.json")
+    assert reloaded.index.entries() == mirror.index.entries() and reloaded.sync_token == mirror.sync_token
+    assert reloaded.sync(creds, now=NOW) == 0
+
+    api.expire_sync_tokens()
+    assert reloaded.sync(creds, now=NOW) == 240  # the 239 busy events and the free one
+    assert reloaded.index.entries() == mirror.index.entries()
+
+
+def test_schedule_task_updates_mirror(fake_google, prepared_tasks):
+    api, creds = fake_google(make_account(1, 10))
+    mirror = CalendarMirror(None, account=account_key(creds))
+    mirror.sync(creds)
+    services.add_event_listener(mirror.on_event)
+    task = {**prepared_tasks[0], "tasklist": "list-0", "id": "list-0-task-0", "duration": 30}
+    start = NOW + timedelta(days=1)
+    try:
+        event = services.schedule_task(creds, task, start_time=start)
+    finally:
+        services.remove_event_listener(mirror.on_event)
+
+    requests = api.request_count
+    conflicts = mirror.conflicts(start + timedelta(minutes=15), start + timedelta(hours=1))
+    assert [conflict["id"] for conflict in conflicts] == [event["id"]]
+    assert not mirror.conflicts(start + timedelta(minutes=30), start + timedelta(hours=1))
+    assert api.request_count == requests
@@ -0,0 +1,56 @@
+"""Decision Engine filters and task ordering on dict lists, ``TaskStore`` and ``TaskFrame``."""
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, List
+
+import pytest
+
+from benchmarks.bench_store import frame_pipeline, list_pipeline, make_prepared_tasks, store_pipeline
+from src.frame import TaskFrame, _sort_order
+from src.models import Task
+from src.services import task_sort_key
+from src.store import TaskStore
+
+pytest.importorskip("pytest_benchmark")
+
+SIZES = [1_000, 10_000, 100_000]
+_prepared: Dict[int, List[Task]] = {}
+
+
+def tasks_of_size(count: int) -> List[Task]:
+    if count not in _prepared:
+        _prepared[count] = make_prepared_tasks(count)
+    return _prepared[count]
+
+
+@pytest.mark.parametrize("pipeline", ["list", "store", "frame"])
+@pytest.mark.parametrize("count", SIZES)
+def test_filter_pipeline_scaling(benchmark, count, pipeline):
+    tasks = tasks_of_size(count)
+    day, tags = date.today(), ["deep", "call"]
+    expected = store_pipeline(TaskStore(tasks), 60, day, tags)
+    if pipeline == "list":
+        # The pre-store path: plain dict records filtered with comprehensions.
+        dicts = [dict(task) for task in tasks]
+        result = benchmark(list_pipeline, dicts, 60, day, tags)
+        assert [task["id"] for task in result[0]] == [task.id for task in expected[0]]
+        assert result[1] == expected[1]
+    elif pipeline == "store":
+        result = benchmark(store_pipeline, TaskStore(tasks), 60, day, tags)
+        assert result == expected
+    else:
+        result = benchmark(frame_pipeline, TaskFrame(tasks), 60, day, tags)
+        assert result == expected
+
+
+@pytest.mark.parametrize("method", ["sorted", "numpy"])
+@pytest.mark.parametrize("count", SIZES)
+def test_sort_scaling(benchmark, count, method):
+    tasks = tasks_of_size(count)
+    if method == "sorted":
+        result = benchmark(sorted, tasks, key=task_sort_key)
+    else:
+        result = [tasks[row] for row in benchmark(_sort_order, tasks)]
+
+    assert result == sorted(tasks, key=task_sort_key)
@@ -0,0 +1,346 @@
+"""Service-layer benchmarks against the fake Google APIs."""
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from datetime import datetime, timedelta, timezone
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from benchmarks.fake_google_api import make_account, make_busy
+from src import services
+from src.async_services import AsyncGoogleClient
+from src.auth import account_key
+from src.batch import MutationQueue
+from src.cache import SharedTaskCache
+from src.discovery import DiscoveryCache, DiscoveryDocumentError
+from src.outbox import Outbox, OutboxWorker, _is_permanent
+from src.ratelimit import REQUEST_EXECUTOR
+from src.scheduler import plan_schedule
+from src.sync import TaskSyncStore
+
+pytest.importorskip("pytest_benchmark")
+
+# Per-request latency of the fake; enough for concurrency to matter.
+LATENCY = 0.005
+
+
+@pytest.mark.parametrize("list_count,page_size", [(1, 100), (20, 100), (20, 25)])
+def test_fetch_tasks_cold(benchmark, fake_google, list_count, page_size):
+    _, creds = fake_google(make_account(list_count, 100), latency=LATENCY, max_page_size=page_size)
+
+    tasks = benchmark.pedantic(services.fetch_tasks, args=(creds,), rounds=5, iterations=1)
+
+    assert len(tasks) == list_count * 100
+
+
+def test_fetch_tasks_revalidated(benchmark, fake_google, tmp_path):
+    api, creds = fake_google(make_account(20, 100), latency=LATENCY)
+    sync_store = TaskSyncStore(tmp_path / "tasks_sync.json")
+    services.fetch_tasks(creds, sync_store=sync_store)
+    rounds = []
+
+    def revalidate():
+        rounds.append(None)
+        return services.fetch_tasks(creds, sync_store=sync_store)
+
+    tasks = benchmark.pedantic(revalidate, rounds=5, iterations=1)
+
+    # One conditional request per list and round (``--benchmark-disable`` runs a single round).
+    assert len(tasks) == 2_000
+    assert api.requests["GET tasks"] == 20 * (1 + len(rounds))
+
+
+def test_unchanged_refresh_does_not_rewrite_sync_store(fake_google, tmp_path):
+    api, creds = fake_google(make_account(3, 10))
+    path = tmp_path / "tasks_sync.json"
+    sync_store = TaskSyncStore.load(path)
+    # The first delta after the full fetch still brings completed tasks back.
+    for _ in range(2):
+        services.fetch_tasks(creds, sync_store=sync_store)
+    written = path.stat().st_mtime_ns
+    sync_store = TaskSyncStore.load(path)
+
+    services.fetch_tasks(creds, sync_store=sync_store)
+    assert path.stat().st_mtime_ns == written
+
+    # A renamed list is only a new title on a 304 task list, and must still be saved.
+    api.account["list-1"]["title"] = "Renamed"
+    services.fetch_tasks(creds, sync_store=sync_store)
+    assert not sync_store.changed
+    assert TaskSyncStore.load(path).lists["list-1"]["title"] == "Renamed"
+
+
+def test_plan_schedule_week(benchmark, fake_google, prepared_tasks):
+    start = datetime.now(timezone.utc).replace(hour=8, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=7)
+    _, creds = fake_google({}, busy=make_busy(start, 7))
+
+    placements, unplaced = benchmark.pedantic(
+        plan_schedule,
+        args=(creds, prepared_tasks[:500], end),
+        kwargs={"start": start, "working_hours": (9, 18)},
+        rounds=10,
+        iterations=1,
+    )
+
+    assert placements and len(placements) + len(unplaced) == 500
+
+
+def test_schedule_task(benchmark, fake_google, prepared_tasks):
+    _, creds = fake_google(make_account(1, 10))
+    task = {**prepared_tasks[0], "tasklist": "list-0", "id": "list-0-task-0"}
+
+    event = benchmark(services.schedule_task, creds, task)
+
+    assert event["summary"] == task["title"]
+
+
+def test_move_task(benchmark, fake_google):
+    api, creds = fake_google(make_account(2, 100), latency=LATENCY)
+    sources = [task for task in services.fetch_tasks(creds) if task["tasklist"] == "list-0"]
+    sent = []
+
+    def next_move():
+        sent.append(sources[len(sent)])
+        return (creds, sent[-1], "list-1"), {}
+
+    moved = benchmark.pedantic(services.move_task, setup=next_move, rounds=20, iterations=1)
+
+    # One request per move (``--benchmark-disable`` runs a single round); the task keeps its id and fields.
+    assert api.requests["POST move"] == len(sent) and not api.requests["DELETE tasks"]
+    original = next(task for task in make_account(2, 100)["list-0"]["tasks"] if task["id"] == moved["id"])
+    assert moved["notes"] == original["notes"] and moved in api.account["list-1"]["tasks"]
+
+
+def test_bulk_move_is_one_call_per_task(fake_google, tmp_path):
+    api, creds = fake_google(make_account(3, 100), latency=LATENCY)
+    sync_store = TaskSyncStore(tmp_path / "tasks_sync.json")
+    tasks = services.fetch_tasks(creds, sync_store=sync_store)
+    queue = MutationQueue(creds)
+    for task in tasks:
+        if task["tasklist"] == "list-2":
+            queue.move(task, destination_tasklist="list-1")
+
+    results = queue.flush()
+
+    assert len(results) == 100 and all(result["error"] is None for result in results)
+    assert (api.requests["POST batch"], api.requests["POST move"]) == (2, 100)
+    # The old list sends no tombstone; the sync store still drops the moved tasks from it.
+    reloaded = services.fetch_tasks(creds, sync_store=sync_store)
+    assert len(reloaded) == 300 and len({task["id"] for task in reloaded}) == 300
+    assert not any(task["tasklist"] == "list-2" for task in reloaded)
+
+
+def test_discovery_requires_move_destination():
+    from googleapiclient.discovery_cache import get_static_doc
+
+    document = json.loads(get_static_doc("tasks", "v1"))
+    del document["resources"]["tasks"]["methods"]["move"]["parameters"]["destinationTasklist"]
+
+    # Documents packaged before google-api-python-client 2.136.0 look like this.
+    with pytest.raises(DiscoveryDocumentError, match="destinationTasklist"):
+        DiscoveryCache._validate("tasks", "v1", json.dumps(document))
+
+
+def test_bulk_move_confirms_missing_tasks(fake_google):
+    api, creds = fake_google(make_account(3, 10))
+    tasks = [task for task in services.fetch_tasks(creds) if task["tasklist"] == "list-2"]
+    # One task already reached the destination (a retried move), one was deleted elsewhere.
+    landed, deleted = tasks[0], tasks[1]
+    api.account["list-2"]["tasks"].remove(next(t for t in api.account["list-2"]["tasks"] if t["id"] == landed["id"]))
+    api.account["list-1"]["tasks"].append({"id": landed["id"], "title": landed["title"], "status": "needsAction"})
+    next(t for t in api.account["list-2"]["tasks"] if t["id"] == deleted["id"])["deleted"] = True
+    queue = MutationQueue(creds)
+    for task in (landed, deleted):
+        queue.move(task, destination_tasklist="list-1")
+
+    results = queue.flush()
+
+    assert results[0]["error"] is None and results[0]["response"]["id"] == landed["id"]
+    assert results[1]["error"] is not None and results[1]["error"].resp.status == 404
+
+
+@pytest.mark.parametrize("on_disk", [True, False])
+def test_outbox_drains_bulk_actions_in_one_batch(fake_google, tmp_path, on_disk):
+    api, creds = fake_google(make_account(1, 20))
+    tasks = services.fetch_tasks(creds)
+    # Multi-user mode keeps the outbox in memory.
+    outbox = Outbox(tmp_path / "outbox.sqlite3" if on_disk else None)
+    start = datetime(2030, 1, 7, 9, tzinfo=timezone.utc)
+    for offset, task in enumerate(tasks[:10]):
+        outbox.enqueue("me", "schedule", task, start_time=start + timedelta(minutes=30 * offset))
+    outbox.enqueue("me", "complete", tasks[10])
+    outbox.enqueue("me", "snooze", tasks[0], days=1)  # waits for the schedule of the same task
+
+    assert [row["task"]["id"] for row in outbox.due("me")] == [task["id"] for task in tasks[:11]]
+    worker = OutboxWorker(outbox, "me", creds, poll_seconds=0.01).start()
+    try:
+        deadline = time.monotonic() + 10
+        while outbox.pending("me") and time.monotonic() < deadline:
+            time.sleep(0.01)
+    finally:
+        worker.stop(timeout=5)
+
+    assert not outbox.pending("me") and not outbox.failures("me")
+    # One calendar batch and one tasks batch for the first eleven rows; the snooze goes alone.
+    assert api.requests["POST events"] == 10 and api.requests["POST batch"] == 2
+
+
+def test_sync_store_full_apply(benchmark):
+    lists = {
+        f"list-{index}": [{"id": f"list-{index}-task-{task}"} for task in range(500)] for index in range(40)
+    }
+
+    def full_sync():
+        store = TaskSyncStore(None)
+        for tasklist_id, items in lists.items():
+            store.apply(tasklist_id, tasklist_id, items, "2030-01-01T00:00:00+00:00", full=True)
+        return store
+
+    store = benchmark(full_sync)
+
+    assert sum(len(tasks) for _, _, tasks in store.iter_tasks()) == 20_000
+    # A full response that holds a task from another list means it moved there.
+    later = "2030-01-02T00:00:00+00:00"
+    store.apply("list-1", "list-1", lists["list-1"] + [{"id": "list-0-task-0"}], later, full=True)
+    store.apply("list-0", "list-0", [{"id": "list-0-task-1", "deleted": True}], later, full=False)
+    assert "list-0-task-0" not in store.lists["list-0"]["tasks"]
+    assert "list-0-task-0" in store.lists["list-1"]["tasks"]
+    assert len(store.lists["list-0"]["tasks"]) == 498
+
+
+def test_forget_deletes_released_store(fake_google, tmp_path):
+    api, creds = fake_google(make_account(2, 10))
+    path = tmp_path / "tasks_sync.json"
+    cache = SharedTaskCache(store_factory=lambda account: TaskSyncStore.load(path))
+    cache.load("me", lambda sync_store: services.fetch_tasks(creds, sync_store=sync_store))
+    assert path.exists()
+
+    # Disconnect retires the prefetcher (which releases the store) before forgetting the account.
+    cache.release("me")
+    cache.forget("me")
+
+    assert not path.exists()
+
+
+def test_shared_cache_ttl_and_write_invalidation(fake_google):
+    api, creds = fake_google(make_account(2, 10))
+    cache = SharedTaskCache(max_accounts=2, store_factory=lambda account: TaskSyncStore(None))
+    account = account_key(creds)
+    services.add_write_listener(cache.on_write)
+
+    def fetch(sync_store):
+        return services.fetch_tasks(creds, sync_store=sync_store)
+
+    try:
+        tasks = cache.load(account, fetch)
+        assert cache.load(account, fetch) is tasks and api.requests["GET tasks"] == 2
+        # A shorter ``max_age`` (the auto-refresh interval) revalidates: one 304 per list.
+        assert cache.load(account, fetch, max_age=0) == tasks and api.requests["GET tasks"] == 4
+
+        services.mark_task_complete(creds, tasks[0])
+        reloaded = cache.load(account, fetch)
+        assert tasks[0]["id"] not in {task["id"] for task in reloaded}
+
+        # A write landing while a fetch is in flight keeps its result from counting as fresh.
+        def fetch_then_write(sync_store):
+            result = fetch(sync_store)
+            services.mark_task_complete(creds, reloaded[0])
+            return result
+
+        cache.load(account, fetch_then_write, max_age=0)
+        assert cache.age(account) is None
+        assert reloaded[0]["id"] not in {task["id"] for task in cache.load(account, fetch)}
+    finally:
+        services.remove_write_listener(cache.on_write)
+
+    for other in ("other-1", "other-2"):
+        cache.load(other, lambda sync_store: [])
+    assert len(cache) == 2 and cache.age(account) is None
+
+
+def test_outbox_retries_quota_errors():
+    def forbidden(reason):
+        body = {"error": {"code": 403, "errors": [{"reason": reason}], "message": reason}}
+        return HttpError(httplib2.Response({"status": 403}), json.dumps(body).encode())
+
+    assert not _is_permanent(forbidden("userRateLimitExceeded"))
+    assert _is_permanent(forbidden("insufficientPermissions"))
+
+
+def test_single_user_outbox_survives_reconsent(tmp_path):
+    from google.oauth2.credentials import Credentials
+
+    before = Credentials(token="a", refresh_token="first", client_id="client")
+    after = Credentials(token="b", refresh_token="second", client_id="client")
+    assert account_key(before) == account_key(after)
+    assert account_key(Credentials(token="c", client_id="client", account="user-1")) != account_key(after)
+
+    outbox = Outbox(tmp_path / "outbox.sqlite3")
+    outbox.enqueue("legacy-refresh-token-key", "complete", {"id": "task-1", "tasklist": "list-0"})
+
+    assert outbox.claim(account_key(after)) == 1
+    assert [row["task"]["id"] for row in outbox.pending(account_key(after))] == ["task-1"]
+
+
+def _async_client(api, creds) -> AsyncGoogleClient:
+    return AsyncGoogleClient(creds, tasks_url=f"{api.endpoint}tasks/v1", calendar_url=f"{api.endpoint}calendar/v3")
+
+
+def test_async_fetch_tasks_and_busy(benchmark, fake_google):
+    start = datetime.now(timezone.utc).replace(hour=8, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=7)
+    api, creds = fake_google(make_account(20, 100), latency=LATENCY, busy=make_busy(start, 7))
+    expected = services.fetch_tasks(creds)
+
+    async def load():
+        async with _async_client(api, creds) as client:
+            return await client.fetch_tasks_and_busy(start, end)
+
+    tasks, busy = benchmark.pedantic(lambda: asyncio.run(load()), rounds=5, iterations=1)
+
+    assert [task["id"] for task in tasks] == [task["id"] for task in expected]
+    assert [task["duration"] for task in tasks] == [task["duration"] for task in expected]
+    assert busy == api.busy
+
+
+def test_async_writes_are_idempotent_and_notify(fake_google):
+    api, creds = fake_google(make_account(2, 10))
+    tasks = [task for task in services.fetch_tasks(creds) if task["tasklist"] == "list-0"]
+    written, events = [], []
+
+    def on_write(_creds, task):
+        written.append(task["id"])
+
+    def on_event(_creds, event):
+        events.append(event["id"])
+
+    services.add_write_listener(on_write)
+    services.add_event_listener(on_event)
+    requests_before = REQUEST_EXECUTOR.stats()["requests"]
+
+    async def replay():
+        async with _async_client(api, creds) as client:
+            first = await client.schedule_task(tasks[0], event_id="replayed0")
+            # A replay after a lost response finds the event and the moved task instead of failing.
+            second = await client.schedule_task(tasks[0], event_id="replayed0")
+            moved = await client.move_task(tasks[1], "list-1")
+            again = await client.move_task(tasks[1], "list-1")
+            return first, second, moved, again
+
+    try:
+        first, second, moved, again = asyncio.run(replay())
+    finally:
+        services.remove_write_listener(on_write)
+        services.remove_event_listener(on_event)
+
+    assert first["id"] == second["id"] == "replayed0" and list(api.events) == ["replayed0"]
+    assert moved["id"] == again["id"] == tasks[1]["id"] and api.requests["POST move"] == 2
+    assert written == [tasks[0]["id"], tasks[0]["id"], tasks[1]["id"], tasks[1]["id"]]
+    assert events == ["replayed0", "replayed0"]
+    # Every attempt went through the shared executor.
+    assert REQUEST_EXECUTOR.stats()["requests"] - requests_before == 6
@@ -0,0 +1,185 @@
+"""Benchmarks of the pure parsing, filtering, indexing (``DurationIndex``) and packing helpers."""
+from __future__ import annotations
+
+import json
+import pickle
+import re
+from datetime import date, datetime, timedelta, timezone
+
+import httplib2
+import pytest
+from googleapiclient.errors import HttpError
+
+from benchmarks.bench_store import frame_pipeline, list_pipeline, store_pipeline
+from benchmarks.fake_google_api import make_busy
+from src.frame import TaskFrame
+from src.ratelimit import is_insufficient_scope, is_rate_limited
+from src.scheduler import _to_minutes, free_gaps, pack_tasks, working_windows
+from src.store import TaskStore
+from src.utils import (
+    DurationIndex,
+    filter_tasks_by_time,
+    parse_task_duration,
+    parse_task_durations,
+    prepare_tasks,
+)
+
+pytest.importorskip("pytest_benchmark")
+
+# The duration regex ``parse_task_duration`` used before the tokenizer, kept
+# as the reference for its semantics.
+LEGACY_DURATION_PATTERN = re.compile(
+    r"(?<!\d)(?:(?P<hours>\d+)\s*h)?\s*(?:(?P<minutes>\d+)\s*m)?(?![a-zA-Z0-9])",
+    re.IGNORECASE,
+)
+
+
+def legacy_parse_task_duration(title, notes=None, default=15):
+    text = f"{title or ''} {notes or ''}".lower()
+    for match in LEGACY_DURATION_PATTERN.finditer(text):
+        hours, minutes = match.group("hours"), match.group("minutes")
+        total = int(hours or 0) * 60 + int(minutes or 0)
+        if total > 0:
+            return total
+    return default
+
+
+@pytest.mark.parametrize(
+    "title,notes,expected",
+    [
+        ("Write 80m", None, 80),
+        ("Deploy 1h20m", None, 80),
+        ("Review [45m]", None, 45),
+        ("Call 2 h", None, 120),
+        ("Call 1h", "30m", 90),
+        ("Call 30", "m then more", 30),
+        ("Plan 1h 20mins", None, 60),
+        ("Plan 1h20mins", None, 15),
+        ("Gym 0m", "notes 25m", 25),
+        ("Read", None, 15),
+    ],
+)
+def test_parse_task_duration_cases(title, notes, expected):
+    assert parse_task_duration(title, notes) == expected == legacy_parse_task_duration(title, notes)
+
+
+def test_parse_task_duration_matches_legacy_pattern(task_records):
+    texts = [(task["title"], task["notes"]) for task in task_records]
+    texts += [(f"{title} 1h", f"{minutes}m {notes or ''}") for (title, notes), minutes in zip(texts[:200], range(200))]
+
+    assert [parse_task_duration(title, notes) for title, notes in texts] == [
+        legacy_parse_task_duration(title, notes) for title, notes in texts
+    ]
+
+
+def test_parse_task_duration(benchmark, task_records):
+    texts = [(task["title"], task["notes"]) for task in task_records]
+
+    durations = benchmark(lambda: [parse_task_duration(title, notes) for title, notes in texts])
+
+    assert len(durations) == len(texts)
+
+
+def test_parse_task_durations_batch(benchmark, task_records):
+    durations = benchmark(parse_task_durations, task_records)
+
+    assert durations == [parse_task_duration(task["title"], task["notes"]) for task in task_records]
+
+
+def test_filter_tasks_by_time(benchmark, prepared_tasks):
+    fitting = benchmark(filter_tasks_by_time, prepared_tasks, 60)
+
+    assert all(task["duration"] <= 60 for task in fitting)
+
+
+def test_duration_index_top_fitting(benchmark, prepared_tasks):
+    index = DurationIndex(prepared_tasks)
+    fitting = filter_tasks_by_time(prepared_tasks, 60)
+
+    top = benchmark(index.top_fitting, 60, 20)
+
+    assert top == fitting[:20]
+    assert index.fitting(60) == fitting and index.count_fitting(60) == len(fitting)
+    # "Indefinido" keeps every task, including the ones without a duration.
+    assert index.fitting(None) == filter_tasks_by_time(prepared_tasks, None)
+
+
+def test_pickle_task_records(benchmark, task_records):
+    """Session-state serialization of slotted ``Task`` records versus plain dicts."""
+
+    as_dicts = [dict(task) for task in task_records]
+    payload = benchmark(pickle.dumps, task_records)
+
+    assert pickle.loads(payload) == task_records
+    assert len(payload) < len(pickle.dumps(as_dicts))
+
+
+def test_prepare_tasks(benchmark, task_records):
+    prepared = benchmark(lambda: prepare_tasks([dict(task) for task in task_records]))
+
+    assert len(prepared) == len(task_records)
+
+
+@pytest.mark.parametrize("pipeline", ["list", "store", "frame"])
+def test_filter_pipeline(benchmark, prepared_tasks, pipeline):
+    day, tags = date.today(), ["deep", "call"]
+    if pipeline == "list":
+        result = benchmark(list_pipeline, prepared_tasks, 60, day, tags)
+    elif pipeline == "store":
+        result = benchmark(store_pipeline, TaskStore(prepared_tasks), 60, day, tags)
+    else:
+        result = benchmark(frame_pipeline, TaskFrame(prepared_tasks), 60, day, tags)
+
+    assert result[0] == list_pipeline(prepared_tasks, 60, day, tags)[0]
+
+
+@pytest.mark.parametrize(
+    "hours,expected",
+    [
+        ((24, 24), []),
+        ((0, 24), [(0, 1440), (1440, 2880)]),
+        ((9, 18), [(540, 1080), (1980, 2520)]),
+    ],
+)
+def test_working_windows_slider_edges(hours, expected):
+    start = datetime(2030, 1, 7, tzinfo=timezone.utc)
+    origin = _to_minutes(start)
+
+    windows = working_windows(start, start + timedelta(days=2), timezone.utc, hours)
+
+    assert [(begin - origin, end - origin) for begin, end in windows] == expected
+
+
+def forbidden(errors_reason, details_reason=None):
+    error = {"code": 403, "message": "denied", "errors": [{"reason": errors_reason}]}
+    if details_reason is not None:
+        error["details"] = [{"@type": "type.googleapis.com/google.rpc.ErrorInfo", "reason": details_reason}]
+    return HttpError(httplib2.Response({"status": 403}), json.dumps({"error": error}).encode())
+
+
+def test_insufficient_scope_is_recognised():
+    assert is_insufficient_scope(forbidden("insufficientPermissions"))
+    assert is_insufficient_scope(forbidden("insufficientPermissions", "ACCESS_TOKEN_SCOPE_INSUFFICIENT"))
+    assert not is_insufficient_scope(forbidden("rateLimitExceeded"))
+
+
+def test_quota_403_is_rate_limited():
+    # googleapiclient keeps only ``details`` when both lists are present.
+    assert is_rate_limited(forbidden("rateLimitExceeded", "RATE_LIMIT_EXCEEDED"))
+    assert is_rate_limited(forbidden("userRateLimitExceeded", "SOMETHING_ELSE"))
+    assert is_rate_limited(forbidden("forbidden", "RATE_LIMIT_EXCEEDED"))
+    assert not is_rate_limited(forbidden("insufficientPermissions", "ACCESS_TOKEN_SCOPE_INSUFFICIENT"))
+
+
+def test_pack_tasks(benchmark, prepared_tasks):
+    start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    end = start + timedelta(days=14)
+    busy = [
+        (_to_minutes(datetime.fromisoformat(slot["start"])), _to_minutes(datetime.fromisoformat(slot["end"])))
+        for slot in make_busy(start, 14)
+    ]
+    gaps = free_gaps(working_windows(start, end, timezone.utc, (9, 18)), busy)
+
+    placements, unplaced = benchmark(pack_tasks, prepared_tasks, gaps, timezone.utc)
+
+    assert len(placements) + len(unplaced) == len(prepared_tasks)
@@ -0,0 +1,260 @@
+"""Asyncio client for the Google Tasks and Calendar REST APIs.
+
+Mirrors the operations in ``services`` on a single shared ``httpx.AsyncClient``
+so independent calls (e.g. loading tasks while reading free/busy) overlap
+instead of blocking the script thread one after another. Requests go through
+the shared ``REQUEST_EXECUTOR`` token buckets and retry policy, and writes
+notify the same listeners as the synchronous layer.
+"""
+from __future__ import annotations
+
+import asyncio
+from datetime import datetime, timezone
+from typing import Dict, List, MutableMapping, Tuple
+from urllib.parse import quote
+
+import httplib2
+import httpx
+from google.auth.transport.requests import Request
+from googleapiclient.errors import HttpError
+
+from .ratelimit import REQUEST_EXECUTOR, RequestExecutor
+from .services import (
+    DEFAULT_FETCH_CONCURRENCY,
+    TASKLISTS_PAGE_SIZE,
+    TASKS_PAGE_SIZE,
+    _list_records,
+    already_applied,
+    event_body,
+    new_event_id,
+    notify_event,
+    notify_write,
+    snooze_body,
+    task_sort_key,
+)
+
+TASKS_API_URL = "https://tasks.googleapis.com/tasks/v1"
+CALENDAR_API_URL = "https://www.googleapis.com/calendar/v3"
+DEFAULT_TIMEOUT_SECONDS = 30.0
+
+
+def _http_error(response: httpx.Response) -> HttpError:
+    """The ``HttpError`` googleapiclient would raise, so the retry and idempotency checks apply."""
+
+    headers = {key.lower(): value for key, value in response.headers.items()}
+    resp = httplib2.Response({**headers, "status": response.status_code})
+    resp.reason = response.reason_phrase
+    return HttpError(resp, response.content, uri=str(response.request.url))
+
+
+class AsyncGoogleClient:
+    """Async Tasks/Calendar operations sharing one HTTP session.
+
+    Use as an async context manager. At most ``concurrency`` requests are in
+    flight at once; expired credentials are refreshed once, off the event loop.
+    Token-bucket waits and retry backoff of ``executor`` run on worker threads.
+    """
+
+    def __init__(
+        self,
+        creds,
+        concurrency: int = DEFAULT_FETCH_CONCURRENCY,
+        tasks_url: str = TASKS_API_URL,
+        calendar_url: str = CALENDAR_API_URL,
+        executor: RequestExecutor = REQUEST_EXECUTOR,
+    ) -> None:
+        self.creds = creds
+        self.tasks_url = tasks_url.rstrip("/")
+        self.calendar_url = calendar_url.rstrip("/")
+        self.executor = executor
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._refresh_lock = asyncio.Lock()
+        self._client: httpx.AsyncClient | None = None
+
+    async def __aenter__(self) -> "AsyncGoogleClient":
+        self._client = httpx.AsyncClient(timeout=DEFAULT_TIMEOUT_SECONDS)
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def _auth_headers(self) -> Dict[str, str]:
+        if getattr(self.creds, "expired", False) and getattr(self.creds, "refresh_token", None):
+            async with self._refresh_lock:
+                if self.creds.expired:
+                    await asyncio.to_thread(self.creds.refresh, Request())
+        headers: Dict[str, str] = {}
+        if getattr(self.creds, "token", None):
+            self.creds.apply(headers)
+        return headers
+
+    async def _send(self, method: str, url: str, params: Dict, body: Dict | None) -> Dict:
+        async with self._semaphore:
+            try:
+                response = await self._client.request(
+                    method, url, params=params, json=body, headers=await self._auth_headers()
+                )
+            except httpx.TransportError as exc:
+                raise ConnectionError(str(exc)) from exc
+        if response.is_error:
+            raise _http_error(response)
+        return response.json() if response.content else {}
+
+    async def _request(
+        self,
+        method: str,
+        url: str,
+        params: Dict | None = None,
+        body: Dict | None = None,
+        idempotent: bool = True,
+    ) -> Dict:
+        """Send one request with ``RequestExecutor.execute`` semantics."""
+
+        if self._client is None:
+            raise RuntimeError("AsyncGoogleClient must be used as an async context manager")
+        api = "calendar" if url.startswith(self.calendar_url) else "tasks"
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        attempt = 0
+        while True:
+            await asyncio.to_thread(self.executor.throttle, api)
+            try:
+                return await self._send(method, url, params, body)
+            except Exception as exc:  # noqa: BLE001
+                if not self.executor.should_retry(exc, attempt, idempotent):
+                    self.executor.failed(exc)
+                    raise
+                attempt += 1
+                await asyncio.to_thread(self.executor.backoff, attempt, exc)
+
+    async def _list_all_pages(self, url: str, params: Dict) -> List[Dict]:
+        items: List[Dict] = []
+        page_token = None
+        while True:
+            response = await self._request("GET", url, params={**params, "pageToken": page_token})
+            items.extend(response.get("items", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return items
+
+    def _tasks_url(self, tasklist: str, task_id: str | None = None) -> str:
+        url = f"{self.tasks_url}/lists/{quote(tasklist, safe='')}/tasks"
+        return f"{url}/{quote(task_id, safe='')}" if task_id else url
+
+    def _events_url(self, event_id: str | None = None) -> str:
+        url = f"{self.calendar_url}/calendars/primary/events"
+        return f"{url}/{quote(event_id, safe='')}" if event_id else url
+
+    async def fetch_tasks(self) -> List[MutableMapping]:
+        """Async version of ``services.fetch_tasks`` (without incremental sync)."""
+
+        projects = await self._list_all_pages(
+            f"{self.tasks_url}/users/@me/lists", {"maxResults": TASKLISTS_PAGE_SIZE}
+        )
+        today = datetime.now(timezone.utc).date()
+        responses = await asyncio.gather(
+            *(
+                self._list_all_pages(
+                    self._tasks_url(project.get("id")),
+                    {
+                        "maxResults": TASKS_PAGE_SIZE,
+                        "showCompleted": "false",
+                        "showHidden": "false",
+                    },
+                )
+                for project in projects
+            )
+        )
+        collected: List[MutableMapping] = []
+        for project, items in zip(projects, responses):
+            project_name = project.get("title", "Untitled Project")
+            collected.extend(_list_records(items, project_name, project.get("id"), today))
+        return sorted(collected, key=task_sort_key)
+
+    async def free_busy(self, start: datetime, end: datetime, calendar_id: str = "primary") -> List[Dict]:
+        response = await self._request(
+            "POST",
+            f"{self.calendar_url}/freeBusy",
+            body={
+                "timeMin": start.isoformat(),
+                "timeMax": end.isoformat(),
+                "items": [{"id": calendar_id}],
+            },
+        )
+        return response.get("calendars", {}).get(calendar_id, {}).get("busy", [])
+
+    async def mark_task_complete(self, task: MutableMapping) -> Dict:
+        updated = await self._request(
+            "PATCH",
+            self._tasks_url(task["tasklist"], task["id"]),
+            body={"id": task["id"], "status": "completed"},
+        )
+        notify_write(self.creds, task)
+        return updated
+
+    async def schedule_task(
+        self,
+        task: MutableMapping,
+        mark_complete: bool = False,
+        start_time: datetime | None = None,
+        event_id: str | None = None,
+    ) -> Dict:
+        """Async version of ``services.schedule_task``; a replayed ``event_id`` returns the existing event."""
+
+        event_id = event_id or new_event_id()
+        try:
+            event = await self._request(
+                "POST",
+                self._events_url(),
+                params={"sendUpdates": "none"},
+                body=event_body(task, start_time, event_id),
+            )
+        except HttpError as exc:
+            if not already_applied(exc, "insert_event"):
+                raise
+            event = await self._request("GET", self._events_url(event_id))
+        notify_event(self.creds, event)
+        if mark_complete:
+            await self.mark_task_complete(task)
+        else:
+            notify_write(self.creds, task)
+        return event
+
+    async def snooze_task(self, task: MutableMapping, days: int = 1) -> Dict:
+        updated = await self._request(
+            "PATCH", self._tasks_url(task["tasklist"], task["id"]), body=snooze_body(task, days)
+        )
+        notify_write(self.creds, task)
+        return updated
+
+    async def move_task(self, task: MutableMapping, destination_tasklist: str) -> Dict:
+        """Async version of ``services.move_task``; a move that already landed reads the task back."""
+
+        try:
+            moved = await self._request(
+                "POST",
+                f"{self._tasks_url(task['tasklist'], task['id'])}/move",
+                params={"destinationTasklist": destination_tasklist},
+            )
+        except HttpError as exc:
+            if not already_applied(exc, "move"):
+                raise
+            moved = await self._request("GET", self._tasks_url(destination_tasklist, task["id"]))
+        notify_write(self.creds, task)
+        return moved
+
+    async def fetch_tasks_and_busy(self, start: datetime, end: datetime) -> Tuple[List[MutableMapping], List[Dict]]:
+        """Load tasks and read free/busy concurrently."""
+
+        return tuple(await asyncio.gather(self.fetch_tasks(), self.free_busy(start, end)))
+
+
+def fetch_tasks_and_busy(creds, start: datetime, end: datetime, **client_options) -> Tuple[List[MutableMapping], List[Dict]]:
+    """Blocking entry point for code that is not running an event loop."""
+
+    async def run() -> Tuple[List[MutableMapping], List[Dict]]:
+        async with AsyncGoogleClient(creds, **client_options) as client:
+            return await client.fetch_tasks_and_busy(start, end)
+
+    return asyncio.run(run())
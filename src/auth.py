@@ -1,19 +1,48 @@
 """Authentication helpers for Google APIs."""
 from __future__ import annotations
 
+import hashlib
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Optional
+from typing import TYPE_CHECKING, Callable, Dict, Iterator, Tuple
 
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
+from .perf import span
+
+try:  # POSIX only; elsewhere the token file is guarded by the in-process lock alone.
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# The Google auth modules take a few hundred ms to import; they are loaded
+# on first use so the first page renders without them.
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import Flow, InstalledAppFlow
 
 SCOPES = [
     "https://www.googleapis.com/auth/tasks",
     "https://www.googleapis.com/auth/calendar.events",
+    "https://www.googleapis.com/auth/calendar.freebusy",
 ]
+# Multi-user mode also asks for the account id, which keys the token store.
+WEB_SCOPES = SCOPES + ["openid", "https://www.googleapis.com/auth/userinfo.email"]
 TOKEN_PATH = Path("token.json")
 CREDENTIALS_PATH = Path("credentials.json")
+# One process serving many Google accounts through the web OAuth flow.
+MULTI_USER = os.environ.get("TURBOORGANIZER_MULTI_USER") == "1"
+OAUTH_REDIRECT_URI = os.environ.get("TURBOORGANIZER_REDIRECT_URI", "http://localhost:8501")
+# Unfinished web sign-ins are forgotten after this long.
+PENDING_AUTH_SECONDS = 600.0
+# Must exceed google-auth's own refresh threshold (3m45s), or the request
+# path refreshes the token before the background worker gets to it.
+DEFAULT_REFRESH_MARGIN = 300.0
+# Wait before retrying a failed background refresh.
+REFRESH_RETRY_SECONDS = 30.0
 
 
 def _build_flow() -> InstalledAppFlow:
@@ -21,28 +50,320 @@ def _build_flow() -> InstalledAppFlow:
         raise FileNotFoundError(
             "Missing credentials.json. Follow the README to create an OAuth client."
         )
+    from google_auth_oauthlib.flow import InstalledAppFlow
+
     return InstalledAppFlow.from_client_secrets_file(str(CREDENTIALS_PATH), SCOPES)
 
 
-def load_credentials(force_reauth: bool = False) -> Credentials:
-    """Load credentials from disk or start a new OAuth flow."""
+def _run_local_flow(force_consent: bool = False) -> Credentials:
+    options = {"prompt": "consent"} if force_consent else {}
+    return _build_flow().run_local_server(port=0, **options)
+
+
+def _keep_refresh_token(creds: Credentials, previous: Credentials | None) -> Credentials:
+    """``creds`` with the refresh token of ``previous`` when the new grant came without one."""
+
+    if creds.refresh_token or previous is None or not previous.refresh_token:
+        return creds
+    from google.oauth2.credentials import Credentials
+
+    # Google only returns a refresh token on the first consent.
+    info = json.loads(creds.to_json())
+    info["refresh_token"] = previous.refresh_token
+    return Credentials.from_authorized_user_info(info)
+
+
+class CredentialManager:
+    """Process-wide OAuth credentials, refreshed ahead of expiry on a daemon thread.
+
+    ``get`` returns the cached ``Credentials`` and only reads ``token_path``
+    when it has nothing cached or the file changed on disk. The worker
+    refreshes the token ``margin`` seconds before ``expiry``, in place, so
+    every session and pooled client holding the object sees the new token
+    and no API call waits on a refresh. Token writes are atomic and made
+    under an exclusive lock on ``<token_path>.lock``; a process that finds a
+    fresher token on disk adopts it instead of refreshing again.
+
+    Tokens are loaded with the scopes they were granted, so a refresh never
+    asks for scopes the app added later; those need a new consent.
+
+    ``cipher`` (e.g. a ``Fernet``) encrypts the file. ``authorize(force_consent)``
+    obtains new credentials when there is no usable token, asking for consent
+    again when no refresh token is stored; with ``None``, ``get`` raises
+    ``FileNotFoundError`` instead.
+    """
+
+    def __init__(
+        self,
+        token_path: Path = TOKEN_PATH,
+        margin: float = DEFAULT_REFRESH_MARGIN,
+        cipher=None,
+        authorize: Callable[[bool], Credentials] | None = _run_local_flow,
+    ) -> None:
+        self.token_path = Path(token_path)
+        self.margin = margin
+        self.cipher = cipher
+        self._authorize = authorize
+        self.refreshes = 0
+        self.last_refresh: float | None = None
+        self.last_error: Exception | None = None
+        self._creds: Credentials | None = None
+        self._mtime: int | None = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        with self._lock:
+            lock_path = self.token_path.with_name(f"{self.token_path.name}.lock")
+            with open(lock_path, "a") as handle:
+                if fcntl is not None:
+                    fcntl.flock(handle, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _disk_mtime(self) -> int | None:
+        try:
+            return self.token_path.stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _read(self) -> Credentials | None:
+        from google.oauth2.credentials import Credentials
+
+        mtime = self._disk_mtime()
+        if mtime is None:
+            return None
+        raw = self.token_path.read_bytes()
+        if self.cipher is not None:
+            raw = self.cipher.decrypt(raw)
+        creds = Credentials.from_authorized_user_info(json.loads(raw))
+        self._mtime = mtime
+        return creds
+
+    def _write(self, creds: Credentials) -> None:
+        payload = creds.to_json().encode("utf-8")
+        if self.cipher is not None:
+            payload = self.cipher.encrypt(payload)
+        tmp_path = self.token_path.with_name(f"{self.token_path.name}.tmp")
+        with open(tmp_path, "wb") as handle:
+            handle.write(payload)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self.token_path)
+        self._mtime = self._disk_mtime()
+
+    def _adopt(self, on_disk: Credentials | None) -> Credentials | None:
+        """Copy a newer token from ``on_disk`` into the cached object when both are the same grant."""
+
+        creds = self._creds
+        if creds is None or on_disk is None or on_disk.refresh_token != creds.refresh_token:
+            return on_disk
+        if on_disk.expiry is not None and (creds.expiry is None or on_disk.expiry > creds.expiry):
+            creds.token, creds.expiry = on_disk.token, on_disk.expiry
+        return creds
+
+    def get(self, force_reauth: bool = False) -> Credentials:
+        """Cached credentials; loads, refreshes or re-authenticates only when needed."""
+
+        creds = self._creds
+        if creds is not None and not force_reauth and self._disk_mtime() == self._mtime:
+            return creds
+        with self._locked():
+            try:
+                stored = self._read()
+            except Exception:  # noqa: BLE001
+                if not force_reauth:
+                    raise
+                # Signing in again replaces an unreadable token file.
+                stored = None
+            creds = None if force_reauth else self._adopt(stored)
+            if creds and creds.expired and creds.refresh_token:
+                self._refresh(creds)
+            if not creds or not creds.valid:
+                if self._authorize is None:
+                    raise FileNotFoundError(f"No usable token in {self.token_path}; sign in again.")
+                has_refresh_token = stored is not None and bool(stored.refresh_token)
+                creds = _keep_refresh_token(self._authorize(not has_refresh_token), stored)
+                self._write(creds)
+            self._creds = creds
+        self._schedule()
+        return creds
+
+    def save(self, creds: Credentials) -> Credentials:
+        """Store newly authorized ``creds`` and serve them from now on."""
+
+        with self._locked():
+            creds = _keep_refresh_token(creds, self._read())
+            self._write(creds)
+            self._creds = creds
+        self._schedule()
+        return creds
+
+    def has_refresh_token(self) -> bool:
+        """Whether the stored grant has a refresh token; a sign-in without one must ask for consent."""
+
+        creds = self._creds
+        if creds is None:
+            with self._locked():
+                creds = self._read()
+        return creds is not None and bool(creds.refresh_token)
+
+    def clear(self) -> None:
+        """Forget the cached credentials and remove the token file."""
+
+        with self._locked():
+            self._creds = None
+            self._mtime = None
+            if self.token_path.exists():
+                self.token_path.unlink()
+        self._wake.set()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+
+    def seconds_until_refresh(self) -> float | None:
+        """Seconds until the worker refreshes the cached token, ``None`` if it will not."""
 
-    creds: Optional[Credentials] = None
-    if TOKEN_PATH.exists() and not force_reauth:
-        creds = Credentials.from_authorized_user_file(str(TOKEN_PATH), SCOPES)
+        creds = self._creds
+        if creds is None or creds.expiry is None or not creds.refresh_token:
+            return None
+        expiry = creds.expiry.replace(tzinfo=timezone.utc)
+        remaining = (expiry - datetime.now(timezone.utc)).total_seconds()
+        return max(0.0, remaining - self.margin)
 
-    if creds and creds.expired and creds.refresh_token:
-        creds.refresh(Request())
-    if not creds or not creds.valid:
-        flow = _build_flow()
-        creds = flow.run_local_server(port=0)
-        TOKEN_PATH.write_text(creds.to_json())
+    def _schedule(self) -> None:
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run, name="credential-refresh", daemon=True
+                )
+                self._thread.start()
+        self._wake.set()
 
-    return creds
+    def _refresh(self, creds: Credentials) -> None:
+        from google.auth.transport.requests import Request
+
+        with span("auth.refresh"):
+            creds.refresh(Request())
+        self._write(creds)
+        self.refreshes += 1
+        self.last_refresh = time.time()
+
+    def _refresh_ahead(self) -> None:
+        with self._locked():
+            creds = self._creds
+            if creds is None:
+                return
+            # Another process may have refreshed it already.
+            if self._disk_mtime() != self._mtime:
+                creds = self._creds = self._adopt(self._read())
+            if self.seconds_until_refresh() == 0:
+                self._refresh(creds)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            delay = self.seconds_until_refresh()
+            if delay is None or delay > 0:
+                self._wake.wait(delay)
+                continue
+            try:
+                self._refresh_ahead()
+            except Exception as exc:  # noqa: BLE001
+                # The request path still refreshes on its own once the token expires.
+                self.last_error = exc
+                self._wake.wait(REFRESH_RETRY_SECONDS)
+            else:
+                self.last_error = None
+
+
+CREDENTIALS = CredentialManager()
+
+
+def load_credentials(force_reauth: bool = False) -> Credentials:
+    """Load credentials from the in-process cache, disk or a new OAuth flow."""
+
+    return CREDENTIALS.get(force_reauth)
 
 
 def clear_credentials() -> None:
-    """Remove any cached OAuth tokens from disk."""
+    """Remove any cached OAuth tokens from memory and disk."""
+
+    CREDENTIALS.clear()
+
+
+_PENDING_AUTH: Dict[str, Tuple[str | None, float]] = {}
+_PENDING_LOCK = threading.Lock()
+
+
+def _build_web_flow(redirect_uri: str, **kwargs) -> Flow:
+    if not CREDENTIALS_PATH.exists():
+        raise FileNotFoundError(
+            "Missing credentials.json. Follow the README to create an OAuth client."
+        )
+    from google_auth_oauthlib.flow import Flow
+
+    return Flow.from_client_secrets_file(
+        str(CREDENTIALS_PATH), WEB_SCOPES, redirect_uri=redirect_uri, **kwargs
+    )
+
+
+def authorization_url(redirect_uri: str = OAUTH_REDIRECT_URI, force_consent: bool = False) -> str:
+    """Google sign-in URL for multi-user mode.
+
+    Google sends the browser back to ``redirect_uri`` with ``code`` and
+    ``state``; the PKCE verifier waits here, keyed by ``state``, because the
+    redirect usually lands in a new Streamlit session.
+    """
+
+    flow = _build_web_flow(redirect_uri)
+    options = {"prompt": "consent"} if force_consent else {}
+    url, state = flow.authorization_url(access_type="offline", **options)
+    now = time.monotonic()
+    with _PENDING_LOCK:
+        for key, (_, created) in list(_PENDING_AUTH.items()):
+            if now - created > PENDING_AUTH_SECONDS:
+                del _PENDING_AUTH[key]
+        _PENDING_AUTH[state] = (flow.code_verifier, now)
+    return url
+
+
+def finish_authorization(state: str, code: str, redirect_uri: str = OAUTH_REDIRECT_URI) -> Credentials:
+    """Exchange the redirect's ``code`` for credentials whose ``account`` is the Google user id."""
+
+    with _PENDING_LOCK:
+        pending = _PENDING_AUTH.pop(state, None)
+    if pending is None or time.monotonic() - pending[1] > PENDING_AUTH_SECONDS:
+        raise PermissionError("Unknown or expired sign-in attempt; connect again.")
+    flow = _build_web_flow(redirect_uri, state=state, code_verifier=pending[0])
+    flow.fetch_token(code=code)
+    creds = flow.credentials
+    if not creds.id_token:
+        raise PermissionError("Google did not return an id token for this sign-in.")
+    from google.auth import jwt
+
+    # The token comes straight from Google's token endpoint over TLS, so
+    # OpenID Connect does not require checking its signature here.
+    return creds.with_account(jwt.decode(creds.id_token, verify=False)["sub"])
+
+
+def account_key(creds) -> str:
+    """Stable, non-secret identifier for the account behind ``creds``.
+
+    Multi-user credentials carry the Google user id in ``account``. The
+    single-user token has none and is keyed by its OAuth client alone, so a
+    re-consent that issues a new refresh token keeps the same key (and the
+    outbox rows queued under it).
+    """
 
-    if TOKEN_PATH.exists():
-        TOKEN_PATH.unlink()
+    account = getattr(creds, "account", None) or ""
+    client_id = getattr(creds, "client_id", None) or ""
+    return hashlib.sha256(f"{client_id}:{account}".encode("utf-8")).hexdigest()[:16]
@@ -0,0 +1,200 @@
+"""Batched Google Tasks and Calendar mutations."""
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List, MutableMapping, Sequence, Tuple
+
+from .perf import span
+from .ratelimit import REQUEST_EXECUTOR, api_for
+from .services import (
+    _complete_request,
+    _event_insert_request,
+    _move_request,
+    _snooze_request,
+    already_applied,
+    build_calendar_service,
+    build_tasks_service,
+    notify_event,
+    notify_write,
+)
+
+# Google rejects batch requests with more than 50 calls for these APIs.
+BATCH_LIMIT = 50
+
+
+def execute_batch(
+    service, requests: Sequence, idempotent: Sequence[bool] | None = None
+) -> List[Tuple[object, Exception | None]]:
+    """Send ``requests`` through ``BatchHttpRequest`` in chunks of ``BATCH_LIMIT``.
+
+    Every call in a batch counts against the quota, so each chunk takes that
+    many tokens from ``REQUEST_EXECUTOR``. Calls that fail retryably are sent
+    again in a smaller batch after a backoff; ``idempotent`` (default: all
+    true) marks which calls may be repeated after a transient error.
+
+    Returns one ``(response, error)`` pair per request, in input order.
+    """
+
+    results: List[Tuple[object, Exception | None]] = [(None, None)] * len(requests)
+
+    def callback(request_id, response, exception) -> None:
+        results[int(request_id)] = (response, exception)
+
+    pending = list(range(len(requests)))
+    attempt = 0
+    while pending:
+        for offset in range(0, len(pending), BATCH_LIMIT):
+            chunk = pending[offset:offset + BATCH_LIMIT]
+            api = api_for(requests[chunk[0]])
+            REQUEST_EXECUTOR.throttle(api, len(chunk))
+            batch = service.new_batch_http_request(callback=callback)
+            for index in chunk:
+                batch.add(requests[index], request_id=str(index))
+            try:
+                with span(f"api.{api}.batch"):
+                    batch.execute()
+            except Exception as exc:  # noqa: BLE001
+                for index in chunk:
+                    results[index] = (None, exc)
+        retry = []
+        for index in pending:
+            error = results[index][1]
+            if error is None:
+                continue
+            if REQUEST_EXECUTOR.should_retry(
+                error, attempt, idempotent is None or idempotent[index]
+            ):
+                retry.append(index)
+            else:
+                REQUEST_EXECUTOR.failed(error)
+        if retry:
+            attempt += 1
+            REQUEST_EXECUTOR.backoff(attempt, results[retry[0]][1])
+        pending = retry
+    return results
+
+
+class MutationQueue:
+    """Collect task mutations and send them as a few batch round trips.
+
+    ``flush`` sends calendar inserts, completions, snoozes and moves in one
+    round, then completes the scheduled tasks that asked for it in a second.
+    """
+
+    def __init__(self, creds) -> None:
+        self.creds = creds
+        self._items: List[Dict] = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def _add(self, op: str, task: MutableMapping, **options) -> None:
+        self._items.append({"op": op, "task": task, "options": options})
+
+    def schedule(
+        self,
+        task: MutableMapping,
+        mark_complete: bool = False,
+        start_time: datetime | None = None,
+        event_id: str | None = None,
+    ) -> None:
+        """Queue a calendar event; a fixed ``event_id`` makes a replayed insert a no-op."""
+
+        self._add("schedule", task, mark_complete=mark_complete, start_time=start_time, event_id=event_id)
+
+    def complete(self, task: MutableMapping) -> None:
+        self._add("complete", task)
+
+    def snooze(self, task: MutableMapping, days: int = 1) -> None:
+        self._add("snooze", task, days=days)
+
+    def move(self, task: MutableMapping, destination_tasklist: str) -> None:
+        self._add("move", task, destination_tasklist=destination_tasklist)
+
+    def flush(self) -> List[Dict]:
+        """Send every queued mutation and return one result per item.
+
+        Each result holds ``op``, ``task``, the API ``response`` and ``error``
+        (``None`` on success).
+        """
+
+        items, self._items = self._items, []
+        if not items:
+            return []
+        results = [{"op": item["op"], "task": item["task"], "response": None, "error": None} for item in items]
+
+        tasks_service = build_tasks_service(self.creds)
+        calendar = None
+        if any(item["op"] == "schedule" for item in items):
+            calendar = build_calendar_service(self.creds)
+
+        task_requests: List[Tuple[int, object]] = []
+        calendar_requests: List[Tuple[int, object]] = []
+        for index, item in enumerate(items):
+            task, options = item["task"], item["options"]
+            if item["op"] == "schedule":
+                calendar_requests.append(
+                    (index, _event_insert_request(calendar, task, options["start_time"], options["event_id"]))
+                )
+            elif item["op"] == "complete":
+                task_requests.append((index, _complete_request(tasks_service, task)))
+            elif item["op"] == "snooze":
+                task_requests.append((index, _snooze_request(tasks_service, task, options["days"])))
+            elif item["op"] == "move":
+                task_requests.append(
+                    (index, _move_request(tasks_service, task, options["destination_tasklist"]))
+                )
+        self._record(results, tasks_service, task_requests)
+        # A move that finds the task gone from its old list landed only if
+        # the task is now in the destination; otherwise it stays a failure.
+        moved_checks = [
+            (
+                index,
+                tasks_service.tasks().get(
+                    tasklist=items[index]["options"]["destination_tasklist"], task=items[index]["task"]["id"]
+                ),
+            )
+            for index, _ in task_requests
+            if items[index]["op"] == "move" and already_applied(results[index]["error"], "move")
+        ]
+        for (index, _), (response, error) in zip(
+            moved_checks, execute_batch(tasks_service, [request for _, request in moved_checks])
+        ):
+            if error is None:
+                results[index]["response"], results[index]["error"] = response, None
+        if calendar_requests:
+            self._record(results, calendar, calendar_requests)
+            for index, _ in calendar_requests:
+                if already_applied(results[index]["error"], "insert_event"):
+                    results[index]["error"] = None
+                elif results[index]["response"] is not None:
+                    notify_event(self.creds, results[index]["response"])
+
+        follow_ups: List[Tuple[int, object]] = []
+        for index, item in enumerate(items):
+            if results[index]["error"] is not None:
+                continue
+            if item["op"] == "schedule" and item["options"]["mark_complete"]:
+                follow_ups.append((index, _complete_request(tasks_service, item["task"])))
+        for index, (_, error) in zip(
+            (index for index, _ in follow_ups),
+            execute_batch(tasks_service, [request for _, request in follow_ups]),
+        ):
+            results[index]["error"] = error
+
+        for result in results:
+            if result["response"] is not None or result["error"] is None:
+                notify_write(self.creds, result["task"])
+        return results
+
+    @staticmethod
+    def _record(
+        results: List[Dict],
+        service,
+        indexed_requests: List[Tuple[int, object]],
+        idempotent: Sequence[bool] | None = None,
+    ) -> None:
+        responses = execute_batch(service, [request for _, request in indexed_requests], idempotent)
+        for (index, _), (response, error) in zip(indexed_requests, responses):
+            results[index]["response"] = response
+            results[index]["error"] = error
@@ -0,0 +1,125 @@
+"""Task snapshots shared across browser sessions of the same account."""
+from __future__ import annotations
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, List, MutableMapping
+
+from .auth import account_key
+from .sync import TaskSyncStore
+from .tenants import DEFAULT_MAX_ACCOUNTS
+
+DEFAULT_TTL_SECONDS = 300
+
+
+class SharedTaskCache:
+    """TTL + LRU cache of task snapshots keyed by account.
+
+    Each account keeps its ``TaskSyncStore`` (with the per-list ETags used
+    for revalidation) next to the last task snapshot. ``load`` serves fresh
+    snapshots from memory and otherwise revalidates through the store, so a
+    refresh downloads only what changed. ``invalidate`` only expires the
+    snapshot; a write that lands while a fetch is in flight keeps that
+    fetch's result from counting as fresh. Past ``max_accounts`` the least
+    recently used account is dropped from memory.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: float = DEFAULT_TTL_SECONDS,
+        max_accounts: int = DEFAULT_MAX_ACCOUNTS,
+        store_factory: Callable[[str], TaskSyncStore] = lambda account: TaskSyncStore.load(),
+    ) -> None:
+        self.ttl_seconds = ttl_seconds
+        self.max_accounts = max_accounts
+        self._store_factory = store_factory
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _entry(self, account: str) -> Dict:
+        with self._lock:
+            entry = self._entries.get(account)
+            if entry is None:
+                entry = self._entries[account] = {
+                    "store": None,
+                    "tasks": None,
+                    "fetched_at": 0.0,
+                    "generation": 0,
+                    "lock": threading.Lock(),
+                }
+                while len(self._entries) > self.max_accounts:
+                    self._entries.popitem(last=False)
+            self._entries.move_to_end(account)
+            return entry
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _is_fresh(self, entry: Dict, max_age: float | None) -> bool:
+        ttl = self.ttl_seconds if max_age is None else min(self.ttl_seconds, max_age)
+        return entry["tasks"] is not None and time.monotonic() - entry["fetched_at"] < ttl
+
+    def load(
+        self,
+        account: str,
+        fetch: Callable[[TaskSyncStore], List[MutableMapping]],
+        max_age: float | None = None,
+    ) -> List[MutableMapping]:
+        """Return the account's tasks, calling ``fetch(store)`` when the snapshot is stale.
+
+        A snapshot is stale after the TTL, or after ``max_age`` seconds when
+        that is shorter. Concurrent loads for one account share a single fetch.
+        """
+
+        entry = self._entry(account)
+        with entry["lock"]:
+            if self._is_fresh(entry, max_age):
+                return entry["tasks"]
+            if entry["store"] is None:
+                entry["store"] = self._store_factory(account)
+            generation = entry["generation"]
+            tasks = fetch(entry["store"])
+            with self._lock:
+                if entry["generation"] == generation:
+                    entry["tasks"] = tasks
+                    entry["fetched_at"] = time.monotonic()
+            return tasks
+
+    def age(self, account: str) -> float | None:
+        """Seconds since the account's snapshot was fetched, if there is a fresh one."""
+
+        with self._lock:
+            entry = self._entries.get(account)
+        if entry is None or entry["tasks"] is None:
+            return None
+        return time.monotonic() - entry["fetched_at"]
+
+    def on_write(self, creds, task: MutableMapping) -> None:
+        """Write listener for ``services.add_write_listener``."""
+
+        self.invalidate(account_key(creds))
+
+    def invalidate(self, account: str) -> None:
+        with self._lock:
+            entry = self._entries.get(account)
+            if entry is not None:
+                entry["tasks"] = None
+                entry["generation"] += 1
+
+    def release(self, account: str) -> None:
+        """Drop the account from memory; a saved store is reloaded on the next ``load``."""
+
+        with self._lock:
+            self._entries.pop(account, None)
+
+    def forget(self, account: str) -> None:
+        """Drop the account entirely, including its sync store on disk.
+
+        The store is cleared even when it was already released from memory.
+        """
+
+        with self._lock:
+            entry = self._entries.pop(account, None)
+        store = entry["store"] if entry is not None else None
+        (store or self._store_factory(account)).clear()
@@ -0,0 +1,297 @@
+"""Local mirror of the primary calendar, kept current with ``syncToken`` incremental sync."""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, time, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Tuple
+from zoneinfo import ZoneInfo
+
+from googleapiclient.errors import HttpError
+
+from .auth import account_key
+from .perf import span
+from .ratelimit import REQUEST_EXECUTOR
+from .services import build_calendar_service
+from .utils import parse_rfc3339
+
+CALENDAR_MIRROR_PATH = Path("calendar_mirror.json")
+CALENDAR_MIRROR_VERSION = 1
+# The first sync reads events from this far back; older ones are pruned.
+MIRROR_LOOKBACK = timedelta(days=1)
+EVENTS_PAGE_SIZE = 2500
+
+Entry = Tuple[int, int, str]  # (start, end, event id); [start, end) in epoch minutes
+
+
+def _minutes(moment: datetime) -> int:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() // 60)
+
+
+class IntervalIndex:
+    """Events as ``[start, end)`` intervals sorted by start, for overlap queries.
+
+    A query bisects to the first event that could still overlap (one that
+    starts at most ``longest`` minutes before the query) and scans forward
+    until events start after the query ends, so lookups cost
+    ``O(log n + events in range)``. Inserting or removing one event is a
+    bisect plus a list shift.
+    """
+
+    def __init__(self, entries: Iterable[Entry] = ()) -> None:
+        self._entries: List[Entry] = sorted(entries)
+        self._by_id: Dict[str, Entry] = {entry[2]: entry for entry in self._entries}
+        self._longest = max((end - start for start, end, _ in self._entries), default=0)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, event_id: str) -> bool:
+        return event_id in self._by_id
+
+    def entries(self) -> List[Entry]:
+        return list(self._entries)
+
+    def add(self, event_id: str, start: int, end: int) -> None:
+        self.remove(event_id)
+        entry = (start, end, event_id)
+        insort(self._entries, entry)
+        self._by_id[event_id] = entry
+        self._longest = max(self._longest, end - start)
+
+    def remove(self, event_id: str) -> bool:
+        entry = self._by_id.pop(event_id, None)
+        if entry is None:
+            return False
+        del self._entries[bisect_left(self._entries, entry)]
+        return True
+
+    def overlapping(self, start: int, end: int) -> List[Entry]:
+        found = []
+        index = bisect_left(self._entries, (start - self._longest,))
+        while index < len(self._entries) and self._entries[index][0] < end:
+            entry = self._entries[index]
+            if entry[1] > start:
+                found.append(entry)
+            index += 1
+        return found
+
+    def prune(self, before: int) -> int:
+        """Drop events that ended before ``before``; returns how many."""
+
+        stale = [entry[2] for entry in self._entries if entry[1] < before]
+        for event_id in stale:
+            self.remove(event_id)
+        return len(stale)
+
+
+class CalendarMirror:
+    """Busy events of one calendar, in memory and in ``path`` (``None``: memory only).
+
+    The first ``sync`` lists events from ``MIRROR_LOOKBACK`` ago onwards;
+    later ones send the stored ``syncToken`` and apply only what changed,
+    usually a single empty page. A 410 Gone (expired token) falls back to a
+    full sync. Events marked free, declined ones and cancelled ones are left
+    out. ``record`` adds an event the app just created, so ``conflicts``
+    sees it before the next sync.
+    """
+
+    def __init__(
+        self, path: Path | None = CALENDAR_MIRROR_PATH, calendar_id: str = "primary", account: str = ""
+    ) -> None:
+        self.path = path
+        self.calendar_id = calendar_id
+        self.account = account
+        self.sync_token: str | None = None
+        self.time_zone = "UTC"
+        self.last_error: Exception | None = None
+        self.index = IntervalIndex()
+        self.summaries: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(
+        cls, path: Path | None = CALENDAR_MIRROR_PATH, calendar_id: str = "primary", account: str = ""
+    ) -> "CalendarMirror":
+        mirror = cls(path, calendar_id, account)
+        if path is None or not path.exists():
+            return mirror
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return mirror
+        if data.get("version") == CALENDAR_MIRROR_VERSION and data.get("calendar_id") == calendar_id:
+            mirror.sync_token = data.get("sync_token")
+            mirror.time_zone = data.get("time_zone") or "UTC"
+            mirror.index = IntervalIndex(
+                [(start, end, event_id) for start, end, event_id, _ in data.get("events", [])]
+            )
+            mirror.summaries = {event_id: summary for _, _, event_id, summary in data.get("events", [])}
+        return mirror
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        with self._lock:
+            payload = json.dumps(
+                {
+                    "version": CALENDAR_MIRROR_VERSION,
+                    "calendar_id": self.calendar_id,
+                    "sync_token": self.sync_token,
+                    "time_zone": self.time_zone,
+                    "events": [
+                        [start, end, event_id, self.summaries.get(event_id, "")]
+                        for start, end, event_id in self.index.entries()
+                    ],
+                }
+            )
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+    def clear(self) -> None:
+        """Forget every event and the sync token, including the copy on disk."""
+
+        with self._lock:
+            self.sync_token = None
+            self.index = IntervalIndex()
+            self.summaries = {}
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+
+    def _bounds(self, event: Mapping) -> Tuple[int, int] | None:
+        start, end = event.get("start") or {}, event.get("end") or {}
+        if "dateTime" in start and "dateTime" in end:
+            return _minutes(parse_rfc3339(start["dateTime"])), _minutes(parse_rfc3339(end["dateTime"]))
+        if "date" in start and "date" in end:
+            # All-day events run from midnight to midnight in the calendar's zone.
+            zone = ZoneInfo(self.time_zone)
+            return tuple(
+                _minutes(datetime.combine(datetime.fromisoformat(day).date(), time(0), tzinfo=zone))
+                for day in (start["date"], end["date"])
+            )
+        return None
+
+    @staticmethod
+    def _is_busy(event: Mapping) -> bool:
+        if event.get("status") == "cancelled" or event.get("transparency") == "transparent":
+            return False
+        return not any(
+            attendee.get("self") and attendee.get("responseStatus") == "declined"
+            for attendee in event.get("attendees", ())
+        )
+
+    def _apply(self, event: Mapping) -> None:
+        event_id = event.get("id")
+        if not event_id:
+            return
+        bounds = self._bounds(event) if self._is_busy(event) else None
+        if bounds is None:
+            self.index.remove(event_id)
+            self.summaries.pop(event_id, None)
+        else:
+            self.index.add(event_id, *bounds)
+            self.summaries[event_id] = event.get("summary", "")
+
+    def record(self, event: Mapping) -> None:
+        """Apply one event resource, e.g. the response of an insert."""
+
+        with self._lock:
+            self._apply(event)
+
+    def on_event(self, creds, event: Mapping) -> None:
+        """Event listener for ``services.add_event_listener``."""
+
+        if account_key(creds) == self.account:
+            self.record(event)
+
+    def _list(self, calendar, params: Dict) -> Tuple[List[Dict], Dict]:
+        items: List[Dict] = []
+        page_token = None
+        while True:
+            response = REQUEST_EXECUTOR.execute(
+                calendar.events().list(**params, pageToken=page_token)
+            )
+            items.extend(response.get("items", []))
+            page_token = response.get("nextPageToken")
+            if not page_token:
+                return items, response
+
+    def sync(self, creds, now: datetime | None = None) -> int:
+        """Bring the mirror up to date; returns the number of changed events received."""
+
+        now = now or datetime.now(timezone.utc)
+        calendar = build_calendar_service(creds)
+        params = {
+            "calendarId": self.calendar_id,
+            "singleEvents": True,
+            "maxResults": EVENTS_PAGE_SIZE,
+        }
+        with span("calendar.sync"):
+            full = self.sync_token is None
+            try:
+                if full:
+                    items, response = self._list(
+                        calendar, {**params, "timeMin": (now - MIRROR_LOOKBACK).isoformat()}
+                    )
+                else:
+                    items, response = self._list(calendar, {**params, "syncToken": self.sync_token})
+            except HttpError as exc:
+                if full or getattr(exc.resp, "status", None) != 410:
+                    raise
+                # The sync token expired; start over.
+                full = True
+                items, response = self._list(
+                    calendar, {**params, "timeMin": (now - MIRROR_LOOKBACK).isoformat()}
+                )
+            with self._lock:
+                self.time_zone = response.get("timeZone") or self.time_zone
+                if full:
+                    self.index = IntervalIndex()
+                    self.summaries = {}
+                for event in items:
+                    self._apply(event)
+                self.index.prune(_minutes(now - MIRROR_LOOKBACK))
+                self.summaries = {
+                    event_id: summary
+                    for event_id, summary in self.summaries.items()
+                    if event_id in self.index
+                }
+                self.sync_token = response.get("nextSyncToken") or self.sync_token
+        self.save()
+        return len(items)
+
+    def refresh(self, creds) -> None:
+        """``sync`` for background loops: failures are kept in ``last_error``."""
+
+        try:
+            self.sync(creds)
+        except Exception as exc:  # noqa: BLE001
+            self.last_error = exc
+        else:
+            self.last_error = None
+
+    def conflicts(self, start: datetime, end: datetime) -> List[Dict]:
+        """Mirrored events overlapping ``[start, end)``, earliest first."""
+
+        with self._lock:
+            return [
+                {
+                    "id": event_id,
+                    "summary": self.summaries.get(event_id, ""),
+                    "start": datetime.fromtimestamp(entry_start * 60, timezone.utc),
+                    "end": datetime.fromtimestamp(entry_end * 60, timezone.utc),
+                }
+                for entry_start, entry_end, event_id in self.index.overlapping(
+                    _minutes(start), _minutes(end)
+                )
+            ]
+
+    @property
+    def synced(self) -> bool:
+        return self.sync_token is not None
@@ -0,0 +1,81 @@
+"""Discovery documents for the Google APIs, parsed once per process."""
+from __future__ import annotations
+
+import json
+import threading
+from typing import Dict, Tuple
+
+# Method parameters the app relies on that older packaged documents lack:
+# {(api, version): {(resource, method): (parameter, ...)}}.
+REQUIRED_PARAMETERS: Dict[Tuple[str, str], Dict[Tuple[str, str], Tuple[str, ...]]] = {
+    # tasks.move gained destinationTasklist in google-api-python-client 2.136.0.
+    ("tasks", "v1"): {("tasks", "move"): ("destinationTasklist",)},
+}
+
+
+class DiscoveryDocumentError(ValueError):
+    """The discovery document is missing or does not describe the requested API."""
+
+
+class DiscoveryCache:
+    """Parsed discovery documents keyed by ``(api, version)``.
+
+    Documents come from the copies packaged with ``google-api-python-client``
+    (the same ones ``build`` reads with static discovery), so they are
+    versioned with the installed library and never fetched over the network.
+    Each one is checked before use: it must parse, name the requested API
+    and version, declare resources and have the parameters listed in
+    ``REQUIRED_PARAMETERS``.
+    """
+
+    def __init__(self) -> None:
+        self._documents: Dict[Tuple[str, str], Dict] = {}
+        self._lock = threading.Lock()
+
+    def get(self, api: str, version: str) -> Dict:
+        key = (api, version)
+        document = self._documents.get(key)
+        if document is not None:
+            return document
+        with self._lock:
+            if key not in self._documents:
+                self._documents[key] = self._validate(api, version, self._read(api, version))
+            return self._documents[key]
+
+    @staticmethod
+    def _read(api: str, version: str) -> str:
+        from googleapiclient.discovery_cache import get_static_doc
+
+        raw = get_static_doc(api, version)
+        if not raw:
+            raise DiscoveryDocumentError(f"No packaged discovery document for {api} {version}")
+        return raw
+
+    @staticmethod
+    def _validate(api: str, version: str, raw: str) -> Dict:
+        try:
+            document = json.loads(raw)
+        except ValueError as exc:
+            raise DiscoveryDocumentError(f"Corrupt discovery document for {api} {version}") from exc
+        if (
+            not isinstance(document, dict)
+            or document.get("name") != api
+            or document.get("version") != version
+            or not document.get("resources")
+        ):
+            raise DiscoveryDocumentError(f"Discovery document does not describe {api} {version}")
+        for (resource, method), names in REQUIRED_PARAMETERS.get((api, version), {}).items():
+            described = (
+                document["resources"].get(resource, {}).get("methods", {}).get(method, {}).get("parameters", {})
+            )
+            missing = [name for name in names if name not in described]
+            if missing:
+                raise DiscoveryDocumentError(
+                    f"The packaged {api} {version} discovery document (revision "
+                    f"{document.get('revision', '?')}) has no {', '.join(missing)} on {resource}.{method}; "
+                    "upgrade google-api-python-client to 2.136.0 or later"
+                )
+        return document
+
+
+DISCOVERY_CACHE = DiscoveryCache()
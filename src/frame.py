@@ -0,0 +1,236 @@
+"""Columnar task table for vectorized Decision Engine filters."""
+from __future__ import annotations
+
+from datetime import date
+from typing import Dict, Iterable, Iterator, List, Sequence, Set, Tuple
+
+import numpy as np
+
+from .models import INBOX, OVERDUE, ROUTINE, Task
+from .perf import traced
+
+Mask = np.ndarray
+
+_NO_DURATION = -1
+_NO_DAY = 0
+_NO_EPOCH = np.iinfo(np.int64).min
+
+
+def _duration_value(duration) -> int:
+    if duration is None:
+        return _NO_DURATION
+    try:
+        return int(duration)
+    except (TypeError, ValueError):
+        return _NO_DURATION
+
+
+class TaskFrame:
+    """Tasks as NumPy columns; every filter is a boolean mask over the rows.
+
+    Columns: ``duration`` (minutes, -1 when unknown), ``due_epoch``,
+    ``due_day`` (ordinal, 0 when undated), ``flags`` (the ``Task`` bits),
+    ``project`` (code into the task list ids) and ``tags`` (one ``uint64``
+    bitset word per 64 distinct tags). Masks combine with ``&``; ``ordered``
+    turns a mask back into ``Task`` objects in row order.
+
+    With ``sort=True`` rows are ordered like ``task_sort_key`` (overdue,
+    then routines, then title) using stable NumPy sorts. Removal
+    clears a row's ``alive`` bit and ``replace`` rewrites a row in place,
+    so neither shifts the other rows.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = (), sort: bool = False) -> None:
+        tasks = list(tasks)
+        self._tag_bits: Dict[str, int] = {}
+        self._tasklists: List[str] = []
+        self._tasklist_codes: Dict[str, int] = {}
+        self._project_names: Dict[str, str] = {}
+        if sort and tasks:
+            tasks = [tasks[row] for row in _sort_order(tasks)]
+        self._build(tasks)
+
+    def _build(self, tasks: Sequence[Task]) -> None:
+        count = len(tasks)
+        self._tasks = np.empty(count, dtype=object)
+        self._tasks[:] = tasks
+        self._rows: Dict[str, int] = {task.id: row for row, task in enumerate(tasks)}
+        self.alive = np.ones(count, dtype=bool)
+        self.duration = np.fromiter((_duration_value(task.duration) for task in tasks), np.int64, count)
+        self.due_epoch = np.fromiter(
+            (_NO_EPOCH if task.due_epoch is None else task.due_epoch for task in tasks), np.int64, count
+        )
+        self.due_day = np.fromiter(
+            (task.due_day.toordinal() if task.due_day else _NO_DAY for task in tasks), np.int32, count
+        )
+        self.flags = np.fromiter((task.flags for task in tasks), np.uint8, count)
+        self.project = np.fromiter((self._tasklist_code(task) for task in tasks), np.int32, count)
+        for task in tasks:
+            for tag in task.tags:
+                self._tag_bits.setdefault(tag, len(self._tag_bits))
+        self.tags = np.zeros((count, self._tag_words()), dtype=np.uint64)
+        for row, task in enumerate(tasks):
+            self._set_tags(row, task.tags)
+
+    def _tag_words(self) -> int:
+        return max(1, (len(self._tag_bits) + 63) // 64)
+
+    def _tasklist_code(self, task: Task) -> int:
+        code = self._tasklist_codes.get(task.tasklist)
+        if code is None:
+            code = self._tasklist_codes[task.tasklist] = len(self._tasklists)
+            self._tasklists.append(task.tasklist)
+        self._project_names[task.tasklist] = task.project
+        return code
+
+    def _set_tags(self, row: int, tags: Iterable[str]) -> None:
+        words = self.tags[row]
+        words[:] = 0
+        for tag in tags:
+            bit = self._tag_bits[tag]
+            words[bit // 64] |= np.uint64(1 << (bit % 64))
+
+    def _tag_query(self, tags: Iterable[str]) -> np.ndarray:
+        query = np.zeros(self.tags.shape[1], dtype=np.uint64)
+        for tag in tags:
+            bit = self._tag_bits.get(tag)
+            if bit is not None:
+                query[bit // 64] |= np.uint64(1 << (bit % 64))
+        return query
+
+    def __len__(self) -> int:
+        return int(self.alive.sum())
+
+    def __iter__(self) -> Iterator[Task]:
+        return iter(self._tasks[self.alive].tolist())
+
+    def __contains__(self, task_id: str) -> bool:
+        row = self._rows.get(task_id)
+        return row is not None and bool(self.alive[row])
+
+    def get(self, task_id: str) -> Task | None:
+        row = self._rows.get(task_id)
+        return self._tasks[row] if row is not None and self.alive[row] else None
+
+    def remove(self, task_id: str) -> Task | None:
+        task = self.get(task_id)
+        if task is not None:
+            self.alive[self._rows[task_id]] = False
+        return task
+
+    def replace(self, task: Task) -> None:
+        """Swap in a new version of a task, keeping its row; unknown tasks are appended."""
+
+        row = self._rows.get(task.id)
+        if row is None:
+            self._build([*self._tasks[self.alive].tolist(), task])
+            return
+        new_tags = [tag for tag in task.tags if tag not in self._tag_bits]
+        for tag in new_tags:
+            self._tag_bits[tag] = len(self._tag_bits)
+        if self._tag_words() > self.tags.shape[1]:
+            extra = self._tag_words() - self.tags.shape[1]
+            self.tags = np.hstack([self.tags, np.zeros((len(self._tasks), extra), dtype=np.uint64)])
+        self._tasks[row] = task
+        self.alive[row] = True
+        self.duration[row] = _duration_value(task.duration)
+        self.due_epoch[row] = _NO_EPOCH if task.due_epoch is None else task.due_epoch
+        self.due_day[row] = task.due_day.toordinal() if task.due_day else _NO_DAY
+        self.flags[row] = task.flags
+        self.project[row] = self._tasklist_code(task)
+        self._set_tags(row, task.tags)
+
+    def all(self) -> Mask:
+        return self.alive.copy()
+
+    @traced("filters.fitting")
+    def fitting(self, minutes_available: int | None) -> Mask:
+        """Mask version of ``filter_tasks_by_time``."""
+
+        if minutes_available is None:
+            return self.alive.copy()
+        return self.alive & (self.duration >= 0) & (self.duration <= minutes_available)
+
+    @traced("filters.inbox")
+    def inbox(self) -> Mask:
+        return (self.flags & INBOX) != 0
+
+    @traced("filters.due_on")
+    def due_on(self, day: date) -> Mask:
+        return self.due_day == day.toordinal()
+
+    @traced("filters.tags")
+    def with_any_tag(self, tags: Iterable[str]) -> Mask:
+        return (self.tags & self._tag_query(tags)).any(axis=1)
+
+    def with_ids(self, task_ids: Iterable[str]) -> Mask:
+        """Rows of the given tasks that are still alive; unknown ids are ignored."""
+
+        mask = np.zeros(len(self._tasks), dtype=bool)
+        mask[[self._rows[task_id] for task_id in task_ids if task_id in self._rows]] = True
+        return mask & self.alive
+
+    @traced("filters.tag_options")
+    def tags_among(self, mask: Mask) -> Set[str]:
+        """Tags used by at least one selected row."""
+
+        selected = self.tags[mask & self.alive]
+        if not len(selected):
+            return set()
+        used = np.bitwise_or.reduce(selected, axis=0)
+        return {
+            tag for tag, bit in self._tag_bits.items() if int(used[bit // 64]) >> (bit % 64) & 1
+        }
+
+    @traced("filters.order")
+    def ordered(self, mask: Mask) -> List[Task]:
+        """Selected tasks in row order."""
+
+        return self._tasks[mask & self.alive].tolist()
+
+    def project_options(self) -> List[Tuple[str, str]]:
+        """``(project name, tasklist id)`` pairs for lists that still hold tasks."""
+
+        codes = np.unique(self.project[self.alive])
+        return sorted(
+            (
+                (self._project_names[self._tasklists[code]], self._tasklists[code])
+                for code in codes.tolist()
+            ),
+            key=lambda option: option[0].lower(),
+        )
+
+    def to_pandas(self):
+        """The columns as a ``pandas.DataFrame`` indexed by task id (live rows only)."""
+
+        import pandas as pd
+
+        alive = self.alive
+        tasks = self._tasks[alive].tolist()
+        duration = pd.Series(self.duration[alive])
+        return pd.DataFrame(
+            {
+                "duration": duration.where(duration >= 0).astype("Int64").array,
+                "due_epoch": self.due_epoch[alive],
+                "due_day": self.due_day[alive],
+                "overdue": (self.flags[alive] & OVERDUE) != 0,
+                "routine": (self.flags[alive] & ROUTINE) != 0,
+                "inbox": (self.flags[alive] & INBOX) != 0,
+                "project": pd.Categorical.from_codes(self.project[alive], categories=self._tasklists),
+                "title": [task.title for task in tasks],
+            },
+            index=pd.Index([task.id for task in tasks], name="id"),
+        )
+
+
+def _sort_order(tasks: Sequence[Task]) -> np.ndarray:
+    """Row order of ``sorted(tasks, key=task_sort_key)`` from two stable NumPy sorts."""
+
+    count = len(tasks)
+    flags = np.fromiter((task.flags for task in tasks), np.uint8, count)
+    titles = np.empty(count, dtype=object)
+    titles[:] = [task.title.lower() for task in tasks]
+    by_title = np.argsort(titles, kind="stable")
+    # Overdue first, then routines; a stable sort keeps the title order inside each group.
+    group = ((flags & OVERDUE) == 0).astype(np.uint8) * 2 + ((flags & ROUTINE) == 0)
+    return by_title[np.argsort(group[by_title], kind="stable")]
@@ -0,0 +1,232 @@
+"""Compact task record shared by the services, ``TaskStore``, ``TaskFrame`` and the UI."""
+from __future__ import annotations
+
+import sys
+from collections.abc import MutableMapping
+from datetime import date, datetime, timezone
+from typing import Dict, FrozenSet, Iterator, Tuple
+
+# Bits of ``Task.flags``.
+ROUTINE = 1
+OVERDUE = 2
+INBOX = 4
+
+_FLAG_KEYS = {"is_routine": ROUTINE, "is_overdue": OVERDUE, "is_inbox": INBOX}
+# One shared ``date`` per calendar day instead of one per task.
+_DAYS: Dict[int, date] = {}
+
+
+def _intern(value: str | None) -> str | None:
+    return sys.intern(value) if value is not None else None
+
+
+def _shared_day(day: date | None) -> date | None:
+    if day is None:
+        return None
+    return _DAYS.setdefault(day.toordinal(), day)
+
+
+def _to_epoch(value: datetime | str | None) -> int | None:
+    if value is None or value == "":
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+
+def _epoch_day(epoch: int | None) -> date | None:
+    if epoch is None:
+        return None
+    return _shared_day(datetime.fromtimestamp(epoch, timezone.utc).date())
+
+
+class Task(MutableMapping):
+    """One actionable task, with ``__slots__`` instead of a per-task dict.
+
+    Project, task list and tag strings are interned, so thousands of tasks
+    share one copy of each. The due date is parsed once into epoch seconds
+    (``due_epoch``) plus the calendar day the filters use (``due_day``,
+    UTC unless ``prepare_tasks`` read a naive due date in another zone);
+    ``is_routine``/``is_overdue``/``is_inbox`` are bits of ``flags``.
+
+    The mapping interface exposes the keys the dict records had, including
+    the ones ``prepare_tasks`` used to add (``tags``, ``project_key``,
+    ``due_at``, ``due_day``, ``is_inbox``), so ``task["title"]`` and
+    ``task.get("due")`` keep working. Hot paths read the attributes.
+    """
+
+    __slots__ = (
+        "id",
+        "title",
+        "notes",
+        "project",
+        "project_key",
+        "tasklist",
+        "tags",
+        "duration",
+        "due_epoch",
+        "due_day",
+        "flags",
+    )
+
+    KEYS: Tuple[str, ...] = (
+        "id",
+        "title",
+        "project",
+        "duration",
+        "tasklist",
+        "notes",
+        "due",
+        "is_routine",
+        "is_overdue",
+        "tags",
+        "project_key",
+        "due_at",
+        "due_day",
+        "is_inbox",
+    )
+
+    def __init__(
+        self,
+        id: str,
+        title: str,
+        project: str,
+        tasklist: str,
+        duration: int | None = None,
+        notes: str | None = None,
+        due_epoch: int | None = None,
+        flags: int = 0,
+        tags: FrozenSet[str] = frozenset(),
+        project_key: str = "",
+        due_day: date | None = None,
+    ) -> None:
+        self.id = id
+        self.title = title
+        self.notes = notes
+        self.project = _intern(project)
+        self.project_key = _intern(project_key)
+        self.tasklist = _intern(tasklist)
+        self.tags = frozenset(map(sys.intern, tags))
+        self.duration = duration
+        self.due_epoch = due_epoch
+        self.due_day = _shared_day(due_day) if due_day is not None else _epoch_day(due_epoch)
+        self.flags = flags
+
+    @property
+    def due_at(self) -> datetime | None:
+        if self.due_epoch is None:
+            return None
+        return datetime.fromtimestamp(self.due_epoch, timezone.utc)
+
+    @property
+    def due(self) -> str | None:
+        """Due date as the ISO string the Tasks API expects."""
+
+        due_at = self.due_at
+        return due_at.isoformat() if due_at else None
+
+    @property
+    def is_routine(self) -> bool:
+        return bool(self.flags & ROUTINE)
+
+    @property
+    def is_overdue(self) -> bool:
+        return bool(self.flags & OVERDUE)
+
+    @property
+    def is_inbox(self) -> bool:
+        return bool(self.flags & INBOX)
+
+    def __getitem__(self, key: str):
+        if key in _KEY_SET:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        # The Mapping mixin goes through __getitem__ and a KeyError.
+        return getattr(self, key) if key in _KEY_SET else default
+
+    def __setitem__(self, key: str, value) -> None:
+        flag = _FLAG_KEYS.get(key)
+        if flag is not None:
+            self.flags = self.flags | flag if value else self.flags & ~flag
+        elif key in ("due", "due_at"):
+            self.due_epoch = _to_epoch(value)
+            self.due_day = _epoch_day(self.due_epoch)
+        elif key == "due_day":
+            self.due_day = _shared_day(value)
+        elif key in ("project", "project_key", "tasklist"):
+            setattr(self, key, _intern(value))
+        elif key == "tags":
+            self.tags = frozenset(map(sys.intern, value))
+        elif key in _KEY_SET:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key: str) -> None:
+        raise TypeError(f"Task fields cannot be removed: {key!r}")
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.KEYS)
+
+    def __len__(self) -> int:
+        return len(self.KEYS)
+
+    def __contains__(self, key) -> bool:
+        return key in _KEY_SET
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, Task):
+            return self.__getstate__() == other.__getstate__()
+        return MutableMapping.__eq__(self, other)
+
+    def __repr__(self) -> str:
+        return f"Task(id={self.id!r}, title={self.title!r}, tasklist={self.tasklist!r})"
+
+    def copy(self) -> "Task":
+        clone = Task.__new__(Task)
+        clone.__setstate__(self.__getstate__())
+        return clone
+
+    def __getstate__(self) -> tuple:
+        # A plain tuple: no field names per task, and pickle writes each
+        # shared (interned) string and day once per dump.
+        return (
+            self.id,
+            self.title,
+            self.notes,
+            self.project,
+            self.project_key,
+            self.tasklist,
+            self.tags,
+            self.duration,
+            self.due_epoch,
+            self.due_day,
+            self.flags,
+        )
+
+    def __setstate__(self, state: tuple) -> None:
+        (
+            self.id,
+            self.title,
+            self.notes,
+            project,
+            project_key,
+            tasklist,
+            tags,
+            self.duration,
+            self.due_epoch,
+            due_day,
+            self.flags,
+        ) = state
+        self.project = _intern(project)
+        self.project_key = _intern(project_key)
+        self.tasklist = _intern(tasklist)
+        self.tags = frozenset(map(sys.intern, tags))
+        self.due_day = _shared_day(due_day)
+
+
+_KEY_SET = frozenset(Task.KEYS)
@@ -0,0 +1,367 @@
+"""Durable write-ahead queue for task mutations."""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from pathlib import Path
+from typing import Dict, Iterable, List, MutableMapping
+
+from googleapiclient.errors import HttpError
+
+from .batch import BATCH_LIMIT, MutationQueue
+from .ratelimit import is_rate_limited
+from .services import mark_task_complete, move_task, new_event_id, schedule_task, snooze_task
+from .utils import INBOX_PROJECT_KEYS, normalize_project
+
+OUTBOX_PATH = Path("outbox.sqlite3")
+MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 2.0
+RETRY_MAX_SECONDS = 120.0
+# Finished rows are kept this long so stale snapshots still show their effect.
+DONE_RETENTION_SECONDS = 3600.0
+
+# Task fields the mutation calls need; everything else is rebuilt on reload.
+_TASK_FIELDS = ("id", "tasklist", "title", "notes", "due", "duration", "project")
+# Client errors that will fail the same way on every retry.
+_PERMANENT_STATUSES = frozenset({400, 401, 403, 404, 409, 410})
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    account TEXT NOT NULL,
+    op TEXT NOT NULL,
+    task TEXT NOT NULL,
+    options TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL,
+    finished_at REAL,
+    error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_account_status ON outbox (account, status, id);
+"""
+
+
+def _is_permanent(exc: Exception) -> bool:
+    # A quota 403 clears once the quota refills, so it is retried with backoff.
+    return isinstance(exc, HttpError) and exc.resp.status in _PERMANENT_STATUSES and not is_rate_limited(exc)
+
+
+def retry_delay(attempts: int) -> float:
+    return min(RETRY_BASE_SECONDS * 2 ** (attempts - 1), RETRY_MAX_SECONDS)
+
+
+class Outbox:
+    """SQLite-backed queue of pending ``schedule``/``complete``/``snooze``/``move`` calls.
+
+    Rows go ``pending`` -> ``done`` or ``failed``. ``apply_pending`` replays
+    the queued effects over a task snapshot, which is how the UI shows a
+    mutation before Google has seen it and how it rolls back once a row fails.
+    With ``path=None`` the queue lives in memory and does not survive a restart.
+    """
+
+    def __init__(self, path: Path | None = OUTBOX_PATH) -> None:
+        self.path = Path(path) if path is not None else None
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            str(self.path) if self.path is not None else ":memory:",
+            check_same_thread=False,
+            isolation_level=None,
+        )
+        self._db.row_factory = sqlite3.Row
+        if self.path is not None:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(_SCHEMA)
+
+    def _execute(self, sql: str, params: Iterable = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, tuple(params))
+
+    def enqueue(self, account: str, op: str, task: MutableMapping, **options) -> int:
+        snapshot = {field: task.get(field) for field in _TASK_FIELDS}
+        if op == "schedule":
+            # Fixed up front so a replay after a crash cannot create a second event.
+            options.setdefault("event_id", new_event_id())
+        now = time.time()
+        cursor = self._execute(
+            "INSERT INTO outbox (account, op, task, options, next_attempt_at, created_at)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            (account, op, json.dumps(snapshot), json.dumps(options, default=_encode), now, now),
+        )
+        return cursor.lastrowid
+
+    def _rows(self, sql: str, params: Iterable = ()) -> List[Dict]:
+        rows = self._execute(sql, params).fetchall()
+        return [
+            {
+                **dict(row),
+                "task": json.loads(row["task"]),
+                "options": json.loads(row["options"], object_hook=_decode),
+            }
+            for row in rows
+        ]
+
+    def pending(self, account: str) -> List[Dict]:
+        return self._rows(
+            "SELECT * FROM outbox WHERE account = ? AND status = 'pending' ORDER BY id",
+            (account,),
+        )
+
+    def next_due(self, account: str, now: float | None = None) -> Dict | None:
+        """Oldest pending row, if its retry time has come."""
+
+        rows = self.due(account, now, limit=1)
+        return rows[0] if rows else None
+
+    def due(self, account: str, now: float | None = None, limit: int = BATCH_LIMIT) -> List[Dict]:
+        """The oldest pending rows whose retry time has come, up to ``limit``.
+
+        Rows run strictly in order, so a task's later mutation never
+        overtakes an earlier one that is still backing off: the run stops at
+        the first row that is not due yet and before a task's second row.
+        """
+
+        now = time.time() if now is None else now
+        rows = self._rows(
+            "SELECT * FROM outbox WHERE account = ? AND status = 'pending' ORDER BY id LIMIT ?",
+            (account, limit),
+        )
+        due: List[Dict] = []
+        task_ids = set()
+        for row in rows:
+            if row["next_attempt_at"] > now or row["task"]["id"] in task_ids:
+                break
+            task_ids.add(row["task"]["id"])
+            due.append(row)
+        return due
+
+    def failures(self, account: str) -> List[Dict]:
+        return self._rows(
+            "SELECT * FROM outbox WHERE account = ? AND status = 'failed' ORDER BY id",
+            (account,),
+        )
+
+    def mark_done(self, row_id: int) -> None:
+        self._execute(
+            "UPDATE outbox SET status = 'done', finished_at = ?, error = NULL WHERE id = ?",
+            (time.time(), row_id),
+        )
+
+    def mark_retry(self, row_id: int, attempts: int, error: Exception) -> None:
+        self._execute(
+            "UPDATE outbox SET attempts = ?, next_attempt_at = ?, error = ? WHERE id = ?",
+            (attempts, time.time() + retry_delay(attempts), str(error), row_id),
+        )
+
+    def mark_failed(self, row_id: int, attempts: int, error: Exception) -> None:
+        self._execute(
+            "UPDATE outbox SET status = 'failed', attempts = ?, finished_at = ?, error = ? WHERE id = ?",
+            (attempts, time.time(), str(error), row_id),
+        )
+
+    def claim(self, account: str) -> int:
+        """Move every other account's rows to ``account``; returns how many moved.
+
+        For single-user mode, where the file only ever holds one user's writes,
+        including rows queued under a key from an older app version.
+        """
+
+        return self._execute("UPDATE outbox SET account = ? WHERE account != ?", (account, account)).rowcount
+
+    def dismiss(self, row_id: int) -> None:
+        self._execute("DELETE FROM outbox WHERE id = ?", (row_id,))
+
+    def purge(self, older_than: float = DONE_RETENTION_SECONDS) -> None:
+        self._execute(
+            "DELETE FROM outbox WHERE status = 'done' AND finished_at < ?",
+            (time.time() - older_than,),
+        )
+
+    def apply_pending(
+        self, account: str, tasks: List[MutableMapping], fetched_at: float
+    ) -> List[MutableMapping]:
+        """``tasks`` as they look once every queued mutation has landed.
+
+        Rows finished after ``fetched_at`` are replayed too: the snapshot was
+        taken before Google applied them.
+        """
+
+        rows = self._rows(
+            "SELECT * FROM outbox WHERE account = ?"
+            " AND (status = 'pending' OR (status = 'done' AND finished_at >= ?)) ORDER BY id",
+            (account, fetched_at),
+        )
+        if not rows:
+            return tasks
+        hidden = set()
+        moved: Dict[str, Dict] = {}
+        for row in rows:
+            task_id = row["task"]["id"]
+            if row["op"] == "move":
+                moved[task_id] = row["options"]
+            else:
+                # Scheduled, completed and snoozed tasks all leave the list.
+                hidden.add(task_id)
+        result = []
+        for task in tasks:
+            task_id = task.get("id")
+            if task_id in hidden:
+                continue
+            if task_id in moved:
+                options = moved[task_id]
+                task = moved_task(task, options["destination_tasklist"], options["project"])
+            result.append(task)
+        return result
+
+
+def moved_task(task: MutableMapping, destination_tasklist: str, project: str) -> MutableMapping:
+    """Copy of a prepared ``task`` as it looks in ``destination_tasklist``."""
+
+    project_key = normalize_project(project)
+    moved = task.copy()
+    moved.update(
+        tasklist=destination_tasklist,
+        project=project,
+        project_key=project_key,
+        is_inbox=project_key in INBOX_PROJECT_KEYS,
+    )
+    return moved
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat(), "tz": getattr(value.tzinfo, "key", None)}
+    raise TypeError(f"Cannot store {type(value).__name__} in the outbox")
+
+
+def _decode(value: Dict):
+    if "__datetime__" in value:
+        parsed = datetime.fromisoformat(value["__datetime__"])
+        # Keep the IANA zone: event_body sends its name to Calendar.
+        return parsed.astimezone(ZoneInfo(value["tz"])) if value.get("tz") else parsed
+    return value
+
+
+def run_mutation(creds, op: str, task: MutableMapping, options: Dict) -> None:
+    if op == "schedule":
+        schedule_task(
+            creds,
+            task,
+            mark_complete=options.get("mark_complete", False),
+            start_time=options.get("start_time"),
+            event_id=options.get("event_id"),
+        )
+    elif op == "complete":
+        mark_task_complete(creds, task)
+    elif op == "snooze":
+        snooze_task(creds, task, days=options["days"])
+    elif op == "move":
+        move_task(creds, task, destination_tasklist=options["destination_tasklist"])
+    else:
+        raise ValueError(f"Unknown outbox operation: {op}")
+
+
+def add_to_queue(queue: MutationQueue, op: str, task: MutableMapping, options: Dict) -> None:
+    """Add an outbox row to a ``MutationQueue``, like ``run_mutation`` does for one call."""
+
+    if op == "schedule":
+        queue.schedule(
+            task,
+            mark_complete=options.get("mark_complete", False),
+            start_time=options.get("start_time"),
+            event_id=options.get("event_id"),
+        )
+    elif op == "complete":
+        queue.complete(task)
+    elif op == "snooze":
+        queue.snooze(task, days=options["days"])
+    elif op == "move":
+        queue.move(task, destination_tasklist=options["destination_tasklist"])
+    else:
+        raise ValueError(f"Unknown outbox operation: {op}")
+
+
+class OutboxWorker:
+    """Drain one account's outbox on a daemon thread.
+
+    A single due row is sent on its own; several (a bulk action or a day
+    plan) go out together through a ``MutationQueue`` batch. Transient
+    errors are retried with exponential backoff up to ``max_attempts``;
+    client errors fail the row at once.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        account: str,
+        creds,
+        max_attempts: int = MAX_ATTEMPTS,
+        poll_seconds: float = 1.0,
+    ) -> None:
+        self.outbox = outbox
+        self.account = account
+        self.creds = creds
+        self.max_attempts = max_attempts
+        self.poll_seconds = poll_seconds
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"outbox-{account}", daemon=True
+        )
+
+    def start(self) -> "OutboxWorker":
+        if not self._thread.is_alive() and not self._stop.is_set():
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Ask the thread to exit; with ``timeout``, wait that long for a write in flight."""
+
+        self._stop.set()
+        self._wake.set()
+        if timeout is not None and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def notify(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        self.outbox.purge()
+        while not self._stop.is_set():
+            self._wake.clear()
+            rows = self.outbox.due(self.account)
+            if not rows:
+                self._wake.wait(self.poll_seconds)
+                continue
+            if len(rows) == 1:
+                row = rows[0]
+                try:
+                    run_mutation(self.creds, row["op"], row["task"], row["options"])
+                except Exception as exc:  # noqa: BLE001
+                    self._record(row, exc)
+                else:
+                    self._record(row, None)
+                continue
+            queue = MutationQueue(self.creds)
+            for row in rows:
+                add_to_queue(queue, row["op"], row["task"], row["options"])
+            try:
+                errors = [result["error"] for result in queue.flush()]
+            except Exception as exc:  # noqa: BLE001
+                errors = [exc] * len(rows)
+            for row, error in zip(rows, errors):
+                self._record(row, error)
+
+    def _record(self, row: Dict, error: Exception | None) -> None:
+        attempts = row["attempts"] + 1
+        if error is None:
+            self.outbox.mark_done(row["id"])
+        elif _is_permanent(error) or attempts >= self.max_attempts:
+            self.outbox.mark_failed(row["id"], attempts, error)
+        else:
+            self.outbox.mark_retry(row["id"], attempts, error)
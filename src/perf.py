@@ -0,0 +1,354 @@
+"""Lightweight timing and tracing instrumentation for app reruns and API calls."""
+from __future__ import annotations
+
+import contextvars
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Dict, Iterable, Iterator, List, Tuple
+
+DEFAULT_HISTORY = 200
+DEFAULT_TRACE_HISTORY = 50
+
+# Set to False to turn every ``span``/``traced`` into a plain call.
+enabled = True
+
+
+def percentile(samples: Iterable[float], fraction: float) -> float:
+    """Nearest-rank percentile of ``samples`` (``fraction`` in 0..1)."""
+
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(fraction * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Timings:
+    """Keep the most recent durations (in seconds) recorded under each name."""
+
+    def __init__(self, history: int = DEFAULT_HISTORY) -> None:
+        self.history = history
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+
+    def record(self, name: str, seconds: float, calls: int = 1) -> None:
+        samples = self._samples.get(name)
+        if samples is None:
+            samples = self._samples.setdefault(name, deque(maxlen=self.history))
+        samples.append(seconds)
+        self._counts[name] = self._counts.get(name, 0) + calls
+
+    @contextmanager
+    def measure(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def timed(self, name: str) -> Callable:
+        """Decorator form of ``measure``."""
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.measure(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def last(self, name: str) -> float | None:
+        samples = self._samples.get(name)
+        return samples[-1] if samples else None
+
+    def summary(self) -> List[Tuple[str, float, float, float, int]]:
+        """``(name, last ms, p50 ms, p95 ms, calls)`` for every recorded name."""
+
+        return [
+            (
+                name,
+                samples[-1] * 1000,
+                percentile(samples, 0.5) * 1000,
+                percentile(samples, 0.95) * 1000,
+                self._counts[name],
+            )
+            for name, samples in sorted(self._samples.items())
+            if samples
+        ]
+
+
+class Trace:
+    """Spans recorded during one rerun (or one fragment rerun).
+
+    Regular spans keep their start offset, duration and nesting depth.
+    Hot functions traced with ``aggregate=True`` only add to a per-name
+    total and call count, which keeps their overhead to a few hundred ns.
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.started_at = time.time()
+        self._origin = time.perf_counter()
+        self.duration = 0.0
+        self.spans: List[Dict] = []
+        self.aggregates: Dict[str, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def add_span(self, name: str, started: float, duration: float, depth: int) -> None:
+        span = {
+            "name": name,
+            "start_ms": (started - self._origin) * 1000,
+            "duration_ms": duration * 1000,
+            "depth": depth,
+            "thread": threading.current_thread().name,
+        }
+        with self._lock:
+            self.spans.append(span)
+
+    def add_aggregate(self, name: str, duration: float) -> None:
+        with self._lock:
+            total = self.aggregates.get(name)
+            if total is None:
+                self.aggregates[name] = [duration, 1]
+            else:
+                total[0] += duration
+                total[1] += 1
+
+    def breakdown(self) -> List[Tuple[str, float, int]]:
+        """``(name, total ms, calls)`` per span name, slowest first."""
+
+        totals: Dict[str, List[float]] = {}
+        with self._lock:
+            for span in self.spans:
+                total = totals.setdefault(span["name"], [0.0, 0])
+                total[0] += span["duration_ms"]
+                total[1] += 1
+            for name, (seconds, calls) in self.aggregates.items():
+                total = totals.setdefault(name, [0.0, 0])
+                total[0] += seconds * 1000
+                total[1] += calls
+        return sorted(
+            ((name, total_ms, int(calls)) for name, (total_ms, calls) in totals.items()),
+            key=lambda row: row[1],
+            reverse=True,
+        )
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._origin
+
+
+_current_trace: contextvars.ContextVar[Trace | None] = contextvars.ContextVar(
+    "current_trace", default=None
+)
+_depth: contextvars.ContextVar[int] = contextvars.ContextVar("span_depth", default=0)
+
+# Spans recorded outside any trace: background refreshes, the outbox worker.
+BACKGROUND = Timings()
+
+
+@contextmanager
+def span(name: str) -> Iterator[None]:
+    """Time the block as ``name`` in the current trace (or ``BACKGROUND``)."""
+
+    if not enabled:
+        yield
+        return
+    depth = _depth.get()
+    token = _depth.set(depth + 1)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - started
+        _depth.reset(token)
+        trace = _current_trace.get()
+        if trace is None:
+            BACKGROUND.record(name, duration)
+        else:
+            trace.add_span(name, started, duration, depth)
+
+
+def traced(name: str, aggregate: bool = False) -> Callable:
+    """Decorator form of ``span``; ``aggregate`` suits functions called per task."""
+
+    def decorator(func: Callable) -> Callable:
+        if not aggregate:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with span(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        @functools.wraps(func)
+        def aggregated(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - started
+                trace = _current_trace.get()
+                if trace is None:
+                    BACKGROUND.record(name, duration)
+                else:
+                    trace.add_aggregate(name, duration)
+
+        return aggregated
+
+    return decorator
+
+
+def in_current_context(func: Callable) -> Callable:
+    """Bind ``func`` to the caller's trace, for work handed to a thread pool."""
+
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        # Each call gets its own copy: a Context can only be entered once at a time.
+        return context.copy().run(func, *args, **kwargs)
+
+    return wrapper
+
+
+class StartupReport:
+    """Time from the first import of this module to each startup milestone.
+
+    Every milestone (``imports``, ``first_render``, ``first_api_call``) is
+    recorded once per process; later ``mark`` calls are ignored.
+    """
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter()
+        self._milestones: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, name: str) -> None:
+        if name in self._milestones:
+            return
+        elapsed = time.perf_counter() - self.origin
+        with self._lock:
+            self._milestones.setdefault(name, elapsed)
+
+    def rows(self) -> List[Tuple[str, float]]:
+        """``(milestone, ms since startup)`` in the order they were reached."""
+
+        with self._lock:
+            return sorted(
+                ((name, seconds * 1000) for name, seconds in self._milestones.items()),
+                key=lambda row: row[1],
+            )
+
+
+STARTUP = StartupReport()
+
+
+class Tracer:
+    """Per-session history of traces with p50/p95 per span name."""
+
+    def __init__(self, history: int = DEFAULT_TRACE_HISTORY) -> None:
+        self.timings = Timings()
+        self._traces: Deque[Trace] = deque(maxlen=history)
+        self._open: Tuple[Trace, contextvars.Token] | None = None
+
+    def begin(self, name: str) -> Trace:
+        """Start a trace that stays current until ``end``.
+
+        Used around the top-level script, which cannot be wrapped in a
+        ``with`` block; a trace left open by ``st.rerun`` is closed here.
+        """
+
+        if self._open is not None:
+            self.end()
+        trace = Trace(name)
+        self._open = (trace, _current_trace.set(trace))
+        return trace
+
+    def end(self) -> None:
+        if self._open is None:
+            return
+        trace, token = self._open
+        self._open = None
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # Opened in another context (an earlier script thread).
+            _current_trace.set(None)
+        self._finish(trace)
+
+    @contextmanager
+    def trace(self, name: str) -> Iterator[None]:
+        """A span inside the current trace, or a new trace when there is none."""
+
+        if _current_trace.get() is not None:
+            with span(name):
+                yield
+            return
+        trace = Trace(name)
+        token = _current_trace.set(trace)
+        try:
+            yield
+        finally:
+            _current_trace.reset(token)
+            self._finish(trace)
+
+    def traced(self, name: str) -> Callable:
+        """Decorator form of ``trace``, for fragments that rerun on their own."""
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.trace(name):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def _finish(self, trace: Trace) -> None:
+        trace.finish()
+        self._traces.append(trace)
+        self.timings.record(trace.name, trace.duration)
+        for name, total_ms, calls in trace.breakdown():
+            self.timings.record(name, total_ms / 1000, calls)
+
+    def last(self, name: str | None = None) -> Trace | None:
+        """Most recent finished trace, optionally only among those called ``name``."""
+
+        for trace in reversed(self._traces):
+            if name is None or trace.name == name:
+                return trace
+        return None
+
+    def to_jsonl(self) -> str:
+        """Every span of the retained traces, one JSON object per line."""
+
+        lines = []
+        for index, trace in enumerate(self._traces):
+            header = {"trace": index, "trace_name": trace.name, "trace_started_at": trace.started_at}
+            lines.append(
+                json.dumps({**header, "name": trace.name, "duration_ms": trace.duration * 1000, "depth": -1})
+            )
+            lines.extend(json.dumps({**header, **span}) for span in trace.spans)
+            lines.extend(
+                json.dumps(
+                    {
+                        **header,
+                        "name": name,
+                        "duration_ms": seconds * 1000,
+                        "calls": calls,
+                        "aggregate": True,
+                    }
+                )
+                for name, (seconds, calls) in trace.aggregates.items()
+            )
+        return "\n".join(lines) + ("\n" if lines else "")
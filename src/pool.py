@@ -0,0 +1,140 @@
+"""Per-credentials pool of Google API discovery clients."""
+from __future__ import annotations
+
+import threading
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Tuple
+
+from .discovery import DISCOVERY_CACHE
+from .perf import span
+
+DEFAULT_MAX_CREDENTIALS = 64
+
+
+def _rooted_at(document: Dict, api_endpoint: str) -> Dict:
+    """``document`` with its ``rootUrl`` moved to match ``api_endpoint``.
+
+    ``api_endpoint`` only moves the base URL of single requests; batch
+    requests are sent to ``rootUrl + batchPath``, so they need this too.
+    """
+
+    service_path = document.get("servicePath", "")
+    root = api_endpoint
+    if service_path and api_endpoint.endswith(service_path):
+        root = api_endpoint[: -len(service_path)]
+    return {**document, "rootUrl": root}
+
+
+class ThreadLocalHttp:
+    """Authorized keep-alive transport that gives each thread its own connection.
+
+    ``httplib2.Http`` is not thread-safe, so a single discovery client can be
+    shared across threads as long as its transport hands every thread a
+    separate ``AuthorizedHttp``. Connections are reused across requests made
+    from the same thread. ``http_factory`` defaults to ``googleapiclient``'s
+    ``build_http``.
+    """
+
+    def __init__(self, credentials, http_factory: Callable | None = None) -> None:
+        self.credentials = credentials
+        self._http_factory = http_factory
+        self._local = threading.local()
+
+    def _http(self):
+        http = getattr(self._local, "http", None)
+        if http is None:
+            import google_auth_httplib2
+            from googleapiclient.http import build_http
+
+            http = self._local.http = google_auth_httplib2.AuthorizedHttp(
+                self.credentials, http=(self._http_factory or build_http)()
+            )
+        return http
+
+    def request(self, *args, **kwargs):
+        return self._http().request(*args, **kwargs)
+
+    def close(self) -> None:
+        http = getattr(self._local, "http", None)
+        if http is not None:
+            http.close()
+            self._local.http = None
+
+
+class ServicePool:
+    """Cache discovery clients per credentials object and API.
+
+    A client is rebuilt when the access token of its credentials changes
+    (after a refresh or re-authentication), so stale transports are dropped.
+    Clients are built from the parsed documents in ``DISCOVERY_CACHE``;
+    ``googleapiclient.discovery`` itself is imported on the first build.
+
+    Clients (and their connections) of at most ``max_credentials``
+    credentials objects are kept, least recently used first out; with one
+    credentials object per account that bounds the pool per account.
+    """
+
+    def __init__(
+        self,
+        client_options: Dict[str, Dict] | None = None,
+        max_credentials: int = DEFAULT_MAX_CREDENTIALS,
+    ) -> None:
+        # Optional per-API client options, e.g. {"tasks": {"api_endpoint": ...}}.
+        self.client_options = client_options or {}
+        self.max_credentials = max_credentials
+        self._lock = threading.Lock()
+        self._clients: "weakref.WeakKeyDictionary[object, Dict[Tuple[str, str], Tuple]]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._recent: "OrderedDict[int, weakref.ref]" = OrderedDict()
+
+    def _touch(self, creds) -> None:
+        self._recent[id(creds)] = weakref.ref(creds)
+        self._recent.move_to_end(id(creds))
+        while len(self._recent) > self.max_credentials:
+            stale = self._recent.popitem(last=False)[1]()
+            if stale is not None:
+                self._clients.pop(stale, None)
+
+    def __len__(self) -> int:
+        return len(self._clients)
+
+    def get(self, api: str, version: str, creds):
+        token = getattr(creds, "token", None)
+        with self._lock:
+            self._touch(creds)
+            per_creds = self._clients.setdefault(creds, {})
+            cached = per_creds.get((api, version))
+            if cached is not None and cached[0] == token:
+                return cached[1]
+            with span("services.discovery_build"):
+                from googleapiclient.discovery import build_from_document
+
+                # The shared document gets its method parameters filled in on
+                # first use; the fix-ups are idempotent, so clients can share it.
+                document = DISCOVERY_CACHE.get(api, version)
+                options = self.client_options.get(api) or {}
+                if options.get("api_endpoint"):
+                    document = _rooted_at(document, options["api_endpoint"])
+                service = build_from_document(
+                    document,
+                    http=ThreadLocalHttp(creds),
+                    client_options=self.client_options.get(api),
+                )
+            per_creds[(api, version)] = (token, service)
+            return service
+
+    def invalidate(self, creds=None) -> None:
+        """Drop cached clients for ``creds``, or every client when omitted."""
+
+        with self._lock:
+            if creds is None:
+                self._clients.clear()
+                self._recent.clear()
+            else:
+                self._clients.pop(creds, None)
+                self._recent.pop(id(creds), None)
+
+
+SERVICE_POOL = ServicePool()
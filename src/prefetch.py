@@ -0,0 +1,91 @@
+"""Background refresh of task snapshots."""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Callable, List, MutableMapping, NamedTuple
+
+from .auth import account_key
+
+DEFAULT_REFRESH_SECONDS = 300.0
+
+
+class TaskSnapshot(NamedTuple):
+    tasks: List[MutableMapping]
+    fetched_at: float  # time.time() when the fetch started
+    version: int
+
+
+class TaskPrefetcher:
+    """Keep an account's task snapshot fresh on a daemon thread.
+
+    ``load`` is called on the worker every ``interval`` seconds (``None``
+    disables the timer) and whenever ``request_refresh`` is called. Readers
+    get whole snapshots through ``snapshot()``; the worker swaps the
+    reference atomically, so the UI never waits on network I/O. The version
+    only increases when the task list actually changed.
+    """
+
+    def __init__(
+        self,
+        account: str,
+        load: Callable[[], List[MutableMapping]],
+        interval: float | None = DEFAULT_REFRESH_SECONDS,
+    ) -> None:
+        self.account = account
+        self.interval = interval
+        self.last_error: Exception | None = None
+        self._load = load
+        self._snapshot: TaskSnapshot | None = None
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name=f"task-prefetch-{account}", daemon=True
+        )
+
+    def start(self) -> "TaskPrefetcher":
+        if not self._thread.is_alive() and not self._stop.is_set():
+            self._thread.start()
+        return self
+
+    def stop(self, timeout: float | None = None) -> None:
+        """Ask the thread to exit; with ``timeout``, wait that long for a load in flight."""
+
+        self._stop.set()
+        self._wake.set()
+        if timeout is not None and self._thread.is_alive() and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+
+    def snapshot(self) -> TaskSnapshot | None:
+        return self._snapshot
+
+    def request_refresh(self) -> None:
+        self._wake.set()
+
+    def on_write(self, creds, task: MutableMapping) -> None:
+        """Write listener for ``services.add_write_listener``."""
+
+        if account_key(creds) == self.account:
+            self.request_refresh()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._wake.clear()
+            # Stamp the snapshot with the start of the fetch: writes that
+            # land while it runs may or may not be in it.
+            started = time.time()
+            try:
+                tasks = self._load()
+            except Exception as exc:  # noqa: BLE001
+                self.last_error = exc
+            else:
+                self.last_error = None
+                previous = self._snapshot
+                if previous is None or previous.tasks is not tasks:
+                    # The same list back means a cached copy, not a newer fetch.
+                    if previous is not None and previous.tasks == tasks:
+                        self._snapshot = previous._replace(fetched_at=started)
+                    else:
+                        version = previous.version + 1 if previous else 1
+                        self._snapshot = TaskSnapshot(tasks, started, version)
+            self._wake.wait(self.interval)
@@ -0,0 +1,221 @@
+"""Client-side rate limiting and retries for Google API calls."""
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from typing import Callable, Dict, Mapping, Tuple
+
+from googleapiclient.errors import HttpError
+
+from .perf import STARTUP, span
+
+# Requests per second and burst size per API. Calendar allows 600 queries per
+# minute per user; Tasks is kept a little lower to leave room for other
+# clients of the same account.
+API_RATES: Dict[str, Tuple[float, int]] = {
+    "tasks": (8.0, 20),
+    "calendar": (10.0, 20),
+}
+MAX_RETRIES = 5
+BACKOFF_BASE_SECONDS = 0.5
+BACKOFF_MAX_SECONDS = 32.0
+
+TRANSIENT_STATUSES = frozenset({408, 500, 502, 503, 504})
+# ``errors[].reason`` values and the ``details[].reason`` of the ErrorInfo.
+RATE_LIMIT_REASONS = frozenset({"rateLimitExceeded", "userRateLimitExceeded", "RATE_LIMIT_EXCEEDED"})
+INSUFFICIENT_SCOPE_REASONS = frozenset({"insufficientPermissions", "ACCESS_TOKEN_SCOPE_INSUFFICIENT"})
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled at ``rate`` tokens per second."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: int = 1) -> float:
+        """Take ``tokens``, sleeping until they are available; return the wait.
+
+        Requests bigger than the bucket (a full batch) wait for a full bucket
+        and leave it in debt, which later callers pay off.
+        """
+
+        needed = min(tokens, self.capacity)
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return waited
+                delay = (needed - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+def status_of(exc: Exception) -> int | None:
+    return exc.resp.status if isinstance(exc, HttpError) else None
+
+
+def _has_reason(exc: HttpError, reasons: frozenset) -> bool:
+    """Whether ``errors[]`` or ``details[]`` of the error body name one of ``reasons``.
+
+    googleapiclient keeps only one of the two in ``error_details`` (``details``
+    when both are present), so the body is read again.
+    """
+
+    entries = list(exc.error_details) if isinstance(exc.error_details, list) else []
+    try:
+        error = json.loads(exc.content.decode("utf-8")).get("error", {})
+    except (AttributeError, UnicodeDecodeError, ValueError):
+        error = {}
+    if isinstance(error, Mapping):
+        for key in ("errors", "details"):
+            if isinstance(error.get(key), list):
+                entries.extend(error[key])
+    return any(isinstance(entry, Mapping) and entry.get("reason") in reasons for entry in entries)
+
+
+def is_rate_limited(exc: Exception) -> bool:
+    """Whether Google rejected the call for quota, so it was not applied."""
+
+    status = status_of(exc)
+    if status == 429:
+        return True
+    if status == 403:
+        return _has_reason(exc, RATE_LIMIT_REASONS)
+    return False
+
+
+def is_insufficient_scope(exc: Exception) -> bool:
+    """Whether the token lacks a scope the call needs (granted by signing in again)."""
+
+    return status_of(exc) == 403 and _has_reason(exc, INSUFFICIENT_SCOPE_REASONS)
+
+
+def is_transient(exc: Exception) -> bool:
+    """Server or network errors after which the call may or may not have run."""
+
+    if isinstance(exc, HttpError):
+        return exc.resp.status in TRANSIENT_STATUSES
+    return isinstance(exc, (ConnectionError, TimeoutError))
+
+
+def api_for(request) -> str:
+    return "calendar" if "/calendar/" in request.uri else "tasks"
+
+
+class RequestExecutor:
+    """Run API requests behind per-API token buckets with retry and backoff.
+
+    Rate-limit rejections are always retried. Transient errors are retried
+    only for idempotent requests, or when ``recover`` can tell whether the
+    first attempt already went through. Counters are read with ``stats()``.
+    """
+
+    def __init__(
+        self,
+        rates: Mapping[str, Tuple[float, int]] = API_RATES,
+        max_retries: int = MAX_RETRIES,
+        base_delay: float = BACKOFF_BASE_SECONDS,
+        max_delay: float = BACKOFF_MAX_SECONDS,
+    ) -> None:
+        self.buckets: Dict[str, TokenBucket] = {
+            api: TokenBucket(rate, capacity) for api, (rate, capacity) in rates.items()
+        }
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._stats = {
+            "requests": 0,
+            "retries": 0,
+            "failures": 0,
+            "throttled_seconds": 0.0,
+            "backoff_seconds": 0.0,
+        }
+        self._lock = threading.Lock()
+
+    def _count(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._stats[name] += amount
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._stats)
+
+    def throttle(self, api: str, tokens: int = 1) -> None:
+        bucket = self.buckets.get(api)
+        self._count("requests", tokens)
+        if bucket is not None:
+            self._count("throttled_seconds", bucket.acquire(tokens))
+
+    def should_retry(self, exc: Exception, attempt: int, idempotent: bool = True) -> bool:
+        if attempt >= self.max_retries:
+            return False
+        return is_rate_limited(exc) or (idempotent and is_transient(exc))
+
+    def backoff(self, attempt: int, exc: Exception | None = None) -> None:
+        """Sleep before retry number ``attempt`` (1-based), with full jitter.
+
+        A ``Retry-After`` header from the server takes precedence.
+        """
+
+        retry_after = None
+        if isinstance(exc, HttpError):
+            retry_after = exc.resp.get("retry-after")
+        try:
+            delay = min(float(retry_after), self.max_delay)
+        except (TypeError, ValueError):
+            delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        self._count("retries")
+        self._count("backoff_seconds", delay)
+        time.sleep(delay)
+
+    def failed(self, exc: Exception) -> None:
+        # 304 Not Modified is how conditional requests succeed.
+        if status_of(exc) != 304:
+            self._count("failures")
+
+    def execute(
+        self,
+        request,
+        idempotent: bool = True,
+        recover: Callable[[], object | None] | None = None,
+    ):
+        """Execute ``request``, retrying as described on the class.
+
+        ``recover`` is called before retrying a transient failure; a
+        non-``None`` result means the failed attempt did land and is returned
+        as its response.
+        """
+
+        api = api_for(request)
+        attempt = 0
+        while True:
+            self.throttle(api)
+            try:
+                with span(f"api.{api}"):
+                    try:
+                        return request.execute()
+                    finally:
+                        STARTUP.mark("first_api_call")
+            except Exception as exc:  # noqa: BLE001
+                if not self.should_retry(exc, attempt, idempotent or recover is not None):
+                    self.failed(exc)
+                    raise
+                attempt += 1
+                self.backoff(attempt, exc)
+                if recover is not None and not is_rate_limited(exc):
+                    recovered = recover()
+                    if recovered is not None:
+                        return recovered
+
+
+REQUEST_EXECUTOR = RequestExecutor()
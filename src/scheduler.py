@@ -0,0 +1,186 @@
+"""Bulk auto-scheduling of tasks into free calendar time."""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone, tzinfo
+from typing import Dict, Iterable, List, MutableMapping, Sequence, Tuple
+
+from .ratelimit import REQUEST_EXECUTOR
+from .services import build_calendar_service, task_sort_key
+from .utils import DEFAULT_DURATION_MINUTES, parse_rfc3339, round_up_to_five_minutes
+
+Interval = Tuple[int, int]  # [start, end) in epoch minutes
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _to_minutes(moment: datetime) -> int:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int((moment - EPOCH).total_seconds() // 60)
+
+
+def _from_minutes(minutes: int, tz: tzinfo) -> datetime:
+    return (EPOCH + timedelta(minutes=minutes)).astimezone(tz)
+
+
+def fetch_busy_intervals(creds, start: datetime, end: datetime, calendar_id: str = "primary") -> List[Interval]:
+    """Read busy intervals between ``start`` and ``end`` with a single freeBusy query."""
+
+    calendar = build_calendar_service(creds)
+    response = REQUEST_EXECUTOR.execute(
+        calendar.freebusy().query(
+            body={
+                "timeMin": start.isoformat(),
+                "timeMax": end.isoformat(),
+                "items": [{"id": calendar_id}],
+            }
+        )
+    )
+    busy = response.get("calendars", {}).get(calendar_id, {}).get("busy", [])
+    return [
+        (_to_minutes(parse_rfc3339(slot["start"])), _to_minutes(parse_rfc3339(slot["end"])))
+        for slot in busy
+    ]
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sort and coalesce overlapping or touching intervals."""
+
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def working_windows(
+    start: datetime, end: datetime, tz: tzinfo, working_hours: Tuple[int, int] | None
+) -> List[Interval]:
+    """Split ``[start, end)`` into the daily working-hour windows it covers."""
+
+    if working_hours is None:
+        return [(_to_minutes(start), _to_minutes(end))]
+    first_hour, last_hour = working_hours
+    windows: List[Interval] = []
+    day: date = start.astimezone(tz).date()
+    while True:
+        # Offsets from midnight, so the slider's 24 means the end of the day.
+        midnight = datetime.combine(day, time(0), tzinfo=tz)
+        day_start = midnight + timedelta(hours=first_hour)
+        if day_start >= end:
+            break
+        day_end = midnight + timedelta(hours=last_hour)
+        window = (_to_minutes(max(day_start, start)), _to_minutes(min(day_end, end)))
+        if window[0] < window[1]:
+            windows.append(window)
+        day += timedelta(days=1)
+    return windows
+
+
+def free_gaps(windows: Sequence[Interval], busy: Iterable[Interval]) -> List[Interval]:
+    """Subtract merged ``busy`` intervals from sorted ``windows`` in one linear sweep."""
+
+    merged = merge_intervals(busy)
+    gaps: List[Interval] = []
+    cursor = 0
+    for window_start, window_end in windows:
+        position = window_start
+        while cursor < len(merged) and merged[cursor][1] <= window_start:
+            cursor += 1
+        index = cursor
+        while index < len(merged) and merged[index][0] < window_end:
+            busy_start, busy_end = merged[index]
+            if busy_start > position:
+                gaps.append((position, busy_start))
+            position = max(position, busy_end)
+            index += 1
+        if position < window_end:
+            gaps.append((position, window_end))
+    return gaps
+
+
+class _GapTree:
+    """Max segment tree over remaining gap lengths for leftmost first-fit queries."""
+
+    def __init__(self, lengths: Sequence[int]) -> None:
+        self.size = 1
+        while self.size < max(1, len(lengths)):
+            self.size *= 2
+        self.tree = [0] * (2 * self.size)
+        self.tree[self.size : self.size + len(lengths)] = lengths
+        for node in range(self.size - 1, 0, -1):
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+
+    def first_fit(self, length: int) -> int | None:
+        if self.tree[1] < length:
+            return None
+        node = 1
+        while node < self.size:
+            node = 2 * node if self.tree[2 * node] >= length else 2 * node + 1
+        return node - self.size
+
+    def update(self, index: int, length: int) -> None:
+        node = index + self.size
+        self.tree[node] = length
+        node //= 2
+        while node:
+            self.tree[node] = max(self.tree[2 * node], self.tree[2 * node + 1])
+            node //= 2
+
+
+def pack_tasks(
+    tasks: Iterable[MutableMapping],
+    gaps: Sequence[Interval],
+    tz: tzinfo = timezone.utc,
+    buffer_minutes: int = 0,
+) -> Tuple[List[Dict], List[MutableMapping]]:
+    """Place tasks in priority order into the earliest free gap that fits.
+
+    Tasks are ordered with ``task_sort_key`` (overdue, then routines). Each
+    placement is ``O(log gaps)``. Returns ``(placements, unplaced)`` where a
+    placement is ``{"task", "start", "end"}``.
+    """
+
+    starts = [gap_start for gap_start, _ in gaps]
+    tree = _GapTree([gap_end - gap_start for gap_start, gap_end in gaps])
+    placements: List[Dict] = []
+    unplaced: List[MutableMapping] = []
+    for task in sorted(tasks, key=task_sort_key):
+        duration = int(task.get("duration") or DEFAULT_DURATION_MINUTES)
+        index = tree.first_fit(duration)
+        if index is None:
+            unplaced.append(task)
+            continue
+        start = starts[index]
+        placements.append(
+            {
+                "task": task,
+                "start": _from_minutes(start, tz),
+                "end": _from_minutes(start + duration, tz),
+            }
+        )
+        taken = min(duration + buffer_minutes, tree.tree[tree.size + index])
+        starts[index] = start + taken
+        tree.update(index, tree.tree[tree.size + index] - taken)
+    placements.sort(key=lambda placement: placement["start"])
+    return placements, unplaced
+
+
+def plan_schedule(
+    creds,
+    tasks: Iterable[MutableMapping],
+    end: datetime,
+    start: datetime | None = None,
+    tz: tzinfo = timezone.utc,
+    working_hours: Tuple[int, int] | None = None,
+    buffer_minutes: int = 0,
+) -> Tuple[List[Dict], List[MutableMapping]]:
+    """Pack ``tasks`` into the free time of the primary calendar until ``end``."""
+
+    start = start or round_up_to_five_minutes(datetime.now(tz))
+    busy = fetch_busy_intervals(creds, start, end)
+    gaps = free_gaps(working_windows(start, end, tz, working_hours), busy)
+    return pack_tasks(tasks, gaps, tz=tz, buffer_minutes=buffer_minutes)
+
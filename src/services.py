@@ -1,30 +1,84 @@
 """Google Tasks and Calendar service helpers."""
 from __future__ import annotations
 
-from datetime import datetime, timedelta, timezone
-from typing import Dict, List, MutableMapping
-
-from dateutil import parser as date_parser
-from googleapiclient.discovery import build
-
-from .utils import parse_task_duration, round_up_to_five_minutes
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Dict, List, MutableMapping, Tuple
+
+from googleapiclient.errors import HttpError
+
+from .perf import in_current_context, traced
+from .pool import SERVICE_POOL
+from .ratelimit import REQUEST_EXECUTOR
+from .sync import TaskSyncStore, sync_watermark
+from .frame import TaskFrame
+from .models import INBOX, OVERDUE, ROUTINE, Task
+from .utils import (
+    INBOX_PROJECT_KEYS,
+    extract_tags,
+    normalize_project,
+    parse_rfc3339,
+    parse_task_durations,
+    round_up_to_five_minutes,
+)
 
 ROUTINE_LIST_NAME = "Rutinas"
+DEFAULT_FETCH_CONCURRENCY = 8
+TASKLISTS_PAGE_SIZE = 100
+TASKS_PAGE_SIZE = 100
+
+_write_listeners: List[Callable[[object, MutableMapping], None]] = []
+_event_listeners: List[Callable[[object, Dict], None]] = []
 
 
 def build_tasks_service(creds):
-    return build("tasks", "v1", credentials=creds, cache_discovery=False)
+    return SERVICE_POOL.get("tasks", "v1", creds)
 
 
 def build_calendar_service(creds):
-    return build("calendar", "v3", credentials=creds, cache_discovery=False)
+    return SERVICE_POOL.get("calendar", "v3", creds)
+
+
+def add_write_listener(listener: Callable[[object, MutableMapping], None]) -> None:
+    """Register ``listener(creds, task)`` to be called after every task mutation."""
+
+    if listener not in _write_listeners:
+        _write_listeners.append(listener)
+
+
+def remove_write_listener(listener: Callable[[object, MutableMapping], None]) -> None:
+    if listener in _write_listeners:
+        _write_listeners.remove(listener)
+
+
+def notify_write(creds, task: MutableMapping) -> None:
+    for listener in list(_write_listeners):
+        listener(creds, task)
+
+
+def add_event_listener(listener: Callable[[object, Dict], None]) -> None:
+    """Register ``listener(creds, event)`` to be called with every calendar event the app creates."""
+
+    if listener not in _event_listeners:
+        _event_listeners.append(listener)
+
+
+def remove_event_listener(listener: Callable[[object, Dict], None]) -> None:
+    if listener in _event_listeners:
+        _event_listeners.remove(listener)
+
+
+def notify_event(creds, event: Dict) -> None:
+    for listener in list(_event_listeners):
+        listener(creds, event)
 
 
 def _parse_due_date(value: str | None) -> datetime | None:
     if not value:
         return None
     try:
-        parsed = date_parser.isoparse(value)
+        parsed = parse_rfc3339(value)
     except (TypeError, ValueError):
         return None
     if parsed.tzinfo is None:
@@ -32,61 +86,214 @@ def _parse_due_date(value: str | None) -> datetime | None:
     return parsed
 
 
-def fetch_tasks(creds) -> List[MutableMapping]:
-    """Fetch actionable tasks grouped by their Google Task List (projects)."""
+def _list_all_pages(
+    list_method: Callable, if_none_match: str | None = None, **params
+) -> Tuple[List[Dict] | None, str | None]:
+    """Execute a ``list`` request and follow ``nextPageToken`` until exhausted.
+
+    Returns ``(items, etag)``. The etag is only reported for single-page
+    results, since a conditional request can only validate the first page.
+    When ``if_none_match`` is given and the server answers 304 Not Modified,
+    ``items`` is ``None``.
+    """
+
+    items: List[Dict] = []
+    page_token = None
+    etag = None
+    while True:
+        request = list_method(pageToken=page_token, **params)
+        if if_none_match and page_token is None:
+            request.headers["If-None-Match"] = if_none_match
+        try:
+            response = REQUEST_EXECUTOR.execute(request)
+        except HttpError as exc:
+            if exc.resp.status == 304:
+                return None, if_none_match
+            raise
+        items.extend(response.get("items", []))
+        if page_token is None:
+            etag = response.get("etag")
+        page_token = response.get("nextPageToken")
+        if page_token:
+            etag = None
+        else:
+            return items, etag
+
+
+@traced("services.task_record", aggregate=True)
+def _task_record(
+    task: Dict,
+    project_name: str,
+    project_id: str,
+    is_routine: bool,
+    today: date,
+    duration: int | None,
+) -> Task:
+    due_date = _parse_due_date(task.get("due"))
+    title = task.get("title", "Untitled Task")
+    notes = task.get("notes")
+    project_key = normalize_project(project_name)
+    flags = ROUTINE if is_routine else 0
+    if due_date and due_date.date() < today:
+        flags |= OVERDUE
+    if project_key in INBOX_PROJECT_KEYS:
+        flags |= INBOX
+    return Task(
+        task.get("id"),
+        title,
+        project_name,
+        project_id,
+        duration=duration,
+        notes=notes,
+        due_epoch=int(due_date.timestamp()) if due_date else None,
+        flags=flags,
+        tags=extract_tags(title, notes),
+        project_key=project_key,
+    )
+
+
+def task_sort_key(task: MutableMapping) -> tuple:
+    """Overdue tasks first, then routines, then alphabetical by title."""
+
+    # Lower tuple sorts earlier.
+    if isinstance(task, Task):
+        return (0 if task.flags & OVERDUE else 1, 0 if task.flags & ROUTINE else 1, task.title.lower())
+    priority_overdue = 0 if task.get("is_overdue") else 1
+    priority_routine = 0 if task.get("is_routine") else 1
+    return (priority_overdue, priority_routine, task.get("title", "").lower())
+
+
+def _is_routine_list(project_name: str) -> bool:
+    return project_name.strip().lower() == ROUTINE_LIST_NAME.lower()
+
+
+def _list_records(
+    items: List[Dict], project_name: str, project_id: str, today: date
+) -> List[MutableMapping]:
+    """Records for the tasks of one list, with their durations parsed in one batch."""
+
+    is_routine = _is_routine_list(project_name)
+    durations = parse_task_durations(items, default=None)
+    return [
+        _task_record(task, project_name, project_id, is_routine, today, duration)
+        for task, duration in zip(items, durations)
+    ]
+
+
+@traced("services.fetch_tasks")
+def fetch_tasks(
+    creds,
+    max_workers: int = DEFAULT_FETCH_CONCURRENCY,
+    sync_store: TaskSyncStore | None = None,
+    columnar: bool = False,
+) -> List[MutableMapping] | TaskFrame:
+    """Fetch actionable tasks grouped by their Google Task List (projects).
+
+    Every page of every task list is read; the per-list requests run on a
+    thread pool bounded by ``max_workers``. When a ``sync_store`` is given,
+    lists that were synced before only request tasks changed since their
+    high-water mark (``updatedMin`` with ``showDeleted``) and the changes are
+    merged into the store, which is saved when anything changed. Requests
+    are revalidated with the ETags kept in the store, so unchanged lists
+    cost a 304 response.
+    With ``columnar`` the tasks come back as a ``TaskFrame``, sorted with
+    NumPy, instead of a sorted list.
+    """
 
     service = build_tasks_service(creds)
-    projects = service.tasklists().list(maxResults=200).execute().get("items", [])
+    projects, lists_etag = _list_all_pages(
+        service.tasklists().list,
+        if_none_match=sync_store.lists_etag if sync_store else None,
+        maxResults=TASKLISTS_PAGE_SIZE,
+    )
+    if projects is None:
+        projects = sync_store.known_lists()
+    today = datetime.now(timezone.utc).date()
+    updated_min = sync_watermark()
+
+    def fetch_project(project: Dict) -> Tuple[List[Dict] | None, str | None]:
+        params = {"tasklist": project.get("id"), "maxResults": TASKS_PAGE_SIZE}
+        since = sync_store.watermark(project.get("id")) if sync_store else None
+        etag = None
+        if since:
+            # Completed and deleted tasks must come back so they can be dropped locally.
+            params.update(updatedMin=since, showCompleted=True, showHidden=True, showDeleted=True)
+            etag = sync_store.etag(project.get("id"))
+        else:
+            params.update(showCompleted=False, showHidden=False)
+        return _list_all_pages(service.tasks().list, if_none_match=etag, **params)
+
+    responses: List[Tuple[List[Dict] | None, str | None]] = []
+    if projects:
+        workers = max(1, min(max_workers, len(projects)))
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fetch-tasks") as pool:
+            responses = list(pool.map(in_current_context(fetch_project), projects))
+
     collected: List[MutableMapping] = []
-    now = datetime.now(timezone.utc).date()
+    if sync_store is None:
+        for project, (items, _) in zip(projects, responses):
+            project_name = project.get("title", "Untitled Project")
+            collected.extend(_list_records(items, project_name, project.get("id"), today))
+        return _sorted_tasks(collected, columnar)
 
-    for project in projects:
+    for project, (items, etag) in zip(projects, responses):
         project_id = project.get("id")
-        project_name = project.get("title", "Untitled Project")
-        is_routine_list = project_name.strip().lower() == ROUTINE_LIST_NAME.lower()
-        items = (
-            service.tasks()
-            .list(tasklist=project_id, showCompleted=False, showHidden=False)
-            .execute()
-            .get("items", [])
+        if items is None:
+            # 304 Not Modified: nothing changed since the previous delta.
+            sync_store.rename(project_id, project.get("title", "Untitled Project"))
+            continue
+        sync_store.apply(
+            project_id,
+            project.get("title", "Untitled Project"),
+            items,
+            updated_min=updated_min,
+            full=sync_store.watermark(project_id) is None,
+            etag=etag,
         )
-        for task in items:
-            due_date = _parse_due_date(task.get("due"))
-            title = task.get("title", "Untitled Task")
-            duration = parse_task_duration(title, task.get("notes"), default=None)
-            is_overdue = bool(due_date and due_date.date() < now)
-            collected.append(
-                {
-                    "id": task.get("id"),
-                    "title": title,
-                    "project": project_name,
-                    "duration": duration,
-                    "tasklist": project_id,
-                    "notes": task.get("notes"),
-                    "due": due_date.isoformat() if due_date else None,
-                    "is_routine": is_routine_list,
-                    "is_overdue": is_overdue,
-                }
-            )
-
-    def sort_key(task: MutableMapping) -> tuple:
-        # Lower tuple sorts earlier.
-        priority_overdue = 0 if task.get("is_overdue") else 1
-        priority_routine = 0 if task.get("is_routine") else 1
-        return (priority_overdue, priority_routine, task.get("title", "").lower())
-
-    return sorted(collected, key=sort_key)
+    sync_store.retain(project.get("id") for project in projects)
+    sync_store.set_lists_etag(lists_etag)
+    # When every list answered 304, the file on disk is already current.
+    if sync_store.changed:
+        sync_store.save()
 
+    for project_id, project_name, items in sync_store.iter_tasks():
+        collected.extend(_list_records(items, project_name, project_id, today))
+    return _sorted_tasks(collected, columnar)
 
-def schedule_task(
-    creds,
-    task: MutableMapping,
-    mark_complete: bool = False,
-    start_time: datetime | None = None,
+
+def _sorted_tasks(tasks: List[Task], columnar: bool) -> List[MutableMapping] | TaskFrame:
+    if columnar:
+        return TaskFrame(tasks, sort=True)
+    return sorted(tasks, key=task_sort_key)
+
+
+def new_event_id() -> str:
+    """Client-chosen Calendar event id (base32hex), so a retried insert answers 409."""
+
+    return uuid.uuid4().hex
+
+
+def already_applied(exc: Exception, op: str) -> bool:
+    """Whether ``exc`` from a retried call means its first attempt went through.
+
+    A repeated event insert conflicts on the event id, and a repeated delete
+    or move finds the task gone from its list.
+    """
+
+    if not isinstance(exc, HttpError):
+        return False
+    if op == "insert_event":
+        return exc.resp.status == 409
+    if op in ("delete", "move"):
+        return exc.resp.status in (404, 410)
+    return False
+
+
+def event_body(
+    task: MutableMapping, start_time: datetime | None = None, event_id: str | None = None
 ) -> Dict:
-    """Create a Calendar event for the provided task and optionally complete it."""
+    """Calendar event resource for blocking time on ``task``."""
 
-    calendar = build_calendar_service(creds)
     start = start_time or round_up_to_five_minutes(datetime.now(timezone.utc))
     if start.tzinfo is None:
         start = start.replace(tzinfo=timezone.utc)
@@ -95,7 +302,7 @@ def schedule_task(
     end_time = start + timedelta(minutes=duration_minutes)
     time_zone = getattr(start.tzinfo, "key", None) or "UTC"
 
-    event_body = {
+    body = {
         "summary": task.get("title", "Task"),
         "description": f"From TurboOrganizer project: {task.get('project', 'Inbox')}",
         "start": {
@@ -107,59 +314,116 @@ def schedule_task(
             "timeZone": time_zone,
         },
     }
-    event = (
-        calendar.events()
-        .insert(calendarId="primary", body=event_body, sendUpdates="none")
-        .execute()
+    if event_id:
+        body["id"] = event_id
+    return body
+
+
+def snooze_body(task: MutableMapping, days: int) -> Dict:
+    new_due = (
+        datetime.now(timezone.utc) + timedelta(days=days)
+    ).replace(hour=0, minute=0, second=0, microsecond=0)
+    return {"id": task["id"], "due": new_due.isoformat()}
+
+
+def _event_insert_request(
+    calendar, task: MutableMapping, start_time: datetime | None = None, event_id: str | None = None
+):
+    return calendar.events().insert(
+        calendarId="primary",
+        body=event_body(task, start_time, event_id or new_event_id()),
+        sendUpdates="none",
+    )
+
+
+def _complete_request(service, task: MutableMapping):
+    return service.tasks().patch(
+        tasklist=task["tasklist"],
+        task=task["id"],
+        body={"id": task["id"], "status": "completed"},
+    )
+
+
+def _snooze_request(service, task: MutableMapping, days: int):
+    return service.tasks().patch(
+        tasklist=task["tasklist"],
+        task=task["id"],
+        body=snooze_body(task, days),
     )
 
+
+def _move_request(service, task: MutableMapping, destination_tasklist: str):
+    return service.tasks().move(
+        tasklist=task["tasklist"], task=task["id"], destinationTasklist=destination_tasklist
+    )
+
+
+@traced("services.schedule_task")
+def schedule_task(
+    creds,
+    task: MutableMapping,
+    mark_complete: bool = False,
+    start_time: datetime | None = None,
+    event_id: str | None = None,
+) -> Dict:
+    """Create a Calendar event for the provided task and optionally complete it.
+
+    Pass the same ``event_id`` when replaying a schedule that may already
+    have reached Google; the existing event is returned instead of a copy.
+    """
+
+    calendar = build_calendar_service(creds)
+    event_id = event_id or new_event_id()
+    try:
+        event = REQUEST_EXECUTOR.execute(_event_insert_request(calendar, task, start_time, event_id))
+    except HttpError as exc:
+        if not already_applied(exc, "insert_event"):
+            raise
+        event = REQUEST_EXECUTOR.execute(calendar.events().get(calendarId="primary", eventId=event_id))
+    notify_event(creds, event)
+
     if mark_complete:
         mark_task_complete(creds, task)
+    else:
+        notify_write(creds, task)
 
     return event
 
 
+@traced("services.mark_task_complete")
 def mark_task_complete(creds, task: MutableMapping) -> None:
     service = build_tasks_service(creds)
-    service.tasks().patch(
-        tasklist=task["tasklist"],
-        task=task["id"],
-        body={"id": task["id"], "status": "completed"},
-    ).execute()
+    REQUEST_EXECUTOR.execute(_complete_request(service, task))
+    notify_write(creds, task)
 
 
+@traced("services.snooze_task")
 def snooze_task(creds, task: MutableMapping, days: int = 1) -> MutableMapping:
     """Postpone a task by pushing its due date forward."""
 
     service = build_tasks_service(creds)
-    new_due = (
-        datetime.now(timezone.utc) + timedelta(days=days)
-    ).replace(hour=0, minute=0, second=0, microsecond=0)
-
-    return (
-        service.tasks()
-        .patch(
-            tasklist=task["tasklist"],
-            task=task["id"],
-            body={"id": task["id"], "due": new_due.isoformat()},
-        )
-        .execute()
-    )
+    updated = REQUEST_EXECUTOR.execute(_snooze_request(service, task, days))
+    notify_write(creds, task)
+    return updated
 
 
+@traced("services.move_task")
 def move_task(creds, task: MutableMapping, destination_tasklist: str) -> MutableMapping:
-    """Move a task to another task list by recreating it and deleting the original."""
+    """Move a task to another task list with the API's native ``tasks.move``.
+
+    One request, and the task keeps its id, notes, links, status and
+    subtasks. A retried move that finds the task gone from its old list has
+    already landed, so the task is read back from the destination.
+    """
 
     service = build_tasks_service(creds)
-    body = {
-        "title": task.get("title"),
-        "notes": task.get("notes"),
-        "due": task.get("due"),
-    }
-    created = (
-        service.tasks()
-        .insert(tasklist=destination_tasklist, body=body)
-        .execute()
-    )
-    service.tasks().delete(tasklist=task["tasklist"], task=task["id"]).execute()
-    return created
+    try:
+        moved = REQUEST_EXECUTOR.execute(_move_request(service, task, destination_tasklist))
+    except HttpError as exc:
+        if not already_applied(exc, "move"):
+            raise
+        moved = REQUEST_EXECUTOR.execute(
+            service.tasks().get(tasklist=destination_tasklist, task=task["id"])
+        )
+    notify_write(creds, task)
+    return moved
@@ -0,0 +1,163 @@
+"""Indexed in-memory task store backing the task views."""
+from __future__ import annotations
+
+import sys
+from datetime import date
+from operator import attrgetter
+from typing import Dict, Iterable, Iterator, List, Set, Tuple
+
+from .models import INBOX, Task
+from .perf import traced
+from .utils import DurationIndex
+
+_task_id = attrgetter("id")
+
+
+def _index_add(index: Dict, key, task_id: str) -> None:
+    index.setdefault(key, set()).add(task_id)
+
+
+def _index_discard(index: Dict, key, task_id: str) -> None:
+    bucket = index.get(key)
+    if bucket is not None:
+        bucket.discard(task_id)
+        if not bucket:
+            del index[key]
+
+
+class TaskStore:
+    """Tasks keyed by id with inverted indexes for the Decision Engine filters.
+
+    Tasks are the ``Task`` records returned by ``prepare_tasks``. Iteration
+    and query results keep the order the tasks were added in (the
+    ``fetch_tasks`` priority order). Removal is ``O(tags)`` per task.
+    """
+
+    def __init__(self, tasks: Iterable[Task] = ()) -> None:
+        self._tasks: Dict[str, Task] = {}
+        self._rank: Dict[str, int] = {}
+        self._next_rank = 0
+        self._by_tag: Dict[str, Set[str]] = {}
+        self._by_tasklist: Dict[str, Set[str]] = {}
+        self._by_due_day: Dict[date | None, Set[str]] = {}
+        self._durations: DurationIndex | None = None
+        self._duration_ids: List[str] = []
+        self._inbox: Set[str] = set()
+        self._project_names: Dict[str, str] = {}
+        for task in tasks:
+            self.add(task)
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def __iter__(self) -> Iterator[Task]:
+        return iter(self._tasks.values())
+
+    def __contains__(self, task_id: str) -> bool:
+        return task_id in self._tasks
+
+    def get(self, task_id: str) -> Task | None:
+        return self._tasks.get(task_id)
+
+    def add(self, task: Task) -> None:
+        task_id = task.id
+        if task_id in self._tasks:
+            self.remove(task_id)
+        self._tasks[task_id] = task
+        self._rank[task_id] = self._next_rank
+        self._next_rank += 1
+        for tag in task.tags:
+            _index_add(self._by_tag, tag, task_id)
+        _index_add(self._by_tasklist, task.tasklist, task_id)
+        _index_add(self._by_due_day, task.due_day, task_id)
+        self._durations = None
+        if task.flags & INBOX:
+            self._inbox.add(task_id)
+        self._project_names[task.tasklist] = task.project
+
+    def replace(self, task: Task) -> None:
+        """Swap in a new version of a stored task, keeping its position."""
+
+        rank = self._rank.get(task.id)
+        self.add(task)
+        if rank is not None:
+            self._rank[task.id] = rank
+
+    def remove(self, task_id: str) -> Task | None:
+        task = self._tasks.pop(task_id, None)
+        if task is None:
+            return None
+        del self._rank[task_id]
+        for tag in task.tags:
+            _index_discard(self._by_tag, tag, task_id)
+        _index_discard(self._by_tasklist, task.tasklist, task_id)
+        _index_discard(self._by_due_day, task.due_day, task_id)
+        self._inbox.discard(task_id)
+        return task
+
+    def ids(self) -> Set[str]:
+        return set(self._tasks)
+
+    @traced("filters.inbox")
+    def inbox_ids(self) -> Set[str]:
+        return set(self._inbox)
+
+    @traced("filters.due_on")
+    def ids_due_on(self, day: date) -> Set[str]:
+        return set(self._by_due_day.get(day, ()))
+
+    def ids_in_tasklist(self, tasklist: str) -> Set[str]:
+        return set(self._by_tasklist.get(tasklist, ()))
+
+    @traced("filters.tags")
+    def ids_with_any_tag(self, tags: Iterable[str]) -> Set[str]:
+        found: Set[str] = set()
+        for tag in tags:
+            found |= self._by_tag.get(tag, set())
+        return found
+
+    def _duration_index(self) -> DurationIndex:
+        # Rebuilt lazily after additions; removed tasks are skipped at query time.
+        if self._durations is None:
+            self._durations = DurationIndex(list(self._tasks.values()))
+            self._duration_ids = list(map(_task_id, self._durations.iter_fitting(sys.maxsize)))
+        return self._durations
+
+    @traced("filters.fitting")
+    def ids_fitting(self, minutes_available: int | None) -> Set[str]:
+        """Index version of ``filter_tasks_by_time``."""
+
+        if minutes_available is None:
+            return self.ids()
+        count = self._duration_index().count_fitting(minutes_available)
+        found = set(self._duration_ids[:count])
+        if len(self._durations) != len(self._tasks):
+            found.intersection_update(self._tasks.keys())
+        return found
+
+    def top_fitting(self, minutes_available: int | None, limit: int) -> List[Task]:
+        """First ``limit`` tasks in store order that fit the window."""
+
+        return self._duration_index().top_fitting(
+            minutes_available, limit, keep=lambda task: task.id in self._tasks
+        )
+
+    @traced("filters.tag_options")
+    def tags_among(self, task_ids: Set[str]) -> Set[str]:
+        """Tags used by at least one of ``task_ids``."""
+
+        return {tag for tag, bucket in self._by_tag.items() if not bucket.isdisjoint(task_ids)}
+
+    @traced("filters.order")
+    def ordered(self, task_ids: Iterable[str]) -> List[Task]:
+        """Tasks for ``task_ids`` in store order."""
+
+        return [self._tasks[task_id] for task_id in sorted(task_ids, key=self._rank.__getitem__)]
+
+    def project_options(self) -> List[Tuple[str, str]]:
+        """``(project name, tasklist id)`` pairs for lists that still hold tasks."""
+
+        return sorted(
+            ((self._project_names[tasklist], tasklist) for tasklist in self._by_tasklist),
+            key=lambda option: option[0].lower(),
+        )
@@ -0,0 +1,159 @@
+"""Persistent local task store for incremental Google Tasks sync."""
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+SYNC_STORE_PATH = Path("tasks_sync.json")
+SYNC_STORE_VERSION = 1
+# Watermarks are taken from the local clock, so leave room for skew with Google's servers.
+SYNC_CLOCK_SKEW = timedelta(minutes=5)
+
+
+def sync_watermark(moment: datetime | None = None) -> str:
+    """Return the ``updatedMin`` value to store for a sync starting at ``moment``."""
+
+    moment = moment or datetime.now(timezone.utc)
+    return (moment - SYNC_CLOCK_SKEW).isoformat()
+
+
+class TaskSyncStore:
+    """Raw tasks per task list plus the high-water mark of the last sync."""
+
+    def __init__(self, path: Path | None = SYNC_STORE_PATH) -> None:
+        self.path = path
+        self.lists: Dict[str, Dict] = {}
+        self.lists_etag: str | None = None
+        # Task id -> the list holding it, built on first use.
+        self._homes: Dict[str, str] | None = None
+        # Whether the store holds anything ``save`` has not written yet.
+        self.changed = False
+
+    @classmethod
+    def load(cls, path: Path | None = SYNC_STORE_PATH) -> "TaskSyncStore":
+        store = cls(path)
+        if path is None or not path.exists():
+            return store
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return store
+        if data.get("version") == SYNC_STORE_VERSION:
+            store.lists = data.get("lists", {})
+            store._homes = None
+            store.lists_etag = data.get("lists_etag")
+        return store
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        payload = json.dumps(
+            {"version": SYNC_STORE_VERSION, "lists": self.lists, "lists_etag": self.lists_etag}
+        )
+        tmp_path = self.path.with_name(f"{self.path.name}.tmp")
+        tmp_path.write_text(payload, encoding="utf-8")
+        os.replace(tmp_path, self.path)
+        self.changed = False
+
+    def clear(self) -> None:
+        self.lists = {}
+        self.lists_etag = None
+        self._homes = None
+        self.changed = False
+        if self.path is not None and self.path.exists():
+            self.path.unlink()
+
+    def watermark(self, tasklist_id: str) -> str | None:
+        entry = self.lists.get(tasklist_id)
+        return entry.get("updated_min") if entry else None
+
+    def etag(self, tasklist_id: str) -> str | None:
+        entry = self.lists.get(tasklist_id)
+        return entry.get("etag") if entry else None
+
+    def known_lists(self) -> List[Dict]:
+        """Task lists as last seen, in the shape of a ``tasklists.list`` item."""
+
+        return [{"id": tasklist_id, "title": entry.get("title")} for tasklist_id, entry in self.lists.items()]
+
+    def rename(self, tasklist_id: str, title: str) -> None:
+        entry = self.lists.get(tasklist_id)
+        if entry is not None and entry.get("title") != title:
+            entry["title"] = title
+            self.changed = True
+
+    def set_lists_etag(self, etag: str | None) -> None:
+        if etag != self.lists_etag:
+            self.lists_etag = etag
+            self.changed = True
+
+    def apply(
+        self,
+        tasklist_id: str,
+        title: str,
+        items: Iterable[Dict],
+        updated_min: str,
+        full: bool,
+        etag: str | None = None,
+    ) -> None:
+        """Merge a sync response into the store.
+
+        A ``full`` response replaces the list; a delta response upserts changed
+        tasks and drops those that were deleted or completed. A task that
+        shows up in a new list was moved there (``tasks.move`` keeps the id),
+        so it is dropped from the list it came from, found through the id
+        index rather than a scan of every list.
+        """
+
+        homes = self._task_homes()
+        # The watermark and ETag move even when no task did.
+        self.changed = True
+        entry = self.lists.get(tasklist_id)
+        if entry is not None and full:
+            for task_id in entry["tasks"]:
+                if homes.get(task_id) == tasklist_id:
+                    del homes[task_id]
+        if entry is None or full:
+            entry = self.lists[tasklist_id] = {"tasks": {}}
+        entry["title"] = title
+        entry["updated_min"] = updated_min
+        entry["etag"] = etag
+        tasks = entry["tasks"]
+        for task in items:
+            task_id = task.get("id")
+            if not task_id:
+                continue
+            if task.get("deleted") or task.get("status") == "completed":
+                if tasks.pop(task_id, None) is not None and homes.get(task_id) == tasklist_id:
+                    del homes[task_id]
+                continue
+            home = homes.get(task_id)
+            if home is not None and home != tasklist_id and home in self.lists:
+                self.lists[home]["tasks"].pop(task_id, None)
+            homes[task_id] = tasklist_id
+            tasks[task_id] = task
+
+    def _task_homes(self) -> Dict[str, str]:
+        if self._homes is None:
+            self._homes = {
+                task_id: tasklist_id
+                for tasklist_id, entry in self.lists.items()
+                for task_id in entry["tasks"]
+            }
+        return self._homes
+
+    def retain(self, tasklist_ids: Iterable[str]) -> None:
+        """Forget task lists that no longer exist upstream."""
+
+        keep = set(tasklist_ids)
+        for tasklist_id in [key for key in self.lists if key not in keep]:
+            del self.lists[tasklist_id]
+            self._homes = None
+            self.changed = True
+
+    def iter_tasks(self) -> Iterator[Tuple[str, str, List[Dict]]]:
+        for tasklist_id, entry in self.lists.items():
+            yield tasklist_id, entry.get("title", "Untitled Project"), list(entry["tasks"].values())
@@ -0,0 +1,133 @@
+"""Multi-user mode: an encrypted token store per account and bounded per-account resources."""
+from __future__ import annotations
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Generic, Iterator, List, TypeVar
+
+from .auth import CredentialManager, account_key
+
+TOKEN_STORE_DIR = Path("tokens")
+TOKEN_KEY_ENV = "TURBOORGANIZER_TOKEN_KEY"
+DEFAULT_MAX_ACCOUNTS = 64
+
+T = TypeVar("T")
+
+
+class AccountPool(Generic[T]):
+    """Per-account objects in LRU order, at most ``max_accounts`` of them.
+
+    ``factory(account)`` builds a missing entry (``get`` can pass its own);
+    ``close`` is called on entries that are evicted or popped, e.g. to stop
+    their thread.
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[str], T] | None = None,
+        max_accounts: int = DEFAULT_MAX_ACCOUNTS,
+        close: Callable[[T], None] | None = None,
+    ) -> None:
+        self.max_accounts = max_accounts
+        self._factory = factory
+        self._close = close
+        self._entries: "OrderedDict[str, T]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, account: str, factory: Callable[[str], T] | None = None) -> T:
+        evicted: List[T] = []
+        with self._lock:
+            entry = self._entries.get(account)
+            if entry is None:
+                entry = self._entries[account] = (factory or self._factory)(account)
+                while len(self._entries) > self.max_accounts:
+                    evicted.append(self._entries.popitem(last=False)[1])
+            self._entries.move_to_end(account)
+        for stale in evicted:
+            self._closed(stale)
+        return entry
+
+    def pop(self, account: str) -> T | None:
+        with self._lock:
+            entry = self._entries.pop(account, None)
+        if entry is not None:
+            self._closed(entry)
+        return entry
+
+    def _closed(self, entry: T) -> None:
+        if self._close is not None:
+            self._close(entry)
+
+    def __contains__(self, account: str) -> bool:
+        return account in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            return iter(list(self._entries))
+
+
+class TokenStore:
+    """One Fernet-encrypted token file per account under ``directory``.
+
+    Files are named after ``account_key`` (a hash, never the email or user
+    id) and each is served by its own ``CredentialManager``, so tokens are
+    cached in memory and refreshed ahead of expiry per account. Managers of
+    the ``max_accounts`` most recent accounts are kept; older ones are
+    stopped and rebuilt from disk on their next use.
+
+    ``key`` is a Fernet key; it defaults to ``$TURBOORGANIZER_TOKEN_KEY``.
+    """
+
+    def __init__(
+        self,
+        directory: Path = TOKEN_STORE_DIR,
+        key: bytes | str | None = None,
+        max_accounts: int = DEFAULT_MAX_ACCOUNTS,
+    ) -> None:
+        from cryptography.fernet import Fernet
+
+        key = key or os.environ.get(TOKEN_KEY_ENV)
+        if not key:
+            raise RuntimeError(
+                f"Set {TOKEN_KEY_ENV} to a Fernet key to store tokens in multi-user mode."
+            )
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._cipher = Fernet(key)
+        self.managers: AccountPool[CredentialManager] = AccountPool(
+            self._manager, max_accounts, close=CredentialManager.stop
+        )
+
+    def _manager(self, account: str) -> CredentialManager:
+        return CredentialManager(
+            self.directory / f"{account}.token",
+            cipher=self._cipher,
+            authorize=None,
+        )
+
+    def get(self, account: str):
+        """The account's credentials; ``FileNotFoundError`` when it has to sign in."""
+
+        return self.managers.get(account).get()
+
+    def save(self, creds) -> str:
+        """Store ``creds`` under their account and return its key."""
+
+        account = account_key(creds)
+        self.managers.get(account).save(creds)
+        return account
+
+    def has_refresh_token(self, account: str) -> bool:
+        return account in self and self.managers.get(account).has_refresh_token()
+
+    def delete(self, account: str) -> None:
+        self.managers.get(account).clear()
+        self.managers.pop(account)
+
+    def __contains__(self, account: str) -> bool:
+        return (self.directory / f"{account}.token").exists()
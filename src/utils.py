@@ -1,39 +1,114 @@
 """Utility helpers for task parsing and filtering."""
 from __future__ import annotations
 
+import heapq
 import re
-from datetime import datetime, timedelta, timezone
-from typing import Iterable, List, MutableMapping
+import unicodedata
+from array import array
+from bisect import bisect_right
+from datetime import datetime, timedelta, timezone, tzinfo
+from functools import lru_cache
+from typing import Callable, FrozenSet, Iterable, Iterator, List, MutableMapping, Sequence
+
+from .models import INBOX, OVERDUE, ROUTINE, Task
+from .perf import traced
 
 DEFAULT_DURATION_MINUTES = 15
-DURATION_PATTERN = re.compile(
-    r"(?<!\d)(?:(?P<hours>\d+)\s*h)?\s*(?:(?P<minutes>\d+)\s*m)?(?![a-zA-Z0-9])",
+# A duration token starts at a digit run: ``80m``, ``1h20m``, ``2 h``. Every
+# part of the previous pattern was optional, so it matched the empty string at
+# almost every position. Leading with ``\d`` (the "no digit before" check
+# comes after it) lets the regex engine skip straight to candidate digits.
+DURATION_TOKEN = re.compile(
+    r"(?P<digits>\d(?<!\d\d)\d*)\s*(?:(?P<hours>h)(?:\s*(?P<hour_minutes>\d+)\s*m)?|m)(?![a-z0-9])",
     re.IGNORECASE,
 )
+# Something after a title hit that a token cannot run through, so the notes
+# cannot extend it (``1h`` + ``30m`` in the notes would read as 90).
+_SETTLED_AFTER = re.compile(r"[\d\s]*[^\d\s]")
+# Run at the end of a title that may combine with the start of the notes.
+_TOKEN_CHARS = re.compile(r"[\d\shm]*", re.IGNORECASE)
+TAG_PATTERN = re.compile(r"#([A-Za-z0-9_-]+)")
+INBOX_PROJECT_KEYS = frozenset({"buzon", "inbox", ""})
+
+
+
+def _token_minutes(match: re.Match) -> int:
+    digits, hours, hour_minutes = match.group("digits", "hours", "hour_minutes")
+    if hours is not None:
+        return int(digits) * 60 + int(hour_minutes or 0)
+    return int(digits)
+
+
+def _first_duration(text: str, pos: int = 0) -> int | None:
+    for match in DURATION_TOKEN.finditer(text, pos):
+        minutes = _token_minutes(match)
+        if minutes:
+            return minutes
+    return None
+
 
+def _duration_minutes(title: str, notes: str | None) -> int | None:
+    """First non-zero duration in ``title`` followed by ``notes``, or ``None``.
 
+    Reads like a scan of ``f"{title} {notes}"`` but only joins the two when
+    the end of the title could run into the notes.
+    """
+
+    if not notes:
+        return _first_duration(title)
+    for match in DURATION_TOKEN.finditer(title):
+        minutes = _token_minutes(match)
+        if minutes:
+            if _SETTLED_AFTER.match(title, match.end()):
+                return minutes
+            break
+    tail = _TOKEN_CHARS.match(title[::-1]).end()
+    if not tail:
+        return _first_duration(notes)
+    return _first_duration(f"{title} {notes}", len(title) - tail)
+
+
+@traced("parse_task_duration", aggregate=True)
 def parse_task_duration(
     title: str, notes: str | None = None, default: int | None = DEFAULT_DURATION_MINUTES
 ) -> int | None:
     """Extract a duration in minutes from task title or notes.
 
-    Supports patterns like ``80m`` or ``1h20m`` appearing anywhere in the text.
-    If nothing is found, ``default`` minutes are returned.
+    Supports patterns like ``80m``, ``[45m]`` or ``1h20m`` appearing anywhere in
+    the text; the first non-zero one wins. If nothing is found, ``default``
+    minutes are returned.
     """
 
-    text = f"{title or ''} {notes or ''}".lower()
-    for match in DURATION_PATTERN.finditer(text):
-        hours_part = match.group("hours")
-        minutes_part = match.group("minutes")
-        if not hours_part and not minutes_part:
-            continue
-        try:
-            total_minutes = int(hours_part or 0) * 60 + int(minutes_part or 0)
-        except (TypeError, ValueError):
-            continue
-        if total_minutes > 0:
-            return total_minutes
-    return default
+    minutes = _duration_minutes(title or "", notes)
+    return default if minutes is None else minutes
+
+
+@traced("parse_task_durations")
+def parse_task_durations(
+    tasks: Iterable[MutableMapping], default: int | None = DEFAULT_DURATION_MINUTES
+) -> List[int | None]:
+    """``parse_task_duration`` over the ``title``/``notes`` of many tasks."""
+
+    durations = []
+    for task in tasks:
+        minutes = _duration_minutes(task.get("title") or "", task.get("notes"))
+        durations.append(default if minutes is None else minutes)
+    return durations
+
+
+def parse_rfc3339(value: str) -> datetime:
+    """Parse an RFC 3339 timestamp as sent by Google (``...T00:00:00.000Z``).
+
+    ``datetime.fromisoformat`` handles what the APIs return; ``dateutil`` is
+    only imported for the odd value it rejects.
+    """
+
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        from dateutil import parser as date_parser
+
+        return date_parser.isoparse(value)
 
 
 def round_up_to_five_minutes(moment: datetime | None = None) -> datetime:
@@ -51,6 +126,7 @@ def round_up_to_five_minutes(moment: datetime | None = None) -> datetime:
     return rounded
 
 
+@traced("filters.by_time")
 def filter_tasks_by_time(tasks: Iterable[MutableMapping], minutes_available: int | None) -> List[MutableMapping]:
     """Return tasks whose duration fits within the available window.
 
@@ -73,6 +149,74 @@ def filter_tasks_by_time(tasks: Iterable[MutableMapping], minutes_available: int
     return filtered
 
 
+class DurationIndex:
+    """Tasks sorted by parsed duration for bisect range queries.
+
+    Durations are parsed once when the index is built and kept in compact
+    arrays, so resolving a time window is a bisect instead of a scan. Tasks
+    without a valid duration are only returned for an undefined window, as in
+    ``filter_tasks_by_time``.
+    """
+
+    def __init__(self, tasks: Sequence[MutableMapping]) -> None:
+        self._tasks = list(tasks)
+        order = []
+        for position, task in enumerate(self._tasks):
+            duration = task.get("duration")
+            if duration is None:
+                continue
+            try:
+                order.append((int(duration), position))
+            except (TypeError, ValueError):
+                continue
+        order.sort()
+        self._durations = array("q", (duration for duration, _ in order))
+        self._positions = array("q", (position for _, position in order))
+
+    def __len__(self) -> int:
+        return len(self._tasks)
+
+    def count_fitting(self, minutes_available: int | None) -> int:
+        if minutes_available is None:
+            return len(self._tasks)
+        return bisect_right(self._durations, minutes_available)
+
+    def iter_fitting(self, minutes_available: int | None) -> Iterator[MutableMapping]:
+        """Yield fitting tasks in ascending duration order."""
+
+        if minutes_available is None:
+            return iter(self._tasks)
+        prefix = self._positions[: self.count_fitting(minutes_available)]
+        return map(self._tasks.__getitem__, prefix)
+
+    def fitting(self, minutes_available: int | None) -> List[MutableMapping]:
+        """Same result as ``filter_tasks_by_time`` (input order preserved)."""
+
+        if minutes_available is None:
+            return list(self._tasks)
+        prefix = self._positions[: self.count_fitting(minutes_available)]
+        return [self._tasks[position] for position in sorted(prefix)]
+
+    def top_fitting(
+        self,
+        minutes_available: int | None,
+        limit: int,
+        keep: Callable[[MutableMapping], bool] | None = None,
+    ) -> List[MutableMapping]:
+        """First ``limit`` fitting tasks in input order, without building the full list.
+
+        ``keep`` optionally skips tasks (e.g. ones removed since the index was built).
+        """
+
+        if minutes_available is None:
+            positions: Iterable[int] = range(len(self._tasks))
+        else:
+            positions = self._positions[: self.count_fitting(minutes_available)]
+        if keep is not None:
+            positions = (position for position in positions if keep(self._tasks[position]))
+        return [self._tasks[position] for position in heapq.nsmallest(limit, positions)]
+
+
 def energy_badge(level: str) -> str:
     """Return a friendly label for an energy level selection."""
 
@@ -82,3 +226,67 @@ def energy_badge(level: str) -> str:
     if normalized == "medium":
         return "🔆 Medium energy"
     return "🌱 Low lift"
+
+
+def extract_tags(title: str | None, notes: str | None = None) -> FrozenSet[str]:
+    """Return the lowercase ``#tags`` found in a task title and notes."""
+
+    return frozenset(
+        tag.lower() for tag in TAG_PATTERN.findall(f"{title or ''} {notes or ''}")
+    )
+
+
+@lru_cache(maxsize=1024)
+def normalize_project(name: str | None) -> str:
+    """Lowercase a project name and strip accents (``Buzón`` -> ``buzon``)."""
+
+    base = unicodedata.normalize("NFD", (name or "").strip().lower())
+    return "".join(ch for ch in base if unicodedata.category(ch) != "Mn")
+
+
+@traced("prepare_tasks")
+def prepare_tasks(
+    tasks: Iterable[MutableMapping], default_tz: tzinfo = timezone.utc
+) -> List[Task]:
+    """Turn task records into ``Task`` objects with the derived fields the UI filters on.
+
+    ``tags`` (frozenset), ``project_key`` (normalized project name), the due
+    date and day and ``is_inbox`` are computed once per load. ``Task``
+    records from ``fetch_tasks`` already carry them and are passed through;
+    plain dicts are converted. Naive due dates are interpreted in
+    ``default_tz``.
+    """
+
+    prepared = []
+    for task in tasks:
+        if isinstance(task, Task):
+            prepared.append(task)
+            continue
+        due_at = None
+        if task.get("due"):
+            try:
+                due_at = datetime.fromisoformat(task["due"])
+            except ValueError:
+                due_at = None
+            if due_at is not None and due_at.tzinfo is None:
+                due_at = due_at.replace(tzinfo=default_tz)
+        project_key = normalize_project(task.get("project"))
+        flags = (ROUTINE if task.get("is_routine") else 0) | (OVERDUE if task.get("is_overdue") else 0)
+        if project_key in INBOX_PROJECT_KEYS:
+            flags |= INBOX
+        prepared.append(
+            Task(
+                task.get("id"),
+                task.get("title"),
+                task.get("project"),
+                task.get("tasklist"),
+                duration=task.get("duration"),
+                notes=task.get("notes"),
+                due_epoch=int(due_at.timestamp()) if due_at else None,
+                flags=flags,
+                tags=extract_tags(task.get("title"), task.get("notes")),
+                project_key=project_key,
+                due_day=due_at.date() if due_at else None,
+            )
+        )
+    return prepared